@@ -0,0 +1,131 @@
+"""
+Агрегация статистики игрока по играм за произвольную выборку:
+период дат, сезон, игры плей-офф или последние N игр.
+Строки статистики /stats постранично складываются в столбцы NumPy,
+суммы, средние, точность бросков и показатели в пересчете на 36 минут
+считаются векторно по всем играм сразу.
+"""
+import operator
+
+import numpy as np
+
+COUNT_FIELDS = (
+    'pts', 'reb', 'oreb', 'dreb', 'ast', 'stl', 'blk', 'turnover', 'pf',
+    'fga', 'fgm', 'fg3a', 'fg3m', 'fta', 'ftm',
+)
+PER_MINUTES = 36
+
+counts = operator.attrgetter(*COUNT_FIELDS)
+
+
+def parse_minutes(value):
+    """Сыгранное время '34:12' или '34' -> 34.2 минуты, пустое -> 0."""
+    if not value:
+        return 0.0
+    minutes, _, seconds = str(value).partition(':')
+    try:
+        return float(minutes) + (float(seconds) / 60 if seconds else 0.0)
+    except ValueError:
+        return 0.0
+
+
+class StatColumns:
+    """
+    Столбцы статистики по играм: матрица показателей COUNT_FIELDS
+    (строка на игру), сыгранные минуты и даты игр. Пополняется
+    страницами записей StatLine, страницы объединяются один раз
+    при первом обращении к столбцам.
+    """
+
+    def __init__(self):
+        self._counts = []
+        self._minutes = []
+        self._dates = []
+        self.rows = 0
+
+    def extend(self, lines):
+        if not lines:
+            return
+        self._counts.append(np.array(list(map(counts, lines)), dtype=float))
+        self._minutes.append(np.fromiter(
+            (parse_minutes(line.min) for line in lines), dtype=float,
+            count=len(lines)
+        ))
+        self._dates.append(np.array(
+            [line.game.date for line in lines], dtype='datetime64[D]'
+        ))
+        self.rows += len(lines)
+
+    def columns(self):
+        """Тройка массивов: показатели, минуты, даты игр."""
+        if not self._counts:
+            return (
+                np.empty((0, len(COUNT_FIELDS))), np.empty(0),
+                np.empty(0, dtype='datetime64[D]')
+            )
+        if len(self._counts) > 1:
+            self._counts = [np.concatenate(self._counts)]
+            self._minutes = [np.concatenate(self._minutes)]
+            self._dates = [np.concatenate(self._dates)]
+        return self._counts[0], self._minutes[0], self._dates[0]
+
+
+class Summary:
+    """
+    Итоги выборки: число сыгранных игр, сыгранные минуты, даты первой
+    и последней игры и словари сумм, средних за игру и показателей
+    в пересчете на 36 минут по полям COUNT_FIELDS.
+    """
+
+    __slots__ = (
+        'games', 'minutes', 'first_date', 'last_date', 'totals', 'averages',
+        'per_minutes',
+    )
+
+    def __init__(
+        self, games, minutes, first_date, last_date, totals, averages,
+        per_minutes
+    ):
+        self.games = games
+        self.minutes = minutes
+        self.first_date = first_date
+        self.last_date = last_date
+        self.totals = totals
+        self.averages = averages
+        self.per_minutes = per_minutes
+
+    def percent(self, made, attempted):
+        """Точность бросков в процентах или None, если бросков не было."""
+        if not self.totals[attempted]:
+            return None
+        return self.totals[made] / self.totals[attempted] * 100
+
+
+def aggregate(columns, last=None):
+    """
+    Сводит столбцы статистики в Summary. Учитываются только игры, в
+    которых игрок был на площадке; last - только последние last таких
+    игр. Возвращает None, если таких игр нет.
+    """
+    matrix, minutes, dates = columns.columns()
+    played = np.flatnonzero(minutes > 0)
+    if last:
+        played = played[np.argsort(dates[played], kind='stable')][-last:]
+    if not played.size:
+        return None
+    games = int(played.size)
+    matrix = matrix[played]
+    total_minutes = float(minutes[played].sum())
+    totals = np.nansum(matrix, axis=0)
+    averages = totals / games
+    per_minutes = (
+        totals * PER_MINUTES / total_minutes
+        if total_minutes else np.zeros_like(totals)
+    )
+    return Summary(
+        games, total_minutes,
+        str(dates[played].min()), str(dates[played].max()),
+        dict(zip(COUNT_FIELDS, totals.tolist())),
+        dict(zip(COUNT_FIELDS, averages.tolist())),
+        dict(zip(COUNT_FIELDS, per_minutes.tolist())),
+    )
@@ -0,0 +1,305 @@
+"""
+HTTP-клиент для запросов к внешним API-сервисам.
+Держит пул keep-alive соединений, повторяет неудачные запросы с
+'дрожащей' экспоненциальной задержкой и собирает статистику по эндпоинтам.
+"""
+import asyncio
+import json
+import logging
+import random
+import threading
+import time
+from http import HTTPStatus
+from urllib.parse import urlsplit
+
+import aiohttp
+import requests
+from requests.adapters import HTTPAdapter
+from requests.models import PreparedRequest
+
+from constants import (
+    API_ASYNC_POOL_SIZE, API_BACKOFF_BASE, API_BACKOFF_MAX, API_POOL_SIZE,
+    API_RETRIES, API_RETRY_BUDGET, API_TIMEOUT, PRIORITY_INTERACTIVE,
+    TIME_OUT
+)
+from exceptions import ApiRequestTrouble, RequestCancelled
+
+logger = logging.getLogger(__name__)
+
+RETRY_STATUSES = (
+    HTTPStatus.TOO_MANY_REQUESTS,
+    HTTPStatus.BAD_GATEWAY,
+    HTTPStatus.SERVICE_UNAVAILABLE,
+    HTTPStatus.GATEWAY_TIMEOUT,
+)
+
+
+def endpoint_name(url):
+    """
+    Возвращает короткое имя эндпоинта - последний сегмент пути URL.
+    Если сегмент не похож на имя (пустой или числовой), возвращает хост.
+    """
+    parts = urlsplit(url)
+    name = parts.path.rstrip('/').rsplit('/', 1)[-1]
+    if not name or name.isdigit():
+        return parts.netloc
+    return name
+
+
+def build_url(endpoint, params=None):
+    """
+    Собирает итоговый URL запроса из эндпоинта и параметров
+    по тем же правилам, что и requests (параметры со значением None
+    отбрасываются).
+    """
+    request = PreparedRequest()
+    request.prepare_url(endpoint, params)
+    return request.url
+
+
+def retry_after(response, default):
+    """Возвращает паузу из заголовка Retry-After или значение по умолчанию."""
+    try:
+        return float(response.headers.get('Retry-After', default))
+    except ValueError:
+        return default
+
+
+def backoff_delay(attempt, base=API_BACKOFF_BASE, cap=API_BACKOFF_MAX):
+    """
+    Задержка перед повтором запроса: экспоненциальный рост,
+    ограниченный сверху, со случайным 'дрожанием' (full jitter).
+    """
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+class EndpointStats:
+    """Счетчики запросов, повторов и задержек для одного эндпоинта."""
+
+    __slots__ = ('requests', 'retries', 'errors', 'total_time', 'max_time')
+
+    def __init__(self):
+        self.requests = 0
+        self.retries = 0
+        self.errors = 0
+        self.total_time = 0.0
+        self.max_time = 0.0
+
+    def as_dict(self):
+        return {
+            'requests': self.requests,
+            'retries': self.retries,
+            'errors': self.errors,
+            'avg_time': (
+                self.total_time / self.requests if self.requests else 0.0
+            ),
+            'max_time': self.max_time,
+        }
+
+
+class ClientStats:
+    """Общие для синхронного и асинхронного клиентов счетчики."""
+
+    def __init__(self):
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def stats(self):
+        """Возвращает снимок статистики по всем эндпоинтам."""
+        with self._lock:
+            return {
+                name: item.as_dict() for name, item in self._stats.items()
+            }
+
+    def _record(self, name, elapsed, error=False):
+        with self._lock:
+            item = self._stats.get(name)
+            if item is None:
+                item = self._stats[name] = EndpointStats()
+            item.requests += 1
+            item.total_time += elapsed
+            item.max_time = max(item.max_time, elapsed)
+            if error:
+                item.errors += 1
+
+    def _record_retry(self, name):
+        with self._lock:
+            self._stats[name].retries += 1
+
+
+class ApiClient(ClientStats):
+    """
+    Общий для всего процесса клиент API.
+    Все запросы идут через одну requests.Session с пулом соединений,
+    поэтому TCP- и TLS-рукопожатия не повторяются на каждый запрос.
+    Повторы выполняются с короткой задержкой; долгих пауз в потоке
+    диспетчера клиент не делает: суммарное ожидание между повторами
+    одного запроса ограничено API_RETRY_BUDGET для его приоритета,
+    после чего запрос сразу завершается ошибкой.
+    """
+
+    def __init__(
+        self, pool_size=API_POOL_SIZE, retries=API_RETRIES,
+        timeout=API_TIMEOUT, cooldown=TIME_OUT
+    ):
+        super().__init__()
+        self.retries = retries
+        self.timeout = timeout
+        self.cooldown = cooldown
+        self.session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=pool_size, pool_maxsize=pool_size
+        )
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+    def get(
+        self, url, params=None, priority=PRIORITY_INTERACTIVE, limiter=None,
+        cancelled=None
+    ):
+        """
+        Выполняет GET-запрос с повторами и возвращает объект ответа.
+        Ответы с кодами из RETRY_STATUSES и сетевые ошибки повторяются
+        не более self.retries раз.
+        Если передан ограничитель частоты limiter, каждая попытка сначала
+        получает у него токен с приоритетом priority. Ответ 429 в этом
+        случае приостанавливает выдачу токенов, и повтор встает в общую
+        очередь, а не спит в потоке диспетчера.
+        Если передано событие cancelled, после его установки ни одна
+        попытка не уходит на сервис (исключение RequestCancelled).
+        Паузы между повторами занимают поток, поэтому их сумма не больше
+        API_RETRY_BUDGET[priority] секунд: запрос пользователя в потоке
+        диспетчера быстро получает ошибку вместо долгого ожидания.
+        """
+        name = endpoint_name(url)
+        attempt = 0
+        budget = API_RETRY_BUDGET[priority]
+        while True:
+            if cancelled is not None and cancelled.is_set():
+                raise RequestCancelled(f'Запрос к {url} отменен.')
+            if limiter is not None:
+                limiter.acquire(priority, cancelled=cancelled)
+            start = time.monotonic()
+            try:
+                response = self.session.get(
+                    url, params=params, timeout=self.timeout
+                )
+            except requests.RequestException as error:
+                self._record(name, time.monotonic() - start, error=True)
+                if attempt >= self.retries or budget <= 0:
+                    raise ApiRequestTrouble(
+                        f'Сбой при запросе к эндпоинту {url}.\n'
+                        f'Параметры запроса: {params}.\n'
+                        f'Ошибка: {error}.'
+                    )
+                delay = backoff_delay(attempt + 1)
+            else:
+                ok = response.status_code not in RETRY_STATUSES
+                self._record(name, time.monotonic() - start, error=not ok)
+                delay = backoff_delay(attempt + 1)
+                if response.status_code == HTTPStatus.TOO_MANY_REQUESTS:
+                    logger.warning('Отправлено больше 60 запросов в минуту')
+                    if limiter is None:
+                        return response
+                    limiter.pause(retry_after(response, self.cooldown))
+                    delay = 0
+                if ok or attempt >= self.retries or (delay and budget <= 0):
+                    return response
+            attempt += 1
+            delay = min(delay, budget)
+            budget -= delay
+            self._record_retry(name)
+            time.sleep(delay)
+
+
+class AsyncResponse:
+    """Прочитанный ответ aiohttp с интерфейсом, как у requests.Response."""
+
+    __slots__ = ('status_code', 'url', 'content', 'headers')
+
+    def __init__(self, status_code, url, content, headers):
+        self.status_code = status_code
+        self.url = url
+        self.content = content
+        self.headers = headers
+
+    def json(self):
+        return json.loads(self.content)
+
+
+class AsyncApiClient(ClientStats):
+    """
+    Асинхронный клиент API для работы бота в режиме asyncio.
+    Повторяет поведение ApiClient: пул keep-alive соединений, повторы
+    с 'дрожащей' задержкой и очередь к ограничителю частоты, - но ожидание
+    не занимает поток: тысячи запросов ждут ответа в одном цикле событий.
+    Сессия создается при первом запросе внутри работающего цикла событий.
+    """
+
+    def __init__(
+        self, pool_size=API_ASYNC_POOL_SIZE, retries=API_RETRIES,
+        timeout=API_TIMEOUT, cooldown=TIME_OUT
+    ):
+        super().__init__()
+        self.pool_size = pool_size
+        self.retries = retries
+        self.timeout = timeout
+        self.cooldown = cooldown
+        self.session = None
+
+    async def get(
+        self, url, params=None, priority=PRIORITY_INTERACTIVE, limiter=None
+    ):
+        """Асинхронный аналог ApiClient.get()."""
+        if self.session is None:
+            self.session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.pool_size),
+                timeout=aiohttp.ClientTimeout(total=self.timeout)
+            )
+        full_url = build_url(url, params)
+        name = endpoint_name(url)
+        attempt = 0
+        while True:
+            if limiter is not None:
+                await limiter.acquire_async(priority)
+            start = time.monotonic()
+            try:
+                async with self.session.get(full_url) as raw_response:
+                    response = AsyncResponse(
+                        raw_response.status, str(raw_response.url),
+                        await raw_response.read(), raw_response.headers
+                    )
+            except (aiohttp.ClientError, asyncio.TimeoutError) as error:
+                self._record(name, time.monotonic() - start, error=True)
+                if attempt >= self.retries:
+                    raise ApiRequestTrouble(
+                        f'Сбой при запросе к эндпоинту {url}.\n'
+                        f'Параметры запроса: {params}.\n'
+                        f'Ошибка: {error!r}.'
+                    )
+                delay = backoff_delay(attempt + 1)
+            else:
+                ok = response.status_code not in RETRY_STATUSES
+                self._record(name, time.monotonic() - start, error=not ok)
+                delay = backoff_delay(attempt + 1)
+                if response.status_code == HTTPStatus.TOO_MANY_REQUESTS:
+                    logger.warning('Отправлено больше 60 запросов в минуту')
+                    if limiter is None:
+                        return response
+                    limiter.pause(retry_after(response, self.cooldown))
+                    delay = 0
+                if ok or attempt >= self.retries:
+                    return response
+            attempt += 1
+            self._record_retry(name)
+            await asyncio.sleep(delay)
+
+    async def close(self):
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+
+
+api_client = ApiClient()
+
+async_api_client = AsyncApiClient()
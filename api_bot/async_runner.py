@@ -0,0 +1,163 @@
+"""
+Запуск обработчиков бота, написанных в виде корутин.
+В многопоточном режиме корутина выполняется прямо в потоке диспетчера,
+в режиме asyncio - в отдельном цикле событий, общем для всех чатов.
+"""
+import asyncio
+import functools
+import logging
+import threading
+
+from exceptions import CoroutineSuspended
+
+logger = logging.getLogger(__name__)
+
+
+def awaited_name(coroutine):
+    """Имя самого внутреннего объекта, которого ждет корутина."""
+    awaited = coroutine
+    while True:
+        inner = getattr(awaited, 'cr_await', None) or getattr(
+            awaited, 'gi_yieldfrom', None
+        )
+        if inner is None:
+            break
+        awaited = inner
+    return getattr(awaited, '__qualname__', None) or repr(awaited)
+
+
+def run_sync(coroutine):
+    """
+    Выполняет корутину до конца в текущем потоке без цикла событий.
+    Подходит для обработчиков в многопоточном режиме: все их ожидания
+    (запросы к API, отправка сообщений) там выполняются синхронно
+    (run_blocking, send_queue.send), и корутина ни разу
+    не приостанавливается. Если корутина все же приостановилась
+    (например, ждет asyncio.sleep или future), продолжить ее некому:
+    она закрывается, а исключение CoroutineSuspended называет
+    обработчик и объект, на котором он остановился.
+    """
+    try:
+        coroutine.send(None)
+    except StopIteration as stop:
+        return stop.value
+    awaited = awaited_name(coroutine)
+    coroutine.close()
+    raise CoroutineSuspended(
+        f'Корутина {coroutine.__qualname__} приостановилась вне цикла '
+        f'событий asyncio на ожидании {awaited}: в многопоточном режиме '
+        'обработчики должны ждать только синхронных вызовов.'
+    )
+
+
+async def run_blocking(func, *args, **kwargs):
+    """
+    Выполняет блокирующую функцию: в режиме asyncio - в пуле потоков
+    цикла событий, в многопоточном режиме - прямо в текущем потоке.
+    """
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        return func(*args, **kwargs)
+    return await loop.run_in_executor(
+        None, functools.partial(func, *args, **kwargs)
+    )
+
+
+def in_event_loop():
+    """Проверяет, выполняется ли код внутри работающего цикла событий."""
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return False
+    return True
+
+
+def sync_callback(handler):
+    """Оборачивает обработчик-корутину для многопоточного режима."""
+    @functools.wraps(handler)
+    def callback(update, context):
+        return run_sync(handler(update, context))
+    return callback
+
+
+class EventLoopThread:
+    """
+    Цикл событий asyncio в отдельном потоке.
+    Обработчики диспетчера только ставят корутины в этот цикл и сразу
+    освобождают поток. Сообщения одного чата обрабатываются по очереди,
+    разные чаты - конкурентно.
+    """
+
+    def __init__(self):
+        self.loop = None
+        self.thread = None
+        self._chat_locks = {}
+        self._chat_users = {}
+
+    def start(self):
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(
+            target=self.loop.run_forever, name='asyncio-loop', daemon=True
+        )
+        self.thread.start()
+        return self
+
+    def stop(self, *coroutines):
+        """Выполняет завершающие корутины и останавливает цикл событий."""
+        for coroutine in coroutines:
+            self.submit(coroutine).result()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+
+    def submit(self, coroutine):
+        """Ставит корутину в цикл событий из любого потока."""
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop)
+
+    def callback(self, handler, report_errors=True):
+        """
+        Оборачивает обработчик-корутину для диспетчера.
+        Исключения корутины передаются обработчикам ошибок диспетчера
+        (для самих обработчиков ошибок - только логируются).
+        """
+        @functools.wraps(handler)
+        def callback(update, context):
+            chat = getattr(update, 'effective_chat', None)
+            future = self.submit(
+                self._serialized(chat and chat.id, handler(update, context))
+            )
+            report = functools.partial(
+                self._report, update, context, report_errors
+            )
+            future.add_done_callback(report)
+            return future
+        return callback
+
+    async def _serialized(self, chat_id, coroutine):
+        lock = self._chat_locks.get(chat_id)
+        if lock is None:
+            lock = self._chat_locks[chat_id] = asyncio.Lock()
+        self._chat_users[chat_id] = self._chat_users.get(chat_id, 0) + 1
+        try:
+            async with lock:
+                return await coroutine
+        finally:
+            self._chat_users[chat_id] -= 1
+            if not self._chat_users[chat_id]:
+                del self._chat_users[chat_id]
+                del self._chat_locks[chat_id]
+
+    @staticmethod
+    def _report(update, context, report_errors, future):
+        if future.cancelled():
+            return
+        error = future.exception()
+        if error is None:
+            return
+        dispatcher = getattr(context, 'dispatcher', None)
+        if not report_errors or dispatcher is None or (
+            not dispatcher.error_handlers
+        ):
+            logger.error('Ошибка в обработчике: %s', error)
+            return
+        dispatcher.dispatch_error(update, error)
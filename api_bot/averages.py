@@ -0,0 +1,94 @@
+"""
+Кэш средних показателей игроков за сезон по паре (игрок, сезон).
+Сравнения игроков, которые пересекаются по составу, берут уже известные
+показатели из кэша, а недостающих игроков запрашивают одним запросом.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from cache import is_past_season
+from constants import AVERAGES_CACHE_SIZE, LIVE_TTL
+from store import history_store
+
+
+class SeasonAverageCache:
+    """
+    LRU-кэш записей SeasonAverage. Отсутствие данных у игрока за сезон
+    тоже запоминается (значение None). Показатели прошедших сезонов
+    не устаревают и, кроме того, ищутся в хранилище истории,
+    текущего сезона - живут LIVE_TTL секунд.
+    """
+
+    def __init__(self, size=AVERAGES_CACHE_SIZE, ttl=LIVE_TTL):
+        self.size = size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def lookup(self, player_ids, season):
+        """
+        Возвращает пару: словарь {ID игрока: запись или None} для
+        известных кэшу игроков и список ID игроков, которых нужно
+        запросить у API-сервиса.
+        """
+        found = {}
+        missing = []
+        now = time.monotonic()
+        past = is_past_season(season)
+        with self._lock:
+            for player_id in player_ids:
+                entry = self._entries.get((player_id, season))
+                if entry is not None and (
+                    entry[1] is None or entry[1] > now
+                ):
+                    self._entries.move_to_end((player_id, season))
+                    found[player_id] = entry[0]
+                else:
+                    missing.append(player_id)
+        if past:
+            for player_id in list(missing):
+                average = history_store.season_average(player_id, season)
+                if average is not None:
+                    self.put(player_id, season, average)
+                    found[player_id] = average
+                    missing.remove(player_id)
+        self.hits += len(found)
+        self.misses += len(missing)
+        return found, missing
+
+    def update(self, player_ids, season, averages):
+        """
+        Запоминает ответ API-сервиса на запрос игроков player_ids:
+        у игроков без записи в ответе данных за сезон нет.
+        Возвращает словарь {ID игрока: запись или None}.
+        """
+        result = dict.fromkeys(player_ids)
+        for average in averages:
+            result[average.player_id] = average
+        for player_id, average in result.items():
+            self.put(player_id, season, average)
+        return result
+
+    def put(self, player_id, season, average):
+        expires = None
+        if not is_past_season(season):
+            expires = time.monotonic() + self.ttl
+        with self._lock:
+            self._entries[(player_id, season)] = (average, expires)
+            self._entries.move_to_end((player_id, season))
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses,
+            }
+
+
+season_averages = SeasonAverageCache()
@@ -0,0 +1,193 @@
+"""
+Кэш ответов API-сервиса balldontlie.io.
+Время жизни записи зависит от эндпоинта и содержимого ответа,
+общий объем кэша ограничен, вытесняются давно не использованные записи.
+"""
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+from api_client import build_url, endpoint_name
+from constants import CACHE_MAX_BYTES, LIVE_TTL, PLAYERS_TTL, TEAMS_TTL
+
+
+def normalize_url(endpoint, params=None):
+    """
+    Собирает итоговый URL запроса и приводит его к каноническому виду:
+    параметры запроса сортируются, поэтому одинаковые запросы с разным
+    порядком параметров дают один и тот же ключ.
+    """
+    parts = urlsplit(build_url(endpoint, params))
+    query = urlencode(sorted(parse_qsl(parts.query)))
+    return urlunsplit(
+        (parts.scheme, parts.netloc.lower(), parts.path, query, '')
+    )
+
+
+def current_season(today=None):
+    """Сезон NBA начинается в октябре и называется по году начала."""
+    today = today or datetime.now()
+    if today.month >= 10:
+        return today.year
+    return today.year - 1
+
+
+def is_past_season(season):
+    try:
+        return int(season) < current_season()
+    except (TypeError, ValueError):
+        return False
+
+
+def games_finished(games):
+    """Проверяет, что все игры в выборке уже окончены."""
+    return all(game.get('status') == 'Final' for game in games)
+
+
+def query_closed(query):
+    """
+    Проверяет, что выборка запроса ограничена прошлым: конкретными играми,
+    прошедшими сезонами или датами до сегодняшнего дня. Новые записи
+    в такую выборку уже не попадут, и ее страницы не меняются.
+    """
+    today = datetime.now().date().isoformat()
+    values = {}
+    for key, value in query:
+        values.setdefault(key, []).append(value)
+    if values.get('game_ids[]'):
+        return True
+    seasons = values.get('seasons[]')
+    if seasons and all(is_past_season(season) for season in seasons):
+        return True
+    end_date = values.get('end_date')
+    if end_date and end_date[0] < today:
+        return True
+    dates = values.get('dates[]')
+    return bool(dates) and all(
+        len(item) == 10 and item[4] == '-' and item < today for item in dates
+    )
+
+
+def ttl_policy(name, url, payload):
+    """
+    Возвращает время жизни ответа в секундах.
+    None - ответ не меняется никогда (выборка ограничена прошлым и все 
+    игры в ней окончены, или прошел сезон), 0 - ответ кэшировать нельзя.
+    """
+    data = payload.get('data') if isinstance(payload, dict) else None
+    if not isinstance(data, list):
+        return 0
+    query = parse_qsl(urlsplit(url).query)
+    if name == 'teams':
+        return TEAMS_TTL
+    if name == 'players':
+        return PLAYERS_TTL
+    if not data:
+        return LIVE_TTL
+    if name == 'games':
+        if query_closed(query) and games_finished(data):
+            return None
+        return LIVE_TTL
+    if name == 'stats':
+        games = (item.get('game') or {} for item in data)
+        if query_closed(query) and games_finished(games):
+            return None
+        return LIVE_TTL
+    if name == 'season_averages':
+        if is_past_season(dict(query).get('season')):
+            return None
+        return LIVE_TTL
+    return 0
+
+
+def is_immutable(key, payload):
+    """Проверяет, что ответ на запрос больше никогда не изменится."""
+    return ttl_policy(endpoint_name(key), key, payload) is None
+
+
+class CacheEntry:
+    __slots__ = ('payload', 'final_url', 'expires', 'size')
+
+    def __init__(self, payload, final_url, expires, size):
+        self.payload = payload
+        self.final_url = final_url
+        self.expires = expires
+        self.size = size
+
+
+class ResponseCache:
+    """
+    LRU-кэш ответов, ограниченный суммарным размером тел ответов в байтах.
+    Ведет счетчики попаданий и промахов по эндпоинтам.
+    """
+
+    def __init__(self, max_bytes=CACHE_MAX_BYTES, policy=ttl_policy):
+        self.max_bytes = max_bytes
+        self.policy = policy
+        self.size = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = {}
+        self.misses = {}
+        self.evictions = 0
+
+    def get(self, key):
+        """
+        Возвращает пару (ответ, итоговый URL) или None,
+        если записи нет или ее время жизни истекло.
+        """
+        name = endpoint_name(key)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.expires is not None and (
+                entry.expires <= time.monotonic()
+            ):
+                self._drop(key)
+                entry = None
+            if entry is None:
+                self.misses[name] = self.misses.get(name, 0) + 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits[name] = self.hits.get(name, 0) + 1
+            return entry.payload, entry.final_url
+
+    def put(self, key, payload, final_url, size):
+        """
+        Сохраняет ответ, если политика времени жизни это разрешает,
+        и вытесняет старые записи при превышении лимита по объему.
+        """
+        ttl = self.policy(endpoint_name(key), key, payload)
+        if ttl == 0 or size > self.max_bytes:
+            return
+        expires = None if ttl is None else time.monotonic() + ttl
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = CacheEntry(payload, final_url, expires, size)
+            self.size += size
+            while self.size > self.max_bytes:
+                self._drop(next(iter(self._entries)))
+                self.evictions += 1
+
+    def stats(self):
+        """Возвращает снимок счетчиков кэша."""
+        with self._lock:
+            hits = sum(self.hits.values())
+            total = hits + sum(self.misses.values())
+            return {
+                'entries': len(self._entries),
+                'bytes': self.size,
+                'hits': dict(self.hits),
+                'misses': dict(self.misses),
+                'evictions': self.evictions,
+                'hit_ratio': hits / total if total else 0.0,
+            }
+
+    def _drop(self, key):
+        entry = self._entries.pop(key)
+        self.size -= entry.size
+
+
+response_cache = ResponseCache()
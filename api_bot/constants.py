@@ -1,4 +1,39 @@
 """Модуль с константами для работы телеграм-бота NBA."""
+import os
+
+AGGREGATE_LAST_GAMES = 10
+
+AGGREGATE_BUTTONS = [
+    'Средние за выборку', f'Последние {AGGREGATE_LAST_GAMES} игр'
+]
+
+API_ASYNC_POOL_SIZE = 100
+
+API_BACKOFF_BASE = 0.5
+
+API_BACKOFF_MAX = 4
+
+API_PAGE_SIZE = 100
+
+API_POOL_SIZE = 10
+
+API_RATE_BURST = 10
+
+API_RATE_LIMIT = 60
+
+API_RATE_PERIOD = 60
+
+API_RETRIES = 2
+
+API_TIMEOUT = 6
+
+AVERAGES_CACHE_SIZE = 10000
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+CACHE_MAX_BYTES = 32 * 1024 * 1024
+
+CANCEL_CHECK_INTERVAL = 0.1
 
 CITIES = {
     'Los Angeles': 'Лос-Анджелес',
@@ -33,11 +68,19 @@ CITIES = {
     'Washington': 'Вашингтон',
 }
 
+COMPARE_MAX_PLAYERS = 5
+
+COMPARE_MIN_PLAYERS = 2
+
 CONFERENCE_KIND = {
     'West': 'Западной',
     'East': 'Восточной'
 }
 
+DATA_DIR = os.path.join(BASE_DIR, 'storage')
+
+DEFAULT_TIMEZONE = 'Europe/Moscow'
+
 DIVISIONS = {
     'Atlantic': 'Атлантический',
     'Northwest': 'Северо-Западный',
@@ -47,12 +90,42 @@ DIVISIONS = {
     'Southeast': 'Юго-Восточный'
 }
 
+EXECUTION_MODES = ('threaded', 'asyncio')
+
+FOLLOW_MAX_GAMES = 100
+
+FOLLOW_POLL_INTERVAL = 2 * 60
+
 FOOT_COEFF = 30.48
 
+FRAGMENT_CACHE_SIZE = 5000
+
 INCH_COEFF = 2.54
 
+LIVE_TTL = 10 * 60
+
+METRICS_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30
+)
+
+METRICS_PREFIX = 'nba_bot'
+
+PAGE_FETCH_RETRIES = 2
+
+PAGE_FETCH_WORKERS = 4
+
+PAGE_PLANNER_SIZE = 10000
+
 PERC_COEFF = 100
 
+PLAYER_FUZZY_THRESHOLD = 0.3
+
+PLAYER_SUGGESTIONS = 10
+
+PLAYERS_REFRESH_INTERVAL = 24 * 60 * 60
+
+PLAYERS_TTL = 24 * 60 * 60
+
 PLAYERS_ROLES = {
     'G': 'защитник',
     'F': 'форвард',
@@ -61,8 +134,71 @@ PLAYERS_ROLES = {
 
 POUND_COEFF = 0.45
 
+POLL_INTERVAL = 4.0
+
+PREFETCH_WORKERS = 2
+
+PROFILE_DEFAULT_SECONDS = 10
+
+PROFILE_INTERVAL = 0.01
+
+PROFILE_MAX_SECONDS = 300
+
+PROFILE_TOP = 25
+
+PRIORITY_INTERACTIVE = 0
+
+PRIORITY_BACKGROUND = 1
+
+RESERVED_TOKENS = {
+    PRIORITY_INTERACTIVE: 0,
+    PRIORITY_BACKGROUND: 3
+}
+
+API_QUEUE_DEADLINE = {
+    PRIORITY_INTERACTIVE: 15,
+    PRIORITY_BACKGROUND: 60
+}
+
+API_RETRY_BUDGET = {
+    PRIORITY_INTERACTIVE: 1,
+    PRIORITY_BACKGROUND: 10
+}
+
+SERVING_MODES = ('polling', 'webhook')
+
+SOURCE_TIMEZONE = 'US/Eastern'
+
+TEAMS_MISS_REFRESH_INTERVAL = 60 * 60
+
+TEAMS_REFRESH_INTERVAL = 24 * 60 * 60
+
+TEAMS_SNAPSHOT = os.path.join(BASE_DIR, 'data', 'teams.json')
+
+TEAMS_TTL = 21 * 24 * 60 * 60
+
+TELEGRAM_CHAT_BURST = 3
+
+TELEGRAM_CHAT_RATE = 1
+
+TELEGRAM_RATE_BURST = 5
+
+TELEGRAM_RATE_LIMIT = 30
+
+TELEGRAM_RATE_PERIOD = 1
+
+TELEGRAM_SEND_RETRIES = 3
+
+TELEGRAM_SEND_WORKERS = 8
+
+TIME_CACHE_SIZE = 4096
+
 TIME_OUT = 60
 
+WEBHOOK_MAX_BODY = 256 * 1024
+
+WEBHOOK_READ_TIMEOUT = 10
+
 VALID_ETALONS = { 
     'games': {
         1: '^([1-9]|[12][0-9]|3[0])$',
@@ -87,6 +223,10 @@ VALID_ETALONS = {
         )
     },
     'player': '^[a-zA-Z ]+$',
+    'compare': (
+        '^[a-zA-Z ]+(,[a-zA-Z ]+)'
+        f'{{{COMPARE_MIN_PLAYERS - 1},{COMPARE_MAX_PLAYERS - 1}}}$'
+    ),
     'average': '^[\d+]{4}$'
 }
 
@@ -0,0 +1,328 @@
+"""
+Конечный автомат диалогов бота.
+Состояние диалога - небольшое целое число, параметры выборки - запись
+с фиксированным набором полей. Переходы собираются один раз при загрузке
+модуля из таблиц VIEW_GAMES и VIEW_STATIX модуля constants в словарь
+с ключом (состояние, ответ пользователя).
+"""
+from constants import (
+    COMPARE_MAX_PLAYERS, COMPARE_MIN_PLAYERS, VIEW_GAMES, VIEW_STATIX
+)
+from validator import RULES
+
+(
+    PLAYER_SEARCH, PLAYER, AVERAGE,
+    GAMES_PLAYOFF, GAMES_TEAM, GAMES_TEAM_ID, GAMES_PERIOD, GAMES_SEASON,
+    GAMES_RANGE, GAMES_DAY, GAMES_DATES,
+    STATISTICS_GAME, STATISTICS_GAME_ID, STATISTICS_PLAYOFF,
+    STATISTICS_PERIOD, STATISTICS_SEASON, STATISTICS_RANGE, STATISTICS_DAY,
+    STATISTICS_DATES, COMPARE_PLAYERS, COMPARE_SEASON,
+) = range(21)
+
+MOVED, DONE, REJECTED = range(3)
+
+BACK_BUTTON = [['Назад'], ['В начало']]
+
+
+class Query:
+    """
+    Запись параметров выборки. Поля перечислены в __slots__ наследника
+    и по умолчанию равны None. Для сохранения запись сворачивается
+    в кортеж значений полей.
+    """
+
+    __slots__ = ()
+
+    def __init__(self, *values):
+        for name in self.__slots__:
+            setattr(self, name, None)
+        for name, value in zip(self.__slots__, values):
+            setattr(self, name, value)
+
+    def __getstate__(self):
+        return tuple(getattr(self, name) for name in self.__slots__)
+
+    def __setstate__(self, state):
+        self.__init__(*state)
+
+    def __eq__(self, other):
+        return (
+            type(self) is type(other)
+            and self.__getstate__() == other.__getstate__()
+        )
+
+    def __repr__(self):
+        return '{}{}'.format(type(self).__name__, self.__getstate__())
+
+
+class PlayerQuery(Query):
+    __slots__ = ('name',)
+
+
+class AverageQuery(Query):
+    __slots__ = ('season',)
+
+
+class GamesQuery(Query):
+    __slots__ = ('playoff', 'team_id', 'season', 'day', 'period')
+
+
+class StatisticsQuery(Query):
+    __slots__ = ('game_id', 'playoff', 'season', 'day', 'period')
+
+
+class CompareQuery(Query):
+    __slots__ = ('names', 'players', 'season')
+
+
+QUERIES = {
+    'player': PlayerQuery,
+    'average': AverageQuery,
+    'games': GamesQuery,
+    'statistics': StatisticsQuery,
+    'compare': CompareQuery,
+}
+
+
+class Step:
+    """
+    Шаг диалога: вопрос с кнопками, состояние для кнопки 'Назад' и,
+    для шагов со свободным ответом, правило проверки ответа, поле записи
+    для его значения и следующее состояние (None - выборка собрана).
+    """
+
+    __slots__ = ('flow', 'text', 'button', 'back', 'rule', 'field', 'target')
+
+    def __init__(
+        self, flow, text, button, back=None, rule=None, field=None,
+        target=None
+    ):
+        self.flow = flow
+        self.text = text
+        self.button = button
+        self.back = back
+        self.rule = rule
+        self.field = field
+        self.target = target
+
+
+def compile_dialog(flow, table, states, first, fields, final):
+    """
+    Собирает шаги и переходы диалога из таблицы VIEW_GAMES или
+    VIEW_STATIX. states - состояния для вопросов таблицы:
+    (выбор, свободный ответ после первой кнопки) для шагов 0-2 и
+    (выбор, (конкретный день, период)) для шага 3. first - текст и
+    кнопки первого вопроса диалога, предшествующего шагу 0 таблицы.
+    fields - поля записи для ответов шагов 0-2: первая кнопка шага
+    с вопросом 'additional' ведет к свободному ответу, без него -
+    записывает True, вторая кнопка записывает None. final - шаги,
+    свободный ответ на которых завершает выборку.
+    """
+    steps = {}
+    transitions = {}
+    back = None
+    for number in range(3):
+        choice, free = states[number]
+        entry = table[number]
+        if number == 0:
+            text, button = first
+        else:
+            text = table[number - 1]['text']
+            button = table[number - 1]['button']
+        steps[choice] = Step(flow, text, button, back)
+        following = states[number + 1][0]
+        field = fields[number]
+        first_answer, second_answer = entry['answer']
+        target = None if number in final else following
+        if 'additional' in entry:
+            steps[free] = Step(
+                flow, entry['additional'], BACK_BUTTON, choice,
+                RULES[(flow, number)], field, target
+            )
+            transitions[(choice, first_answer)] = (free, ())
+        else:
+            transitions[(choice, first_answer)] = (
+                following, ((field, True),)
+            )
+        transitions[(choice, second_answer)] = (following, ((field, None),))
+        back = choice
+
+    choice, (day, period) = states[3]
+    first_answer, second_answer = table[3]['answer']
+    steps[choice] = Step(flow, table[2]['text'], table[2]['button'], back)
+    transitions[(choice, first_answer)] = (day, (('period', None),))
+    transitions[(choice, second_answer)] = (period, (('day', None),))
+    for state, number, field in ((day, 4, 'day'), (period, 5, 'period')):
+        steps[state] = Step(
+            flow, table[3]['text'], table[3]['button'], choice,
+            RULES[(flow, number)], field
+        )
+    return steps, transitions
+
+
+def compile_dialogs():
+    steps = {
+        PLAYER_SEARCH: Step(
+            'player',
+            'Введите имя игрока, которого Вы хотите найти.\n'
+            '*Запрос должен быть на латинице*.',
+            [['В начало']], rule=RULES[('player', None)], field='name'
+        ),
+        PLAYER: Step(
+            'player', None,
+            [['Статистика сезона', 'Статистика по играм'], ['В начало']],
+            rule=RULES[('player', None)], field='name'
+        ),
+        AVERAGE: Step(
+            'average', VIEW_STATIX[2]['additional'], [['В начало']],
+            rule=RULES[('average', None)], field='season'
+        ),
+        COMPARE_PLAYERS: Step(
+            'compare',
+            'Введите через запятую имена игроков '
+            f'(от {COMPARE_MIN_PLAYERS} до {COMPARE_MAX_PLAYERS}), которых '
+            'Вы хотите сравнить.\n*Запрос должен быть на латинице*.\n'
+            'Например: _lebron james, stephen curry_',
+            [['В начало']], rule=RULES[('compare', None)], field='names',
+            target=COMPARE_SEASON
+        ),
+        COMPARE_SEASON: Step(
+            'compare', VIEW_STATIX[2]['additional'], BACK_BUTTON,
+            COMPARE_PLAYERS, RULES[('average', None)], 'season'
+        ),
+    }
+    transitions = {
+        (PLAYER, 'Статистика сезона'): (AVERAGE, ()),
+        (PLAYER, 'Статистика по играм'): (STATISTICS_GAME, ()),
+        (AVERAGE, 'Выбрать другой сезон'): (AVERAGE, ()),
+        (AVERAGE, 'Статистика по играм'): (STATISTICS_GAME, ()),
+        (COMPARE_SEASON, 'Выбрать другой сезон'): (COMPARE_SEASON, ()),
+        (COMPARE_SEASON, 'Сравнить других игроков'): (COMPARE_PLAYERS, ()),
+    }
+    for flow, table, states, first, fields, final in (
+        (
+            'games', VIEW_GAMES,
+            (
+                (GAMES_PLAYOFF, None), (GAMES_TEAM, GAMES_TEAM_ID),
+                (GAMES_PERIOD, GAMES_SEASON),
+                (GAMES_RANGE, (GAMES_DAY, GAMES_DATES)),
+            ),
+            (
+                'Какие игры Вас интересуют?',
+                [['Только плей-офф'], ['Все игры'], ['В начало']]
+            ),
+            ('playoff', 'team_id', 'season'), (2,)
+        ),
+        (
+            'statistics', VIEW_STATIX,
+            (
+                (STATISTICS_GAME, STATISTICS_GAME_ID),
+                (STATISTICS_PLAYOFF, None),
+                (STATISTICS_PERIOD, STATISTICS_SEASON),
+                (STATISTICS_RANGE, (STATISTICS_DAY, STATISTICS_DATES)),
+            ),
+            (
+                'Вы знаете ID игры и хотите посмотреть детали ее '
+                'статистики?\n\n_ID игры можно узнать в разделе "Игры"_',
+                [['Да', 'Нет'], ['В начало']]
+            ),
+            ('game_id', 'playoff', 'season'), (0, 2)
+        ),
+    ):
+        flow_steps, flow_transitions = compile_dialog(
+            flow, table, states, first, fields, final
+        )
+        steps.update(flow_steps)
+        transitions.update(flow_transitions)
+    return steps, transitions
+
+
+STEPS, TRANSITIONS = compile_dialogs()
+
+FIRST_STATES = {
+    'player': PLAYER_SEARCH,
+    'average': AVERAGE,
+    'games': GAMES_PLAYOFF,
+    'statistics': STATISTICS_GAME,
+    'compare': COMPARE_PLAYERS,
+}
+
+
+class Conversation:
+    """
+    Текущий диалог пользователя: состояние и запись параметров.
+    Хранится в user_data по ключу 'dialog'. Для сохранения сворачивается
+    в пару (состояние, кортеж полей записи).
+    """
+
+    __slots__ = ('state', 'query')
+
+    def __init__(self, state, query=None):
+        self.state = state
+        self.query = query or QUERIES[STEPS[state].flow]()
+
+    @classmethod
+    def start(cls, flow):
+        return cls(FIRST_STATES[flow])
+
+    @property
+    def step(self):
+        return STEPS[self.state]
+
+    @property
+    def flow(self):
+        return STEPS[self.state].flow
+
+    def answer(self, text):
+        """
+        Применяет ответ пользователя к диалогу. Возвращает MOVED, если
+        диалог перешел к следующему вопросу (возможно, в другом
+        диалоге), DONE, если выборка собрана, и REJECTED, если ответ
+        не подходит к текущему вопросу.
+        """
+        transition = TRANSITIONS.get((self.state, text))
+        if transition is not None:
+            target, assignments = transition
+            self.move(target)
+            for field, value in assignments:
+                setattr(self.query, field, value)
+            return MOVED
+        step = STEPS[self.state]
+        value = step.rule(text) if step.rule is not None else None
+        if value is None:
+            return REJECTED
+        setattr(self.query, step.field, value)
+        if step.target is None:
+            return DONE
+        self.move(step.target)
+        return MOVED
+
+    def move(self, state):
+        """
+        Переводит диалог в состояние state, при смене диалога - с новой
+        записью параметров.
+        """
+        if STEPS[state].flow != self.flow:
+            self.query = QUERIES[STEPS[state].flow]()
+        self.state = state
+
+    def back(self):
+        """
+        Возвращает диалог к предыдущему вопросу. Возвращает False,
+        если возвращаться некуда.
+        """
+        back = STEPS[self.state].back
+        if back is None:
+            return False
+        self.state = back
+        return True
+
+    def __getstate__(self):
+        return self.state, self.query.__getstate__()
+
+    def __setstate__(self, state):
+        self.state = state[0]
+        self.query = QUERIES[STEPS[self.state].flow](*state[1])
+
+    def __repr__(self):
+        return f'Conversation({self.state}, {self.query!r})'
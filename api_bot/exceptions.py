@@ -23,3 +23,21 @@ class ResponseEmptyFail(Exception):
     """Ошибка при получении пустого ответа от сервера API."""
 
     pass
+
+
+class RateLimitTimeout(Exception):
+    """Ошибка ожидания очереди к API-сервису дольше допустимого."""
+
+    pass
+
+
+class RequestCancelled(Exception):
+    """Запрос к API-сервису отменен, пока ждал своей очереди."""
+
+    pass
+
+
+class CoroutineSuspended(Exception):
+    """Обработчик-корутина приостановилась в многопоточном режиме."""
+
+    pass
@@ -0,0 +1,156 @@
+"""
+Подписки чатов на текущие игры.
+Все игры, на которые подписан хотя бы один чат, опрашиваются одной
+общей задачей одним запросом за цикл, поэтому число запросов к API
+зависит от числа отслеживаемых игр, а не от числа подписчиков.
+Подписчикам отправляются только изменения счета, периода и статуса.
+"""
+import logging
+import threading
+
+from constants import FOLLOW_MAX_GAMES
+
+logger = logging.getLogger(__name__)
+
+FINAL_STATUS = 'Final'
+
+
+def game_state(game):
+    """
+    Состояние игры, изменения которого отправляются подписчикам.
+    Время в периоде меняется постоянно и в состояние не входит.
+    """
+    return (
+        game.home_team_score, game.visitor_team_score, game.period,
+        game.status
+    )
+
+
+def describe_changes(previous, game):
+    """Список изменений игры по сравнению с состоянием previous."""
+    home_score, visitor_score, period, status = previous
+    changes = []
+    if (home_score, visitor_score) != (
+        game.home_team_score, game.visitor_team_score
+    ):
+        changes.append('Счёт: *{}:{}* (был {}:{}).'.format(
+            game.home_team_score, game.visitor_team_score,
+            home_score, visitor_score
+        ))
+    if game.status == FINAL_STATUS:
+        changes.append('Игра окончена.')
+    elif period != game.period and game.period:
+        changes.append('Начался {}-ый период.'.format(game.period))
+    elif status != game.status:
+        changes.append('Статус игры: {}.'.format(game.status))
+    return changes
+
+
+class GameFollower:
+    """
+    Подписки чатов на игры и последнее известное состояние каждой игры.
+    Функция запроса игр передается в start() и получает список ID игр;
+    poll() вызывается задачей JobQueue. Оконченные игры снимаются
+    с подписок после отправки итогового изменения.
+    """
+
+    def __init__(self, max_games=FOLLOW_MAX_GAMES):
+        self.max_games = max_games
+        self.fetch = None
+        self._subscribers = {}
+        self._states = {}
+        self._lock = threading.Lock()
+        self.polls = 0
+        self.changes = 0
+
+    def start(self, fetch):
+        self.fetch = fetch
+
+    def follow(self, chat_id, game):
+        """
+        Подписывает чат на игру (запись Game). Возвращает False, если
+        отслеживается уже max_games других игр.
+        """
+        with self._lock:
+            subscribers = self._subscribers.get(game.id)
+            if subscribers is None:
+                if len(self._subscribers) >= self.max_games:
+                    return False
+                subscribers = self._subscribers[game.id] = set()
+                self._states[game.id] = game_state(game)
+            subscribers.add(chat_id)
+            return True
+
+    def unfollow(self, chat_id, game_id=None):
+        """
+        Отписывает чат от игры game_id или, если она не указана,
+        от всех игр. Возвращает число снятых подписок.
+        """
+        with self._lock:
+            game_ids = (
+                [game_id] if game_id is not None else list(self._subscribers)
+            )
+            removed = 0
+            for item in game_ids:
+                subscribers = self._subscribers.get(item)
+                if subscribers is None or chat_id not in subscribers:
+                    continue
+                subscribers.discard(chat_id)
+                removed += 1
+                if not subscribers:
+                    self._drop(item)
+            return removed
+
+    def following(self, chat_id):
+        """ID игр, на которые подписан чат."""
+        with self._lock:
+            return sorted(
+                game_id for game_id, subscribers in self._subscribers.items()
+                if chat_id in subscribers
+            )
+
+    def poll(self):
+        """
+        Запрашивает все отслеживаемые игры одним запросом. Возвращает
+        список троек (игра, изменения, ID чатов-подписчиков) для игр,
+        состояние которых изменилось с прошлого опроса.
+        """
+        with self._lock:
+            game_ids = sorted(self._subscribers)
+        if not game_ids:
+            return []
+        games = self.fetch(game_ids)
+        updates = []
+        with self._lock:
+            self.polls += 1
+            for game in games:
+                subscribers = self._subscribers.get(game.id)
+                if not subscribers:
+                    continue
+                state = game_state(game)
+                previous = self._states[game.id]
+                if state != previous:
+                    self._states[game.id] = state
+                    changes = describe_changes(previous, game)
+                    if changes:
+                        updates.append((game, changes, sorted(subscribers)))
+                if game.status == FINAL_STATUS:
+                    self._drop(game.id)
+            self.changes += len(updates)
+        return updates
+
+    def stats(self):
+        with self._lock:
+            return {
+                'games': len(self._subscribers),
+                'subscriptions': sum(map(len, self._subscribers.values())),
+                'polls': self.polls,
+                'changes': self.changes,
+            }
+
+    def _drop(self, game_id):
+        self._subscribers.pop(game_id, None)
+        self._states.pop(game_id, None)
+
+
+game_follower = GameFollower()
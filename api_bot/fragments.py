@@ -0,0 +1,80 @@
+"""
+Кэш готовых фрагментов текста сообщений.
+Хранит результат функции отображения модуля models для каждой записи
+и каждого шаблона. Фрагмент пересобирается, только если изменилась
+версия записи - значения ее полей.
+"""
+import functools
+import threading
+from collections import OrderedDict
+
+from constants import FRAGMENT_CACHE_SIZE
+
+
+class FragmentCache:
+    """
+    LRU-кэш фрагментов Markdown с ключом (шаблон, ключ записи).
+    Вместе с фрагментом хранится версия записи, по которой он собран.
+    Размер ограничен числом фрагментов, старые вытесняются.
+    """
+
+    def __init__(self, size=FRAGMENT_CACHE_SIZE):
+        self.size = size
+        self._fragments = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, template, key, version, render, *args):
+        """
+        Возвращает фрагмент шаблона template для записи с ключом key
+        версии version. Если фрагмента нет или он собран по другой
+        версии записи, собирает его вызовом render(*args).
+        """
+        cache_key = (template, key)
+        with self._lock:
+            entry = self._fragments.get(cache_key)
+            if entry is not None and entry[0] == version:
+                self._fragments.move_to_end(cache_key)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+        text = render(*args)
+        with self._lock:
+            self._fragments[cache_key] = (version, text)
+            self._fragments.move_to_end(cache_key)
+            while len(self._fragments) > self.size:
+                self._fragments.popitem(last=False)
+        return text
+
+    def clear(self):
+        with self._lock:
+            self._fragments.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'fragments': len(self._fragments),
+                'hits': self.hits,
+                'misses': self.misses,
+            }
+
+
+fragment_cache = FragmentCache()
+
+
+def fragment(render):
+    """
+    Декоратор функции отображения записи: render(record, *args).
+    Версия фрагмента - значения полей записи и остальные аргументы.
+    """
+    template = render.__name__
+
+    @functools.wraps(render)
+    def cached(record, *args):
+        return fragment_cache.get(
+            template, record.key, (record.values(), args),
+            render, record, *args
+        )
+
+    return cached
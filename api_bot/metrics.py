@@ -0,0 +1,237 @@
+"""
+Метрики бота в текстовом формате Prometheus.
+Гистограммы длительности обработчиков, запросов к API-сервисам и
+отправки сообщений в Телеграм копятся в общем реестре metrics, счетчики
+кэшей, хранилища, ограничителя частоты и фоновых задач снимаются их
+методами stats() в момент запроса метрик. Метрики отдает встроенный
+HTTP-сервер MetricsServer по пути /metrics.
+"""
+import contextlib
+import contextvars
+import functools
+import logging
+import threading
+import time
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from constants import METRICS_BUCKETS, METRICS_PREFIX
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+current_handler = contextvars.ContextVar('current_handler', default=None)
+
+
+def escape(value):
+    return (
+        str(value).replace('\\', '\\\\').replace('"', '\\"')
+        .replace('\n', '\\n')
+    )
+
+
+def format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(
+        f'{name}="{escape(value)}"' for name, value in labels
+    ) + '}'
+
+
+def is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+class Metrics:
+    """
+    Реестр гистограмм и источников значений.
+    Гистограмма задается именем и набором меток; для нее хранятся
+    счетчики по границам buckets, сумма и число наблюдений.
+    Источник - функция без аргументов, возвращающая словарь stats():
+    числа становятся метриками-значениями (gauge), вложенные словари
+    чисел - метриками с меткой key по ключам словаря, словари словарей
+    (счетчики по эндпоинтам) - метриками по полям с меткой key.
+    """
+
+    def __init__(self, buckets=METRICS_BUCKETS, prefix=METRICS_PREFIX):
+        self.buckets = tuple(sorted(buckets))
+        self.prefix = prefix
+        self._histograms = {}
+        self._collectors = {}
+        self._lock = threading.Lock()
+
+    def observe(self, name, value, **labels):
+        """Добавляет наблюдение value в гистограмму name с метками labels."""
+        key = (name, tuple(sorted(
+            (label, str(item)) for label, item in labels.items()
+        )))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = [
+                    [0] * len(self.buckets), 0.0, 0
+                ]
+            counts = histogram[0]
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[index] += 1
+            histogram[1] += value
+            histogram[2] += 1
+
+    @contextlib.contextmanager
+    def timer(self, name, **labels):
+        """
+        Измеряет длительность блока в гистограмму name_duration_seconds.
+        Блок может дописать метки в полученный словарь (например,
+        status); если блок поднял исключение и status не задан,
+        ставится status="error".
+        """
+        start = time.monotonic()
+        try:
+            yield labels
+        except BaseException:
+            labels.setdefault('status', 'error')
+            raise
+        finally:
+            labels.setdefault('status', 'ok')
+            self.observe(
+                f'{name}_duration_seconds', time.monotonic() - start,
+                **labels
+            )
+
+    def handler(self, func):
+        """
+        Декоратор обработчика-корутины: длительность по имени функции.
+        Обработчики вызывают друг друга (check_answer передает сообщение
+        обработчику диалога), поэтому замер один - у внешнего вызова,
+        а метка handler - последний вызванный внутри него обработчик,
+        то есть тот, который разбирал сообщение.
+        """
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            labels = current_handler.get()
+            if labels is not None:
+                labels['handler'] = func.__name__
+                return await func(*args, **kwargs)
+            with self.timer('handler', handler=func.__name__) as labels:
+                token = current_handler.set(labels)
+                try:
+                    return await func(*args, **kwargs)
+                finally:
+                    current_handler.reset(token)
+        return wrapper
+
+    def register(self, name, collect):
+        """Подключает источник значений collect() под именем name."""
+        with self._lock:
+            self._collectors[name] = collect
+
+    def render(self):
+        """Все метрики в текстовом формате Prometheus."""
+        lines = []
+        with self._lock:
+            histograms = sorted(
+                (key, (list(value[0]), value[1], value[2]))
+                for key, value in self._histograms.items()
+            )
+            collectors = sorted(self._collectors.items())
+        current = None
+        for (name, labels), (counts, total, count) in histograms:
+            metric = f'{self.prefix}_{name}'
+            if metric != current:
+                lines.append(f'# TYPE {metric} histogram')
+                current = metric
+            for bound, value in zip(self.buckets, counts):
+                lines.append('{}_bucket{} {}'.format(
+                    metric, format_labels(labels + (('le', bound),)), value
+                ))
+            lines.append('{}_bucket{} {}'.format(
+                metric, format_labels(labels + (('le', '+Inf'),)), count
+            ))
+            lines.append(f'{metric}_sum{format_labels(labels)} {total}')
+            lines.append(f'{metric}_count{format_labels(labels)} {count}')
+        for name, collect in collectors:
+            try:
+                values = collect()
+            except Exception as error:
+                logger.warning('Метрики %s не получены: %s', name, error)
+                continue
+            lines.extend(self._gauges(f'{self.prefix}_{name}', values))
+        return '\n'.join(lines) + '\n'
+
+    @staticmethod
+    def _gauges(prefix, values):
+        samples = {}
+
+        def add(name, labels, value):
+            if is_number(value):
+                samples.setdefault(f'{prefix}_{name}', []).append(
+                    (labels, value)
+                )
+
+        for key, value in values.items():
+            if not isinstance(value, dict):
+                add(key, (), value)
+                continue
+            for inner, item in value.items():
+                if isinstance(item, dict):
+                    for field, number in item.items():
+                        add(field, (('key', inner),), number)
+                else:
+                    add(key, (('key', inner),), item)
+        lines = []
+        for metric, items in sorted(samples.items()):
+            lines.append(f'# TYPE {metric} gauge')
+            for labels, value in items:
+                lines.append(f'{metric}{format_labels(labels)} {value}')
+        return lines
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    """Отдает метрики реестра сервера на GET /metrics."""
+
+    def do_GET(self):
+        if self.path.split('?')[0].rstrip('/') != '/metrics':
+            return self._reply(HTTPStatus.NOT_FOUND, b'')
+        return self._reply(
+            HTTPStatus.OK, self.server.metrics.render().encode()
+        )
+
+    def log_message(self, format, *args):
+        logger.debug('Метрики: %s', format % args)
+
+    def _reply(self, status, body):
+        self.send_response(status)
+        self.send_header('Content-Type', CONTENT_TYPE)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class MetricsServer(ThreadingHTTPServer):
+    """HTTP-сервер метрик, работающий в отдельном потоке."""
+
+    daemon_threads = True
+
+    def __init__(self, listen, port, registry):
+        super().__init__((listen, port), MetricsHandler)
+        self.metrics = registry
+        self.thread = None
+
+    def start(self):
+        self.thread = threading.Thread(
+            target=self.serve_forever, name='metrics', daemon=True
+        )
+        self.thread.start()
+        logger.info(
+            'Метрики доступны на %s:%s/metrics.', *self.server_address[:2]
+        )
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+metrics = Metrics()
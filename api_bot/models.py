@@ -1,102 +1,305 @@
 """
 Модели для обработки JSON-ответов на запросы к API и 
 предоставления 'человекочитаемой' информации.
+Записи Team, Player, Game, StatLine и SeasonAverage - компактные
+объекты с фиксированным набором полей, которые собираются из JSON
+за один проход и хранятся в кэше ответов вместо словарей. Функции
+отображения принимают записи и только форматируют текст; готовые
+фрагменты текста хранятся в кэше fragment_cache модуля fragments.
 """
-import requests
-from datetime import datetime as DT
-import pytz
+import operator
+import sys
 
 from constants import (
     FOOT_COEFF, INCH_COEFF, PERC_COEFF,
     POUND_COEFF, PLAYERS_ROLES, CONFERENCE_KIND,
-    CITIES, DIVISIONS
+    CITIES, DIVISIONS, DEFAULT_TIMEZONE
 )
+from fragments import fragment
+from teams import team_registry
+from timeconv import date_view, tipoff_view
+
+STAT_FIELDS = (
+    'min', 'pts', 'reb', 'oreb', 'dreb', 'ast', 'stl', 'blk', 'turnover',
+    'pf', 'fga', 'fgm', 'fg_pct', 'fg3a', 'fg3m', 'fg3_pct', 'fta', 'ftm',
+    'ft_pct',
+)
+
+
+def intern(value):
+    """
+    Повторяющиеся короткие строки (даты, статусы, время) хранятся
+    в единственном экземпляре.
+    """
+    if isinstance(value, str):
+        return sys.intern(value)
+    return value
+
+
+class Record:
+    """
+    Запись ответа API-сервиса. Поля перечислены в __slots__ наследника,
+    отсутствующие в JSON поля равны None. Метод get() повторяет доступ
+    к полям словаря, поэтому запись можно передать коду, который
+    работает с JSON-ответом.
+    """
+
+    __slots__ = ()
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls._values = operator.attrgetter(*cls.__slots__)
+
+    def __init__(self, *values):
+        for name, value in zip(self.__slots__, values):
+            setattr(self, name, value)
+
+    @classmethod
+    def from_json(cls, data):
+        if data is None:
+            return None
+        return cls(*map(data.get, cls.__slots__))
+
+    @property
+    def key(self):
+        """Ключ записи в кэше фрагментов."""
+        return self.id
+
+    def get(self, name, default=None):
+        return getattr(self, name, default)
+
+    def values(self):
+        return self._values(self)
+
+    def footprint(self):
+        """
+        Оценка сверху памяти, занимаемой записью, в байтах: сама запись,
+        ее строки и числа с плавающей точкой и вложенные записи.
+        Команды хранятся в единственном экземпляре и не учитываются.
+        """
+        size = sys.getsizeof(self)
+        for value in self.values():
+            if isinstance(value, Record):
+                if not isinstance(value, Team):
+                    size += value.footprint()
+            elif isinstance(value, (str, float)):
+                size += sys.getsizeof(value)
+        return size
+
+    def __eq__(self, other):
+        return type(self) is type(other) and self.values() == other.values()
+
+    def __repr__(self):
+        return '{}{}'.format(type(self).__name__, self.values())
+
+
+class Team(Record):
+    """
+    Команда. Записи команд хранятся в единственном экземпляре на ID:
+    все игры и игроки одной команды ссылаются на один объект.
+    """
+
+    __slots__ = (
+        'id', 'abbreviation', 'city', 'conference', 'division', 'full_name',
+        'name',
+    )
+
+    _interned = {}
+
+    @classmethod
+    def from_json(cls, data):
+        if data is None:
+            return None
+        values = tuple(map(data.get, cls.__slots__))
+        team = cls._interned.get(values[0])
+        if team is None or team.values() != values:
+            team = cls(*values)
+            cls._interned[values[0]] = team
+        return team
+
+
+class Player(Record):
+    __slots__ = (
+        'id', 'first_name', 'last_name', 'position', 'height_feet',
+        'height_inches', 'weight_pounds', 'team',
+    )
+
+    @classmethod
+    def from_json(cls, data):
+        if data is None:
+            return None
+        player = super().from_json(data)
+        player.team = Team.from_json(player.team)
+        return player
+
+
+class Game(Record):
+    """
+    Игра. Дата хранится строкой 'гггг-мм-дд'. Команды есть только
+    у игр из эндпоинта games, в статистике по играм - только их ID.
+    """
+
+    __slots__ = (
+        'id', 'date', 'season', 'status', 'period', 'time', 'postseason',
+        'home_team_id', 'home_team_score', 'visitor_team_id',
+        'visitor_team_score', 'home_team', 'visitor_team',
+    )
+
+    @classmethod
+    def from_json(cls, data):
+        if data is None:
+            return None
+        game = super().from_json(data)
+        if game.date:
+            game.date = intern(game.date[:10])
+        game.status = intern(game.status)
+        game.time = intern(game.time)
+        if game.home_team is not None:
+            game.home_team = Team.from_json(game.home_team)
+            game.home_team_id = game.home_team.id
+        if game.visitor_team is not None:
+            game.visitor_team = Team.from_json(game.visitor_team)
+            game.visitor_team_id = game.visitor_team.id
+        return game
+
+
+class StatLine(Record):
+    """Статистика игрока в отдельной игре."""
+
+    __slots__ = ('id', 'game', 'player_id', 'team_id') + STAT_FIELDS
+
+    @classmethod
+    def from_json(cls, data):
+        if data is None:
+            return None
+        line = cls(
+            data.get('id'), Game.from_json(data.get('game')),
+            (data.get('player') or {}).get('id'),
+            (data.get('team') or {}).get('id'),
+            *map(data.get, STAT_FIELDS)
+        )
+        line.min = intern(line.min)
+        return line
 
-TZ1 = pytz.timezone('US/Eastern')
-TZ2 = pytz.timezone('Europe/Moscow')
 
-response = requests.get('https://www.balldontlie.io/api/v1/teams')
-teams_list = response.json().get('data')
+class SeasonAverage(Record):
+    """Средние показатели игрока за сезон."""
 
+    __slots__ = ('player_id', 'season', 'games_played') + STAT_FIELDS
 
-def player(response):
+    @property
+    def key(self):
+        return self.player_id, self.season
+
+
+RECORDS = {
+    'games': Game,
+    'stats': StatLine,
+    'season_averages': SeasonAverage,
+}
+
+
+def compact_payload(name, payload, size):
+    """
+    Заменяет записи JSON-ответа эндпоинта name объектами моделей.
+    Возвращает пару: ответ и оценку занимаемой им памяти в байтах.
+    Ответы остальных эндпоинтов возвращает без изменений с размером
+    size.
     """
-    Модель возвращает информацию об игроке.
+    record = RECORDS.get(name)
+    data = payload.get('data') if isinstance(payload, dict) else None
+    if record is None or not isinstance(data, list):
+        return payload, size
+    records = [record.from_json(item) for item in data]
+    size = sys.getsizeof(records) + sum(item.footprint() for item in records)
+    return dict(payload, data=records), size
+
+
+def percent(value):
+    if 1 > value < 0:
+        value = value * PERC_COEFF
+    return value
+
+
+def player(record):
+    """
+    Модель возвращает информацию об игроке и его команде.
     Переводит единицы измерения в систему СИ.
     """
-    id = response.get('id')
-    first_name = response.get('first_name')
-    last_name = response.get('last_name')
-    position = response.get('position')
+    return player_card(record) + team_max(record.team)
+
+
+@fragment
+def player_card(record):
     height = weight = ''
-    if response.get('height_feet'):
-        feet = response.get('height_feet')
-        inches = response.get('height_inches')
-        height_str = int(feet * FOOT_COEFF + inches * INCH_COEFF)
+    if record.height_feet:
+        height_str = int(
+            record.height_feet * FOOT_COEFF
+            + record.height_inches * INCH_COEFF
+        )
         height = 'Рост: {} см.'.format(height_str)
-    if response.get('weight_pounds'):
-        pounds = response.get('weight_pounds')
-        weight_str = int(pounds * POUND_COEFF)
+    if record.weight_pounds:
+        weight_str = int(record.weight_pounds * POUND_COEFF)
         weight = 'Вес: {} кг.'.format(weight_str)
-    team = team_max(response.get('team'))
+    position = record.position
     player_str = (
         '*{} {}*.\n\n'
         '_ID игрока - {}_.\n'
         'Амплуа: {}.\n'
         '{}\n{}\n'
         'Выступает (или выступал перед окончанием карьеры) за команду:\n'
-        '{}'
     ).format(
-        first_name,
-        last_name,
-        id,
+        record.first_name,
+        record.last_name,
+        record.id,
         PLAYERS_ROLES.get(position, position or '(нет данных)'),
         height,
-        weight,
-        team
+        weight
     )
     return player_str
 
 
-def team_max(response):
+def team_full_name_by_id(team_id):
+    """Возвращает полное название команды по ID из реестра команд."""
+    team = team_registry.get(team_id)
+    if team is None:
+        return 'Команда с ID {}'.format(team_id)
+    return team.get('full_name')
+
+
+def team_max(team):
     """
     Модель возвращает инофрмацию о команде в полном объеме.
+    Данные команды берет из реестра команд, если она там есть.
     """
-    id = response.get('id')
-    abbreviation = response.get('abbreviation')
-    city = response.get('city')
-    conference = response.get('conference')
-    division = response.get('division')
-    full_name = response.get('full_name')
-    name = response.get('name')
+    return team_card(Team.from_json(team_registry.get(team.id)) or team)
+
+
+@fragment
+def team_card(team):
     team_str = (
         '*{}* или просто *{}* из города {}.\n'
         '_ID команды - {}_.\n'
         'Аббревиатура команды - {}.\n'
         '{} дивизион {} конференции NBA.\n'
     ).format(
-        full_name,
-        name,
-        CITIES.get(city, city),
-        id,
-        abbreviation,
-        DIVISIONS.get(division),
-        CONFERENCE_KIND.get(conference, conference)
+        team.full_name,
+        team.name,
+        CITIES.get(team.city, team.city),
+        team.id,
+        team.abbreviation,
+        DIVISIONS.get(team.division),
+        CONFERENCE_KIND.get(team.conference, team.conference)
     )
     return team_str
 
 
-def team_min(response):
+@fragment
+def team_min(team):
     """
     Модель возвращает инофрмацию о команде в 'сжатом' объеме.
     Используется для создания списка текущих команд.
     """
-    id = response.get('id')
-    abbreviation = response.get('abbreviation')
-    city = response.get('city')
-    conference = response.get('conference')
-    division = response.get('division')
-    full_name = response.get('full_name')
     team_str = (
         '_ID - {}_.\n'
         '*{}* ({}).\n'
@@ -104,49 +307,23 @@ def team_min(response):
         '{} дивизион {} конференции.\n'
         '------------------------------'
     ).format(
-        id,
-        full_name,
-        abbreviation,
-        CITIES.get(city, city),
-        DIVISIONS.get(division),
-        CONFERENCE_KIND.get(conference, conference)
+        team.id,
+        team.full_name,
+        team.abbreviation,
+        CITIES.get(team.city, team.city),
+        DIVISIONS.get(team.division),
+        CONFERENCE_KIND.get(team.conference, team.conference)
     )
     return team_str
 
 
-def statistics_per_season(response):
+@fragment
+def statistics_per_season(average):
     """
     Модель возвращает информацию с обобщенной статистикой игрока 
     за определенный сезон.
     """
-    games_played = response.get('games_played')
-    player_id = response.get('player_id')
-    season = response.get('season')
-    ast = response.get('ast')
-    blk = response.get('blk')
-    dreb = response.get('dreb')
-    fg3_pct = (response.get('fg3_pct'))
-    if 1 > fg3_pct < 0:
-        fg3_pct = (response.get('fg3_pct')) * PERC_COEFF
-    fg3a = response.get('fg3a')
-    fg3m = response.get('fg3m')
-    fg_pct = (response.get('fg_pct'))
-    if 1 > fg_pct < 0:
-        fg_pct = (response.get('fg_pct')) * PERC_COEFF
-    fga = response.get('fga')
-    fgm = response.get('fgm')
-    ft_pct = (response.get('ft_pct'))
-    if 1 > ft_pct < 0:
-        ft_pct = (response.get('ft_pct')) * PERC_COEFF
-    fta = response.get('fta')
-    ftm = response.get('ftm')
-    min = response.get('min')
-    oreb = response.get('oreb')
-    pf = response.get('pf')
-    pts = response.get('pts')
-    reb = response.get('reb')
-    stl = response.get('stl')
-    turnover = response.get('turnover')
+    season = average.season
     if season:
         season = '{}-{}'.format(season, season + 1)
     statistics_str = (
@@ -168,76 +345,131 @@ def statistics_per_season(response):
         '- потери мяча: *{}*\n'
         '- персональные замечания: *{}*\n'
     ).format(
-        season, games_played, min, pts, fga, fgm, fg_pct, fg3a,
-        fg3m, fg3_pct, fta, ftm, ft_pct, reb, oreb, dreb, ast,
-        stl, blk, turnover, pf
+        season, average.games_played, average.min, average.pts,
+        average.fga, average.fgm, percent(average.fg_pct),
+        average.fg3a, average.fg3m, percent(average.fg3_pct),
+        average.fta, average.ftm, percent(average.ft_pct),
+        average.reb, average.oreb, average.dreb, average.ast,
+        average.stl, average.blk, average.turnover, average.pf
     )
     return statistics_str
 
 
-def statistics_per_game(response):
+RANGE_ROWS = (
+    ('набранные очки', 'pts'), ('подборы', 'reb'),
+    ('подборы в нападении', 'oreb'), ('подборы в защите', 'dreb'),
+    ('результативные передачи', 'ast'), ('перехваты', 'stl'),
+    ('блоки', 'blk'),
+)
+RANGE_SHOTS = (
+    ('броски с игры', 'fga', 'fgm'), ('3-очковые броски', 'fg3a', 'fg3m'),
+    ('штрафные броски', 'fta', 'ftm'),
+)
+RANGE_FAULTS = (('потери мяча', 'turnover'), ('персональные замечания', 'pf'))
+
+
+def statistics_per_range(summary):
+    """
+    Модель возвращает обобщенную статистику игрока за произвольную 
+    выборку игр (итоги Summary модуля aggregation): средние за игру, 
+    суммы и показатели в пересчете на 36 минут.
+    """
+    averages = summary.averages
+
+    def row(sign, label, field):
+        return '{} {}: *{:.1f}* ({:.0f} / {:.1f})'.format(
+            sign, label, averages[field], summary.totals[field],
+            summary.per_minutes[field]
+        )
+
+    lines = [
+        'Игры с *{}* по *{}*.'.format(
+            date_view(summary.first_date), date_view(summary.last_date)
+        ),
+        'Сыгранных игр: *{}*.'.format(summary.games),
+        'Средние данные за игру по показателям '
+        '(в скобках - сумма и значение в пересчете на 36 минут):',
+        '+ сыгранные минуты: *{:.1f}* ({:.0f})'.format(
+            summary.minutes / summary.games, summary.minutes
+        ),
+    ]
+    lines.extend(row('+', label, field) for label, field in RANGE_ROWS)
+    for label, attempted, made in RANGE_SHOTS:
+        lines.append(row('+', label, attempted))
+        lines.append(row('++ из них результативные', label, made))
+        accuracy = summary.percent(made, attempted)
+        lines.append('++ точность: *{}* %'.format(
+            '-' if accuracy is None else '{:.1f}'.format(accuracy)
+        ))
+    lines.extend(row('-', label, field) for label, field in RANGE_FAULTS)
+    return '\n'.join(lines) + '\n'
+
+
+COMPARISON_ROWS = (
+    ('Игры', 'games_played'), ('Минуты', 'min'), ('Очки', 'pts'),
+    ('Бр.', 'fga'), ('Бр.поп', 'fgm'), ('Бр.%', 'fg_pct'),
+    ('3оч', 'fg3a'), ('3оч.п', 'fg3m'), ('3оч%', 'fg3_pct'),
+    ('Штр', 'fta'), ('Штр.п', 'ftm'), ('Штр%', 'ft_pct'),
+    ('Подб', 'reb'), ('Подб.н', 'oreb'), ('Подб.з', 'dreb'),
+    ('Перед', 'ast'), ('Перех', 'stl'), ('Блоки', 'blk'),
+    ('Потери', 'turnover'), ('Фолы', 'pf'),
+)
+COMPARISON_LABEL = 7
+COMPARISON_COLUMN = 7
+
+
+def comparison_value(average, field):
+    if average is None:
+        return '-'
+    value = getattr(average, field)
+    if value is None:
+        return '-'
+    if field.endswith('_pct'):
+        if 0 <= value <= 1:
+            value = value * PERC_COEFF
+        return '{:.1f}'.format(value)
+    return str(value)
+
+
+def season_comparison(averages, names):
+    """
+    Модель возвращает таблицу средних показателей нескольких игроков 
+    за сезон: по строке на показатель и по столбцу на игрока.
+    averages - записи SeasonAverage (None - у игрока нет данных 
+    за сезон), names - подписи столбцов. Точность бросков в таблице 
+    указана в процентах.
+    """
+    width = COMPARISON_COLUMN
+    lines = [' ' * COMPARISON_LABEL + ''.join(
+        '{:>{}}'.format(name[:width - 1], width) for name in names
+    )]
+    for label, field in COMPARISON_ROWS:
+        lines.append('{:<{}}'.format(label, COMPARISON_LABEL) + ''.join(
+            '{:>{}}'.format(comparison_value(average, field), width)
+            for average in averages
+        ))
+    return '```\n{}\n```'.format('\n'.join(lines))
+
+
+def statistics_per_game(line):
     """
     Модель возвращает информацию со статистикой игрока 
     в отдельной игре.
     """
-    id = response.get('id')
-    ast = response.get('ast')
-    blk = response.get('blk')
-    dreb = response.get('dreb')
-    fg3_pct = (response.get('fg3_pct'))
-    if 1 > fg3_pct < 0:
-        fg3_pct = (response.get('fg3_pct')) * PERC_COEFF
-    fg3a = response.get('fg3a')
-    fg3m = response.get('fg3m')
-    fg_pct = (response.get('fg_pct'))
-    if 1 > fg_pct < 0:
-        fg_pct = (response.get('fg_pct')) * PERC_COEFF
-    fga = response.get('fga')
-    fgm = response.get('fgm')
-    ft_pct = (response.get('ft_pct'))
-    if 1 > ft_pct < 0:
-        ft_pct = (response.get('ft_pct')) * PERC_COEFF
-    fta = response.get('fta')
-    ftm = response.get('ftm')
-    game = response.get('game')
-    game_id = game.get('id')
-    game_date = game.get('date').split('T')[0]
-    game_date = game_date.split('-')
-    game_date = '-'.join([game_date[2], game_date[1], game_date[0]])
-    game_home_team_id = game.get('home_team_id')
-    game_home_team_score = game.get('home_team_score')
-    game_season = game.get('season')
-    game_visitor_team_id = game.get('visitor_team_id')
-    game_visitor_team_score = game.get('visitor_team_score')
-    min = response.get('min')
-    oreb = response.get('oreb')
-    pf = response.get('pf')
-    player = response.get('player')
-    player_id = player.get('id')
-    player_first_name = player.get('first_name')
-    player_last_name = player.get('last_name')
-    player_position = player.get('position')
-    player_team_id = player.get('team_id')
-    pts = response.get('pts')
-    reb = response.get('reb')
-    stl = response.get('stl')
-    team = response.get('team')
-    team_id = team.get('id')
-    team_abbreviation = team.get('abbreviation')
-    team_city = team.get('city')
-    team_conference = team.get('conference')
-    team_division = team.get('division')
-    team_full_name = team.get('full_name')
-    team_name = team.get('name')
-    turnover = response.get('turnover')
-    if game_season:
-        game_season = '{}-{}'.format(game_season, game_season + 1)
-    game_home_team_name = teams_list[
-        game_home_team_id - 1
-    ].get('full_name')
-    game_visitor_team_name = teams_list[
-        game_visitor_team_id - 1
-    ].get('full_name')
+    game = line.game
+    return game_statistics(
+        line,
+        team_full_name_by_id(game.home_team_id),
+        team_full_name_by_id(game.visitor_team_id)
+    )
+
+
+@fragment
+def game_statistics(line, home_team, visitor_team):
+    game = line.game
+    season = game.season
+    if season:
+        season = '{}-{}'.format(season, season + 1)
     statistics_game_str = (
         'Сезон: {}\n'
         '{}\n'
@@ -259,49 +491,46 @@ def statistics_per_game(response):
         '- потери мяча: *{}*\n'
         '- персональные замечания: *{}*\n'
     ).format(
-        game_season, game_date,
-        game_home_team_name, game_visitor_team_name, 
-        game_home_team_score, game_visitor_team_score,
-        min, pts, fga, fgm, fg_pct, fg3a,
-        fg3m, fg3_pct, fta, ftm, ft_pct,
-        reb, oreb, dreb, ast,
-        stl, blk, turnover, pf
+        season, date_view(game.date), home_team, visitor_team,
+        game.home_team_score, game.visitor_team_score,
+        line.min, line.pts, line.fga, line.fgm, percent(line.fg_pct),
+        line.fg3a, line.fg3m, percent(line.fg3_pct),
+        line.fta, line.ftm, percent(line.ft_pct),
+        line.reb, line.oreb, line.dreb, line.ast,
+        line.stl, line.blk, line.turnover, line.pf
     )
     return statistics_game_str
 
 
-def game_view(response):
+@fragment
+def game_view(record, timezone=DEFAULT_TIMEZONE):
     """
     Модель возвращает информацию об отдельных играх, 
     их состоянии и результатах. 
-    Переводит время из восточно-американского в московкое.
+    Переводит время начала игры из восточно-американского в часовой
+    пояс пользователя timezone (по умолчанию - московское).
     """
-    id = response.get('id')
-    date = response.get('date').split('T')[0]
-    date = date.split('-')
-    date = '-'.join([date[2], date[1], date[0]])
-    home_team_score = response.get('home_team_score')
-    visitor_team_score = response.get('visitor_team_score')
-    season = response.get('season')
+    date = date_view(record.date)
+    season = record.season
     if season:
         season = '{}-{}'.format(season, season + 1)
-    period = response.get('period')
-    status = response.get('status')
-    time = response.get('time')
-    date_time = date + ' ' + status
-    postseason = response.get('postseason')
+    period = record.period
+    status = record.status
+    time = record.time
     game_type = 'Регулярный чемпионат'
-    if postseason:
+    if record.postseason:
         game_type = 'Игры плей-офф'
-    home_team = response.get('home_team').get('full_name')
-    visitor_team =  response.get('visitor_team').get('full_name')
-    if period == 0:
-        time = TZ1.localize(
-            DT.strptime(date_time, "%d-%m-%Y %I:%M %p")
-        ).astimezone(TZ2).strftime("%d-%m-%Y %H:%M")
-        time = time.split()
+    start = tipoff_view(record.date, status, timezone) if period == 0 else None
+    if start is not None:
+        zone = 'мск времени'
+        if timezone != DEFAULT_TIMEZONE:
+            zone = 'по времени {}'.format(timezone)
+        status_view = (
+            'Начало игры {} в {} {}.\n'.format(start[0], start[1], zone)
+        )
+    elif period == 0:
         status_view = (
-            'Начало игры {} в {} мск времени.\n'.format(time[0], time[1])
+            'Дата {}.\nИгра еще не началась.\n'.format(date)
         )
     elif status == 'Final':
         status_view = (
@@ -324,9 +553,10 @@ def game_view(response):
         '{}\n'
         'Счёт: {}:{}\n'
     ).format(
-        season, id,
-        home_team, visitor_team, game_type,
+        season, record.id,
+        record.home_team.full_name, record.visitor_team.full_name,
+        game_type,
         status_view,
-        home_team_score, visitor_team_score,
+        record.home_team_score, record.visitor_team_score,
     )
     return game
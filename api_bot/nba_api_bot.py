@@ -1,40 +1,87 @@
 """Телеграм-бот для просмотра статистики NBA."""
+import functools
 import logging
 import os
+import signal
 import sys
+import threading
 
-import requests
 import telegram
-import time
 from http import HTTPStatus
 from datetime import datetime
 
 from dotenv import load_dotenv
 from telegram.ext import CommandHandler, Filters, MessageHandler, Updater
 
-from constants import TIME_OUT, VIEW_GAMES, VIEW_STATIX
+from api_client import api_client, async_api_client, endpoint_name
+from aggregation import StatColumns, aggregate
+from async_runner import (
+    EventLoopThread, in_event_loop, run_blocking, run_sync, sync_callback
+)
+from averages import season_averages
+from cache import is_immutable, normalize_url, response_cache
+from constants import (
+    AGGREGATE_BUTTONS, AGGREGATE_LAST_GAMES, API_RATE_LIMIT, API_RATE_PERIOD,
+    COMPARE_MIN_PLAYERS, DEFAULT_TIMEZONE, EXECUTION_MODES, FOLLOW_MAX_GAMES,
+    FOLLOW_POLL_INTERVAL, PLAYER_SUGGESTIONS, POLL_INTERVAL,
+    PRIORITY_BACKGROUND, PRIORITY_INTERACTIVE, PROFILE_DEFAULT_SECONDS,
+    PROFILE_MAX_SECONDS, SERVING_MODES
+)
+from dialog import (
+    COMPARE_PLAYERS, COMPARE_SEASON, DONE, MOVED, PLAYER, REJECTED,
+    Conversation
+)
 from exceptions import (
     ApiRequestTrouble,
     ApiStatusTrouble,
+    RateLimitTimeout,
     ResponseEmptyFail,
     SendMessageFail
 )
+from follow import game_follower
+from fragments import fragment_cache
+from metrics import MetricsServer, metrics
 from models import (
-    game_view, player,
+    Player, Team,
+    compact_payload, game_view, player, season_comparison,
     team_min,
     statistics_per_season,
-    statistics_per_game
+    statistics_per_game,
+    statistics_per_range
 )
-from validator import validator
+from page_fetcher import page_fetcher
+from pagination import iter_records, page_planner
+from players import full_name, normalize_name, player_catalog
+from prefetch import page_prefetcher
+from profiler import profiler
+from rate_limiter import rate_limiter
+from send_queue import send_queue
+from singleflight import request_flights
+from store import history_store
+from teams import team_registry
+from timeconv import cache_info as time_cache_info, is_timezone
+from webhook import WebhookServer
 
 
 load_dotenv()
 
-ENDPOINT = 'https://www.balldontlie.io/api/v1/'
-ENDPOINT_PHOTO_SEARCH = 'https://imsea.herokuapp.com/api/1'
+ENDPOINT = os.getenv('API_ENDPOINT', 'https://www.balldontlie.io/api/v1/')
+ENDPOINT_PHOTO_SEARCH = os.getenv(
+    'PHOTO_SEARCH_ENDPOINT', 'https://imsea.herokuapp.com/api/1'
+)
 
 ADMIN_ID = os.getenv('ADMIN_ID') # Айди аккаунта админа в телеграм
 BOT_TOKEN = os.getenv('BOT_TOKEN') # Токен бота в телеграм
+# Режим работы обработчиков: threaded или asyncio
+EXECUTION_MODE = os.getenv('EXECUTION_MODE', 'threaded')
+# Способ получения обновлений: polling или webhook
+SERVING_MODE = os.getenv('SERVING_MODE', 'polling')
+WEBHOOK_LISTEN = os.getenv('WEBHOOK_LISTEN', '0.0.0.0')
+WEBHOOK_PORT = int(os.getenv('WEBHOOK_PORT', 8443))
+WEBHOOK_SECRET = os.getenv('WEBHOOK_SECRET') # Секретный путь вебхука
+WEBHOOK_URL = os.getenv('WEBHOOK_URL') # Внешний адрес сервера вебхука
+METRICS_LISTEN = os.getenv('METRICS_LISTEN', '127.0.0.1')
+METRICS_PORT = int(os.getenv('METRICS_PORT', 0)) # 0 - метрики отключены
 TOKENS_NAME = {
     ADMIN_ID: 'ID администратора',
     BOT_TOKEN: 'Токен бота'
@@ -49,8 +96,6 @@ formatter = logging.Formatter(
 handler.setFormatter(formatter)
 logger.addHandler(handler)
 
-cache_dict = {}
-
 
 def check_tokens():
     """Проверяет наличие токена и ID чата администратора."""
@@ -68,7 +113,7 @@ def check_tokens():
     return False
 
 
-def send_error_message(update, context):
+async def send_error_message(update, context):
     """
     Логирует ошибки и отправляет сообщение администратору в Телеграм. 
     Пользователя перенаправляет на 'главную страницу'.
@@ -89,7 +134,7 @@ def send_error_message(update, context):
         context.bot_data['errors'][date] = list()
 
     if context.error not in context.bot_data['errors'][date]:
-        send_text_message(
+        await send_text_message(
             context=context,
             chat_id=ADMIN_ID,
             text=text,
@@ -99,56 +144,65 @@ def send_error_message(update, context):
         context.bot_data['errors'][date].append(context.error)
 
     text = "Возникла непредвиденная ошибка. Мы уже разбираемся."
+    if isinstance(context.error, RateLimitTimeout):
+        text = (
+            'Сейчас к сервису статистики слишком много запросов. '
+            'Попробуйте повторить запрос через минуту.'
+        )
     logger.info('Вынужденный редирект пользователя на главную страницу.')
 
-    return get_head_page(update, context, False, text=text)
+    return await get_head_page(update, context, False, text=text)
 
 
-def check_answer(update, context):
+@metrics.handler
+async def check_answer(update, context):
     """
     В зависимости от сообщения пользователя возвращает функцию обратного ответа.
+    Кнопки навигации ищутся в словаре COMMANDS, пункты начального меню - 
+    в словаре MENU_COMMANDS. Внутри диалога ответ применяется к автомату 
+    диалогов (модуль dialog), и результат передается обработчику текущего 
+    диалога из словаря FLOW_HANDLERS.
     Если не выбран ни одна функция - возвращает начальное меню.
+    Любой ответ, кроме листания и расчета средних по выборке, уводит 
+    пользователя из листания страниц, поэтому фоновая подгрузка страниц 
+    для его чата отменяется.
     """
     logger.debug('Начало работы функции %s.', check_answer.__name__)
     text = update.message.text
-    if text == 'В начало':
-        return get_head_page(update, context, False)
-    if text == 'Назад':
-        return back_to_the_future(update, context)
-    if text in ('Следующие игры', 'Предыдущие игры'):
-        return flipp_pages(update, context)
-    if text == 'Игроки и статистика' or context.user_data.get(
-        'player'
-    ) is not None:
-        if text == 'Статистика по играм' or context.user_data.get(
-            'statistics'
-        ) is not None:
-            return preview_statistics(update, context)
-        if text in (
-            'Статистика сезона', 'Выбор другого сезона'
-        ) or context.user_data.get('average') is not None:
-            return view_season_statistics(update, context)
-        return search_player(update, context)
-    if text == 'Команды':
-        return view_teams(update, context)
-    if text == 'Игры' or context.user_data.get('games') is not None:
-        return preview_games(update, context)
-    return get_head_page(update, context, False)
-
-
-def send_text_message(
-    context, chat_id, text, reply_markup=None, parse_mode='Markdown'
+    if text not in PAGED_VIEW_ANSWERS:
+        page_prefetcher.cancel(update.effective_chat.id)
+    conversation = context.user_data.get('dialog')
+    handler = COMMANDS.get(text)
+    if handler is None and conversation is None:
+        handler = MENU_COMMANDS.get(text)
+    if handler is not None:
+        return await handler(update, context)
+    if conversation is None:
+        return await get_head_page(update, context, False)
+    outcome = conversation.answer(text)
+    return await FLOW_HANDLERS[conversation.flow](update, context, outcome)
+
+
+async def send_text_message(
+    context, chat_id, text, reply_markup=None, parse_mode='Markdown',
+    priority=PRIORITY_INTERACTIVE
 ):
     """
     Все текстовые сообщения пользователям в Телеграм отправляются 
     через эту функцию. Перехватывает и логирует возникающие при отправке 
     ошибки.
+    Сообщения уходят через очередь send_queue с ограничениями частоты 
+    Телеграма: ответы пользователям (PRIORITY_INTERACTIVE) раньше 
+    уведомлений (PRIORITY_BACKGROUND). В многопоточном режиме сообщение 
+    только ставится в очередь, сбои отправки логирует очередь.
     """
     logger.debug('Начало отправки текстового сообщения ботом.')
 
     try:
-        context.bot.send_message(
+        await send_queue.send(
+            context.bot.send_message,
             chat_id=chat_id,
+            priority=priority,
             text=text,
             reply_markup=reply_markup,
             parse_mode=parse_mode
@@ -161,18 +215,19 @@ def send_text_message(
         logger.debug('Бот отправил текстовое сообщение: %s', text)
 
 
-def send_photo_message(
+async def send_photo_message(
     context, chat_id, photo, caption, reply_markup, parse_mode='Markdown'
 ):
     """
     Все сообщения с фотографиями пользователям в Телеграм отправляются 
-    через эту функцию. Перехватывает и логирует возникающие при отправке 
-    ошибки.
+    через эту функцию (и очередь send_queue). Перехватывает и логирует 
+    возникающие при отправке ошибки.
     """
     logger.debug('Начало отправки сообщения с фотографией ботом.')
 
     try:
-        context.bot.send_photo(
+        await send_queue.send(
+            context.bot.send_photo,
             chat_id=chat_id,
             photo=photo,
             caption=caption,
@@ -187,35 +242,212 @@ def send_photo_message(
         logger.debug('Бот отправил сообщение с фото: \n%s\n$s', photo, caption)
 
 
-def check_api_service(endpoint, params=None):
+async def send_document_message(
+    context, chat_id, document, filename, priority=PRIORITY_INTERACTIVE
+):
     """
-    Посредством этой функции производятся все запросы к внешним сервисам API.
-    Функция проверяет HTTP-статус полученного ответа от API-сервиса, а также 
-    перехватывает и логирует все ошибки при отправке запросов.
+    Документы (файлы) пользователям в Телеграм отправляются через эту 
+    функцию (и очередь send_queue). document - содержимое файла в байтах.
     """
-    logger.debug('Начало работы функции %s.', check_api_service.__name__)
+    logger.debug('Начало отправки документа ботом.')
+
     try:
-        response = requests.get(endpoint, params=params, timeout=6)
+        await send_queue.send(
+            context.bot.send_document,
+            chat_id=chat_id,
+            priority=priority,
+            document=document,
+            filename=filename
+        )
     except Exception as error:
-        raise ApiRequestTrouble(
-            f'Сбой при запросе к эндпоинту {endpoint}.\n'
-            f'Параметры запроса: {params}.\n'
-            f'Ошибка: {error}.'
+        raise SendMessageFail(
+            f'Сбой при отправке документа в Телеграмм.\n{error}'
         )
     else:
-        if response.status_code == HTTPStatus.OK:
-            endpoint = response.url
-            logger.debug('Запрос ушел на эндпоинт %s.', endpoint)
-            response = response.json()
-            return response, endpoint
-        if response.status_code == HTTPStatus.TOO_MANY_REQUESTS:
-            logger.warning('Отправлено больше 60 запросов в минуту')
-            time.sleep(TIME_OUT)
-        raise ApiStatusTrouble(
-            f'Сбой при запросе к эндпоинту {endpoint}.\n'
-            f'Код ответа API: {response.status_code}.\n'
-            f'Параметры запроса: {params}.'
+        logger.debug('Бот отправил документ: %s', filename)
+
+
+def get_cached_response(endpoint, params=None, fresh=False):
+    """
+    Ищет ответ balldontlie.io в кэше response_cache по нормализованному 
+    URL запроса. Возвращает ключ кэша (None для сторонних сервисов, 
+    ответы которых не кэшируются) и найденный ответ или None.
+    С fresh=True только возвращает ключ.
+    """
+    if not endpoint.startswith(ENDPOINT):
+        return None, None
+    key = normalize_url(endpoint, params)
+    if fresh:
+        return key, None
+    result = response_cache.get(key)
+    if result is not None:
+        logger.debug('Ответ для %s взят из кэша.', key)
+    return key, result
+
+
+def get_stored_response(key):
+    """
+    Ищет ответ в постоянном хранилище history_store (после промаха 
+    кэша) и возвращает найденный ответ в кэш. Обращается к диску, 
+    поэтому в режиме asyncio вызывается через run_blocking().
+    """
+    stored = history_store.get(key)
+    if stored is not None:
+        logger.debug('Ответ для %s взят из хранилища истории.', key)
+        payload, final_url, size = stored
+        payload, size = compact_payload(endpoint_name(key), payload, size)
+        response_cache.put(key, payload, final_url, size)
+        return payload, final_url
+    return None
+
+
+def parse_api_response(response, endpoint, params, key):
+    """
+    Проверяет HTTP-статус ответа API-сервиса, разбирает JSON и 
+    сохраняет ответ в кэш под ключом key. Ответы, которые уже никогда 
+    не изменятся, сохраняются еще и в постоянное хранилище history_store 
+    (в режиме asyncio функция поэтому вызывается через run_blocking()).
+    """
+    if response.status_code == HTTPStatus.OK:
+        final_url = response.url
+        logger.debug('Запрос ушел на эндпоинт %s.', final_url)
+        try:
+            payload = response.json()
+        except ValueError as error:
+            raise ApiRequestTrouble(
+                f'Ответ эндпоинта {final_url} не является JSON.\n'
+                f'Ошибка: {error}.'
+            )
+        if key is not None:
+            if is_immutable(key, payload):
+                history_store.put(
+                    key, payload, final_url, response.content.decode()
+                )
+            payload, size = compact_payload(
+                endpoint_name(key), payload, len(response.content)
+            )
+            response_cache.put(key, payload, final_url, size)
+        return payload, final_url
+    raise ApiStatusTrouble(
+        f'Сбой при запросе к эндпоинту {endpoint}.\n'
+        f'Код ответа API: {response.status_code}.\n'
+        f'Параметры запроса: {params}.'
+    )
+
+
+def check_api_service(
+    endpoint, params=None, priority=PRIORITY_INTERACTIVE, fresh=False,
+    cancelled=None
+):
+    """
+    Посредством этой функции производятся все синхронные запросы к внешним 
+    сервисам API.
+    Ответы balldontlie.io сначала ищутся в кэше response_cache по 
+    нормализованному URL запроса, на сеть уходят только промахи.
+    Запросы уходят через общий клиент api_client с пулом соединений и 
+    повторами. Запросы к balldontlie.io проходят через общий ограничитель 
+    частоты rate_limiter и ждут в очереди с приоритетом priority: запросы 
+    пользователей обслуживаются раньше фоновых.
+    С fresh=True ответ не берется из кэша, а запрашивается заново 
+    (и обновляет кэш) - так опрашиваются текущие игры.
+    Событие cancelled (фоновая подгрузка) отменяет запрос, еще не ушедший 
+    на сервис, в том числе ждущий своей очереди (RequestCancelled).
+    Функция проверяет HTTP-статус полученного ответа от API-сервиса, а также 
+    перехватывает и логирует все ошибки при отправке запросов.
+    Одновременные одинаковые запросы к balldontlie.io объединяются 
+    (request_flights): на сеть уходит первый, остальные запросы того же 
+    или более низкого приоритета ждут его ответа.
+    Длительность каждого вызова попадает в метрики по эндпоинту и статусу 
+    ответа ('cache' - ответ из кэша или хранилища истории, 'coalesced' - 
+    ответ объединенного запроса).
+    """
+    logger.debug('Начало работы функции %s.', check_api_service.__name__)
+    name = endpoint_name(endpoint)
+    with metrics.timer('api_request', endpoint=name) as labels:
+        key, result = get_cached_response(endpoint, params, fresh)
+        if result is None and key is not None and not fresh:
+            result = get_stored_response(key)
+        if result is not None:
+            labels['status'] = 'cache'
+            return result
+        if key is None:
+            response = api_client.get(
+                endpoint, params=params, cancelled=cancelled
+            )
+            labels['status'] = response.status_code
+            return parse_api_response(response, endpoint, params, key)
+
+        def fetch():
+            response = api_client.get(
+                endpoint, params=params, priority=priority,
+                limiter=rate_limiter, cancelled=cancelled
+            )
+            labels['status'] = response.status_code
+            return parse_api_response(response, endpoint, params, key)
+
+        result, shared = request_flights.do(key, fetch, priority)
+        if shared:
+            labels['status'] = 'coalesced'
+        return result
+
+
+async def check_api_service_async(
+    endpoint, params=None, priority=PRIORITY_INTERACTIVE, fresh=False
+):
+    """
+    Асинхронный аналог check_api_service() для режима asyncio: 
+    запрос выполняет async_api_client, ожидание ответа не занимает поток.
+    Кэш и ограничитель частоты общие с синхронными запросами.
+    Обращения к постоянному хранилищу (SQLite) выполняются в пуле потоков 
+    и не останавливают цикл событий.
+    """
+    logger.debug(
+        'Начало работы функции %s.', check_api_service_async.__name__
+    )
+    name = endpoint_name(endpoint)
+    with metrics.timer('api_request', endpoint=name) as labels:
+        key, result = get_cached_response(endpoint, params, fresh)
+        if result is None and key is not None and not fresh:
+            result = await run_blocking(get_stored_response, key)
+        if result is not None:
+            labels['status'] = 'cache'
+            return result
+        if key is None:
+            response = await async_api_client.get(endpoint, params=params)
+            labels['status'] = response.status_code
+            return parse_api_response(response, endpoint, params, key)
+
+        async def fetch():
+            response = await async_api_client.get(
+                endpoint, params=params, priority=priority,
+                limiter=rate_limiter
+            )
+            labels['status'] = response.status_code
+            return await run_blocking(
+                parse_api_response, response, endpoint, params, key
+            )
+
+        result, shared = await request_flights.do_async(
+            key, fetch, priority
+        )
+        if shared:
+            labels['status'] = 'coalesced'
+        return result
+
+
+async def call_api(
+    endpoint, params=None, priority=PRIORITY_INTERACTIVE, fresh=False
+):
+    """
+    Через эту функцию обработчики выполняют запросы к API: внутри цикла 
+    событий (режим asyncio) - асинхронно, в многопоточном режиме - 
+    синхронно в потоке диспетчера.
+    """
+    if in_event_loop():
+        return await check_api_service_async(
+            endpoint, params, priority, fresh
         )
+    return check_api_service(endpoint, params, priority, fresh)
 
 
 def check_response_content(response, endpoint, meta_field=True):
@@ -275,7 +507,78 @@ def check_not_empty_response(response, endpoint, meta_field=True):
     )
 
 
-def get_head_page(update, context, start=True, text=None):
+async def request_newest_page(endpoint, params):
+    """
+    Запрашивает последнюю (самую свежую) страницу выборки.
+    Число страниц выборки запоминает планировщик page_planner, поэтому 
+    повторная выборка обходится одним запросом сразу за последней 
+    страницей. Впервые встреченная выборка запрашивается с явной первой 
+    страницы: ее ответ остается в кэше под тем же ключом, что и при 
+    листании, и возврат к ней не требует нового запроса.
+    Возвращает ответ, URL выборки без номера страницы и число страниц.
+    """
+    base_url = page_planner.query_key(endpoint, params)
+    page = page_planner.first_page(base_url)
+    response, final_url = await call_api(base_url, {'page': page})
+    response = check_response_content(response, final_url)
+    pages_count = response.get('meta').get('total_pages')
+    last_page = page_planner.remember(base_url, pages_count, page)
+    if last_page is not None:
+        response, final_url = await call_api(base_url, {'page': last_page})
+        response = check_response_content(response, final_url)
+        pages_count = response.get('meta').get('total_pages')
+    return response, base_url, pages_count
+
+
+def fetch_page(endpoint, params, priority=PRIORITY_BACKGROUND):
+    """
+    Запрашивает одну страницу выборки для итераторов модуля pagination 
+    и загрузчика page_fetcher и проверяет ответ.
+    """
+    response, final_url = check_api_service(
+        endpoint, params, priority=priority
+    )
+    return check_response_content(response, final_url)
+
+
+def load_players():
+    """
+    Загружает полный список игроков из API-сервиса для каталога 
+    player_catalog, обходя страницы итератором iter_records() модуля 
+    pagination. Запросы выполняются с фоновым приоритетом.
+    """
+    return list(iter_records(fetch_page, f'{ENDPOINT}players'))
+
+
+def load_followed_games(game_ids):
+    """
+    Загружает отслеживаемые игры для game_follower одним запросом 
+    в обход кэша. Запрос выполняется с фоновым приоритетом.
+    """
+    endpoint = f'{ENDPOINT}games'
+    params = {'game_ids[]': game_ids, 'per_page': FOLLOW_MAX_GAMES}
+    response, endpoint = check_api_service(
+        endpoint, params, priority=PRIORITY_BACKGROUND, fresh=True
+    )
+    response = check_response_content(response, endpoint)
+    return response.get('data')
+
+
+def load_teams():
+    """
+    Загружает список команд из API-сервиса для реестра команд.
+    Запрос выполняется с фоновым приоритетом.
+    """
+    endpoint = f'{ENDPOINT}teams'
+    response, endpoint = check_api_service(
+        endpoint, priority=PRIORITY_BACKGROUND
+    )
+    response = check_response_content(response, endpoint)
+    return response.get('data')
+
+
+@metrics.handler
+async def get_head_page(update, context, start=True, text=None):
     """
     Функция возвращает главную страницу (начальное меню).
     Немного видоизменяется в зависимости от типа сообщения.
@@ -288,56 +591,249 @@ def get_head_page(update, context, start=True, text=None):
     logger.debug('Начало работы функции %s.', get_head_page.__name__)
     context.user_data.clear()
     chat = update.effective_chat
+    page_prefetcher.cancel(chat.id)
     name = update.message.chat.first_name
     if not text:
         text = f'Чем я могу Вам помочь, {name}?'
     if start:
         text = f'Спасибо, что включили меня, {name}!'
 
-    send_text_message(
+    await send_text_message(
         context=context,
         chat_id=chat.id,
         text=text,
         reply_markup=telegram.ReplyKeyboardMarkup(
-            [['Игры'], ['Команды'], ['Игроки и статистика']],
+            [
+                ['Игры'], ['Команды'], ['Игроки и статистика'],
+                ['Сравнение игроков']
+            ],
             resize_keyboard=True
         )
     )
 
 
-def back_to_the_future(update, context):
+def user_timezone(context):
+    """Часовой пояс, в котором пользователь смотрит время начала игр."""
+    return context.chat_data.get('timezone', DEFAULT_TIMEZONE)
+
+
+@metrics.handler
+async def set_timezone(update, context):
+    """
+    Команда /timezone <часовой пояс> задает часовой пояс, в котором
+    бот показывает время начала игр, например /timezone Europe/Berlin.
+    Без аргумента возвращает текущий часовой пояс. Часовой пояс
+    хранится в словаре chat_data и не сбрасывается при возврате
+    в начальное меню.
+    """
+    logger.debug('Начало работы функции %s.', set_timezone.__name__)
+    chat = update.effective_chat
+    if not context.args:
+        text = (
+            f'Время начала игр показывается по часовому поясу '
+            f'`{user_timezone(context)}`.\n'
+            'Чтобы изменить его, отправьте команду с названием пояса, '
+            'например: `/timezone Europe/Berlin`'
+        )
+    elif is_timezone(context.args[0]):
+        context.chat_data['timezone'] = context.args[0]
+        text = (
+            'Время начала игр теперь показывается по часовому поясу '
+            f'`{context.args[0]}`.'
+        )
+    else:
+        text = (
+            'Такой часовой пояс не найден.\n'
+            'Укажите пояс в формате `Europe/Moscow` или `America/New_York`.'
+        )
+    return await send_text_message(context=context, chat_id=chat.id, text=text)
+
+
+@metrics.handler
+async def follow_game(update, context):
+    """
+    Команда /follow <ID игры> подписывает чат на изменения счета, 
+    периода и статуса игры. Изменения присылает общая для всех чатов 
+    задача poll_followed_games. Без аргумента возвращает список игр, 
+    за которыми следит чат.
+    """
+    logger.debug('Начало работы функции %s.', follow_game.__name__)
+    chat = update.effective_chat
+    if not context.args:
+        game_ids = game_follower.following(chat.id)
+        text = (
+            'Вы не следите ни за одной игрой.\n'
+            'Чтобы следить за игрой, отправьте команду /follow <ID игры>.'
+            '\n\n_ID игры можно узнать в разделе "Игры"_'
+        )
+        if game_ids:
+            text = (
+                'Вы следите за играми с ID: *{}*.\n'
+                'Чтобы отписаться, отправьте команду /unfollow <ID игры> '
+                'или /unfollow для всех игр.'
+            ).format(', '.join(map(str, game_ids)))
+    elif not context.args[0].isdigit():
+        text = 'ID игры должен быть числом, например: /follow 473'
+    else:
+        params = {'game_ids[]': [int(context.args[0])]}
+        response, endpoint = await call_api(f'{ENDPOINT}games', params)
+        response = check_response_content(response, endpoint)
+        games = response.get('data')
+        if not games:
+            text = 'Игра с ID *{}* не найдена.'.format(context.args[0])
+        else:
+            game = games[0]
+            text = game_view(game, user_timezone(context))
+            if game.status == 'Final':
+                text = f'Эта игра уже окончена.\n\n{text}'
+            elif not game_follower.follow(chat.id, game):
+                text = (
+                    'Сейчас отслеживается слишком много игр, '
+                    'попробуйте позже.'
+                )
+            else:
+                text = (
+                    'Я пришлю изменения счета, периода и статуса игры.'
+                    f'\n\n{text}'
+                )
+    return await send_text_message(context=context, chat_id=chat.id, text=text)
+
+
+@metrics.handler
+async def unfollow_game(update, context):
+    """
+    Команда /unfollow <ID игры> отписывает чат от игры, 
+    /unfollow без аргумента - от всех игр.
+    """
+    logger.debug('Начало работы функции %s.', unfollow_game.__name__)
+    chat = update.effective_chat
+    game_id = None
+    if context.args and context.args[0].isdigit():
+        game_id = int(context.args[0])
+    if game_follower.unfollow(chat.id, game_id):
+        text = 'Подписка отменена.'
+    else:
+        text = 'Вы не следите за этой игрой.'
+    return await send_text_message(context=context, chat_id=chat.id, text=text)
+
+
+def poll_followed_games(context):
+    """
+    Задача JobQueue: раз в FOLLOW_POLL_INTERVAL секунд опрашивает 
+    все отслеживаемые игры одним запросом и отправляет подписчикам 
+    изменения.
+    """
+    try:
+        updates = game_follower.poll()
+    except Exception as error:
+        logger.error('Сбой при опросе отслеживаемых игр: %s', error)
+        return
+    for game, changes, chat_ids in updates:
+        for chat_id in chat_ids:
+            chat_data = context.dispatcher.chat_data.get(chat_id, {})
+            timezone = chat_data.get('timezone', DEFAULT_TIMEZONE)
+            text = 'Изменения в игре с ID *{}*:\n{}\n\n{}'.format(
+                game.id, '\n'.join(changes), game_view(game, timezone)
+            )
+            try:
+                run_sync(send_text_message(
+                    context=context, chat_id=chat_id, text=text,
+                    priority=PRIORITY_BACKGROUND
+                ))
+            except SendMessageFail as error:
+                logger.error(error)
+
+
+def is_admin(chat):
+    return bool(ADMIN_ID) and str(chat.id) == str(ADMIN_ID)
+
+
+@metrics.handler
+async def start_profiling(update, context):
+    """
+    Команда администратора /profile [N] включает выборочный 
+    профилировщик profiler на N секунд (по умолчанию 
+    PROFILE_DEFAULT_SECONDS, не больше PROFILE_MAX_SECONDS) по всем 
+    потокам бота. По окончании задача JobQueue deliver_profile() 
+    отправляет администратору результат. Других пользователей команда 
+    возвращает на главную страницу.
+    """
+    logger.debug('Начало работы функции %s.', start_profiling.__name__)
+    chat = update.effective_chat
+    if not is_admin(chat):
+        return await get_head_page(update, context, False)
+    seconds = PROFILE_DEFAULT_SECONDS
+    if context.args:
+        seconds = int(context.args[0]) if context.args[0].isdigit() else 0
+    if not 0 < seconds <= PROFILE_MAX_SECONDS:
+        text = (
+            f'Укажите длительность от 1 до {PROFILE_MAX_SECONDS} секунд, '
+            f'например: /profile {PROFILE_DEFAULT_SECONDS}'
+        )
+    elif not profiler.start(seconds):
+        text = 'Профилирование уже идет, дождитесь результата.'
+    else:
+        context.job_queue.run_once(deliver_profile, seconds)
+        text = f'Профилирование запущено на {seconds} с.'
+    return await send_text_message(
+        context=context, chat_id=chat.id, text=text, parse_mode=None
+    )
+
+
+def deliver_profile(context):
+    """
+    Задача JobQueue: дожидается окончания профилирования и отправляет 
+    администратору сводку функций с наибольшим временем и файл 
+    свернутых стеков (для flame graph).
+    """
+    profile = profiler.result()
+    if profile is None:
+        return
+    try:
+        run_sync(send_text_message(
+            context=context, chat_id=ADMIN_ID, text=profile.summary(),
+            parse_mode=None, priority=PRIORITY_BACKGROUND
+        ))
+        if profile.samples:
+            run_sync(send_document_message(
+                context=context, chat_id=ADMIN_ID,
+                document=profile.collapsed().encode(),
+                filename='profile-{}.collapsed'.format(
+                    datetime.now().strftime('%Y%m%d-%H%M%S')
+                ),
+                priority=PRIORITY_BACKGROUND
+            ))
+    except SendMessageFail as error:
+        logger.error(error)
+
+
+@metrics.handler
+async def back_to_the_future(update, context):
     """
     Функция возврата на один шаг назад в диалоговом меню.
     Вызывается в случае нажатия пользователем кнопки 'Назад'.
     При нахождении пользователя в диалоговом меню 
     'Игры' или 'Игроки и статистика' возвращает пользователя к предыдущему
-    этапу выбора ответа.
+    этапу выбора ответа: предыдущий шаг задан в таблице автомата 
+    диалогов, поэтому уже данные ответы остаются в записи параметров.
     В иных случаях вызывает функцию возврата главного меню.
     """
     logger.debug('Начало работы функции %s.', back_to_the_future.__name__)
-    back_func_choice = {
-        'games': preview_games,
-        'statistics': preview_statistics
-    }
-
-    for item in ('games', 'statistics'):
-        flag = context.user_data.get(item)
-        if flag is not None:
-            count = len(flag)
-            if count != 0:
-                flag.pop()
-            else:
-                context.user_data.pop(item)
-            return back_func_choice[item](update, context)            
-
-    return get_head_page(update, context)
+    conversation = context.user_data.get('dialog')
+    if conversation is None or not conversation.back():
+        return await get_head_page(update, context, False)
+    return await FLOW_HANDLERS[conversation.flow](update, context, MOVED)
 
 
-def search_player(update, context):
+@metrics.handler
+async def search_player(update, context, outcome=None):
     """
-    Функция поиска игрока. Выполняет поиск игрока по имени на латинице. 
-    При необходимости уточняет запрос. Валидация введенного имени происходит 
-    в функции validator(). 
+    Функция поиска игрока. Выполняет поиск игрока по имени на латинице 
+    в локальном каталоге player_catalog, а если там игрок не найден - 
+    через API-сервис. При необходимости уточняет запрос, предлагая 
+    наиболее подходящие имена. Валидацию введенного имени выполняет 
+    автомат диалогов, результат проверки передается в аргументе outcome 
+    (None - пользователь только начал поиск). 
     JSON-ответ обрабатывает с помощью функции player() модуля models. 
     Полученные данные игрока (ID, first_name, last_name) сохраняет в 
     словарь user_data объекта context для возможности использования 
@@ -347,31 +843,27 @@ def search_player(update, context):
     без неё и предлагает ознакомиться со статистикой игрока.
     """
     logger.debug('Начало работы функции %s.', search_player.__name__)
-    endpoint = f'{ENDPOINT}players'
     chat = update.effective_chat
-    answer = update.message.text
-    flag_dict = context.user_data.get('player')
-    text = (
-        'Введите имя игрока, которого Вы хотите найти.\n'
-        '*Запрос должен быть на латинице*.'
-    )
-    button = [['В начало']]
-
-    if flag_dict is None:
-        context.user_data['player'] = []
-    elif not validator(update, context):
+    conversation = context.user_data.get('dialog')
+    if outcome is None:
+        conversation = Conversation.start('player')
+        context.user_data['dialog'] = conversation
+    text = conversation.step.text
+    button = conversation.step.button
+
+    if outcome == REJECTED:
         text = ('Введенный запрос не прошел проверку.\n'
                'Убедитесь что Вы ввели верный запрос на латинице')
-    else:
-        answer = '_'.join((answer).split(' '))
-        params = {'per_page': 25, 'search': answer}
-        response, endpoint = check_api_service(endpoint, params)
-        response = check_response_content(response, endpoint)
+    elif outcome == DONE:
+        answer = conversation.query.name
+        found = player_catalog.search(answer)
+        local = found is not None and found[1] > 0
+        if not local:
+            found = await search_player_api(answer)
+        response_list, player_count = found
         text='К сожалению ничего не найдено. Уточните запрос'
-        if check_not_empty_response(response, endpoint):
-            response_list = response.get('data')            
-            player_count = response.get('meta').get('total_count')
-            if player_count > 25:
+        if player_count:
+            if player_count > 25 and not local:
                 text=(
                     'Пожалуйста, уточните поиск.\n'
                     'Количество найденных игроков превышает *25*!'
@@ -379,7 +871,7 @@ def search_player(update, context):
             elif player_count > 1:
                 list_name = [
                     str(i['first_name']) + ' ' + str(i['last_name'])
-                    for i in response_list
+                    for i in response_list[:PLAYER_SUGGESTIONS]
                 ]
                 text=(
                     'Уточните поиск - введите имя '
@@ -387,24 +879,27 @@ def search_player(update, context):
                         '\n'.join(list_name)
                     )
                 )
+                if player_count > len(list_name):
+                    text = (
+                        f'Найдено игроков: *{player_count}*. '
+                        f'{text}'
+                    )
             else:
                 response = response_list[0]
                 player_id = response.get('id')
                 first_name = response.get('first_name')
                 last_name = response.get('last_name')
-                context.user_data.get('player').extend(
-                    (player_id, first_name, last_name)
-                )                
-                text = player(response)
-                button = [
-                    ['Статистика сезона', 'Статистика по играм'],
-                    ['В начало']
-                ]
+                context.user_data['player'] = (
+                    player_id, first_name, last_name
+                )
+                conversation.move(PLAYER)
+                text = player(Player.from_json(response))
+                button = conversation.step.button
                 endpoint = ENDPOINT_PHOTO_SEARCH
                 info_for_photo = f'nba_{first_name}_{last_name}'
                 params = {'q': info_for_photo}
                 try:
-                    response, endpoint = check_api_service(endpoint, params)
+                    response, endpoint = await call_api(endpoint, params)
                     photo = response.json()['results'][0]
                 except Exception as error:
                     logger.error(
@@ -413,7 +908,7 @@ def search_player(update, context):
                         'Ошибка: %s', endpoint, error
                     )
                 else:
-                    return send_photo_message(
+                    return await send_photo_message(
                         context=context,
                         chat_id=chat.id,
                         photo=photo,
@@ -421,7 +916,7 @@ def search_player(update, context):
                         reply_markup=button
                     )
 
-    return send_text_message(
+    return await send_text_message(
         context=context,
         chat_id=chat.id,
         text=text,
@@ -432,35 +927,39 @@ def search_player(update, context):
     )
 
 
-def view_teams(update, context):
+async def search_player_api(answer):
+    """
+    Поиск игрока через API-сервис - для имен, которых еще нет 
+    в локальном каталоге player_catalog.
+    Возвращает список найденных игроков и их общее количество.
+    """
+    endpoint = f'{ENDPOINT}players'
+    answer = '_'.join((answer).split(' '))
+    params = {'per_page': 25, 'search': answer}
+    response, endpoint = await call_api(endpoint, params)
+    response = check_response_content(response, endpoint)
+    if not check_not_empty_response(response, endpoint):
+        return [], 0
+    return response.get('data'), response.get('meta').get('total_count')
+
+
+@metrics.handler
+async def view_teams(update, context):
     """
     Функция отображения списка текущих команд НБА.
-    В случае отсутствия списка команд в 'кэше' достает список команд из 
-    запроса к API. В остальных случаях - достает из 'кэша'.
-    Список в 'кэше' обновляется каждый месяц. 
-    JSON-ответ обрабатывает с помощью функции team_min() модуля models.
+    Список команд берет из реестра команд team_registry, который 
+    обновляется в фоне, поэтому запросов к API-сервису не делает.
+    Данные команд обрабатывает с помощью функции team_min() модуля models.
     """
     logger.debug('Начало работы функции %s.', view_teams.__name__)
-    endpoint = f'{ENDPOINT}teams'
     chat = update.effective_chat
-    date = datetime.now()
-    flag = f'list_teams_{date.month}_{date.year}'
-    list_teams = cache_dict.get(flag)
+    list_teams = [
+        team_min(Team.from_json(i)) for i in team_registry.all()
+    ]
+    if not list_teams:
+        logger.error('Реестр команд пуст.')
 
-    if not cache_dict.get(flag):
-        response, endpoint = check_api_service(endpoint)
-        response = check_response_content(response, endpoint)
-        if check_not_empty_response(response, endpoint):
-            response_list = response.get('data')
-            list_teams = [team_min(i) for i in response_list]
-            cache_dict[flag] = list_teams
-        else:
-            logger.error(
-                'При запросе к эндпоинту: %s возвращается пустой ответ',
-                endpoint
-            )
-    
-    return send_text_message(
+    return await send_text_message(
         context=context,
         chat_id=chat.id,
         text=(
@@ -473,67 +972,129 @@ def view_teams(update, context):
     )
 
 
-def preview_statistics(update, context):
+@metrics.handler
+async def preview_statistics(update, context, outcome=None):
     """
     Функция возвращает этапы диалога с пользователем для уточнения параметров 
     выбора статистики игрока.
-    По результатам диалога в словаре user_data объекта context создается 
-    список параметров с ключом 'statistics', который будет использован 
-    функцией view_statistics(). Список вопросов, уточняющих вопросов и 
-    наборы кнопок диалогового меню находятся в словаре VIEW_STATIX 
-    модуля constants. Ответы пользователя на уточняющие вопросы проходят 
-    валидацию в функции validator().
+    По результатам диалога в словаре user_data объекта context по ключу 
+    'dialog' собирается запись параметров StatisticsQuery, которая будет 
+    использована функцией view_statistics(). Шаги диалога собраны 
+    модулем dialog из словаря VIEW_STATIX модуля constants. Ответ 
+    пользователя уже применен к диалогу в check_answer(), результат 
+    передается в аргументе outcome (None - диалог только начинается).
     """
     logger.debug('Начало работы функции %s.', preview_statistics.__name__)
     chat = update.effective_chat
-    answer = update.message.text
-    flag_dict = context.user_data.get('statistics')
-    button = [['Назад'], ['В начало']]
-    text = None
+    conversation = context.user_data.get('dialog')
+    if outcome is None:
+        conversation = Conversation.start('statistics')
+        context.user_data['dialog'] = conversation
+    elif outcome == DONE:
+        return await view_statistics(update, context)
+    text = conversation.step.text
+    button = conversation.step.button
+    if outcome == REJECTED:
+        text = 'Попробуйте уточнить запрос. Ответа не найдено.'
+        button = [['Назад'], ['В начало']]
+
+    return await send_text_message(
+        context=context,
+        chat_id=chat.id,
+        text=text,
+        reply_markup=telegram.ReplyKeyboardMarkup(
+            button,
+            resize_keyboard=True
+        )
+    )
 
-    if flag_dict is None:
-        button = [['Да', 'Нет'], ['В начало']]
-        text = (
-            'Вы знаете ID игры и хотите посмотреть детали ее статистики?\n\n'
-            '_ID игры можно узнать в разделе "Игры"_'
+
+def date_params(query):
+    """
+    Параметры запроса к API для выборки за конкретный день или 
+    за период из записи параметров диалога.
+    """
+    if query.day is not None:
+        return {'dates[]': query.day.isoformat()}
+    start_date, end_date = query.period
+    return {
+        'start_date': start_date.isoformat(),
+        'end_date': end_date.isoformat()
+    }
+
+
+def statistics_params(player_id, query):
+    """
+    Параметры запроса статистики игрока по играм для записи параметров 
+    выборки StatisticsQuery.
+    """
+    params = {'player_ids[]': player_id, 'game_ids[]': query.game_id}
+    if query.game_id is None:
+        params.update(
+            {'postseason': query.playoff, 'seasons[]': query.season}
         )
-        context.user_data['statistics'] = []
+        if query.season is None:
+            params.update(date_params(query))
+    return params
 
-    else:
-        count = len(flag_dict)
-        if answer == VIEW_STATIX.get(count).get('answer')[0]:
-            text = VIEW_STATIX.get(count).get('additional')
-            if text is None:
-                context.user_data.get('statistics').append(True)
-        elif answer == VIEW_STATIX.get(count).get('answer')[1]:
-            context.user_data.get('statistics').append(None)
-        elif validator(update, context):
-            context.user_data.get('statistics').append(answer)
-            if len(context.user_data.get('statistics')) in (1, 3, 5):
-                return view_statistics(update, context)
-        else:
-            text = 'Попробуйте уточнить запрос. Ответа не найдено.'
 
-        if text is None or answer == 'Назад':
-            text = VIEW_STATIX.get(count).get('text')
-            button = VIEW_STATIX.get(count).get('button')
+def collect_statistics(endpoint, params):
+    """Складывает все страницы выборки /stats в столбцы StatColumns."""
+    columns = StatColumns()
+    for page in page_fetcher.iter_pages(endpoint, params):
+        columns.extend(page)
+    return columns
 
-    return send_text_message(
+
+@metrics.handler
+async def aggregate_statistics(update, context, last=None):
+    """
+    Функция возвращает пользователю обобщенную статистику игрока 
+    за всю выборку игр диалога 'статистика игрока' или за последние 
+    last игр выборки. Страницы выборки параллельно загружает page_fetcher, 
+    по порядку они складываются в столбцы StatColumns модуля aggregation 
+    (в режиме asyncio - в пуле потоков цикла событий), итоги считает 
+    функция aggregate() того же модуля, текст - функция 
+    statistics_per_range() модуля models.
+    """
+    logger.debug('Начало работы функции %s.', aggregate_statistics.__name__)
+    chat = update.effective_chat
+    conversation = context.user_data.get('dialog')
+    player = context.user_data.get('player')
+    if player is None or conversation is None or (
+        conversation.flow != 'statistics'
+    ):
+        return await get_head_page(update, context, False)
+    endpoint = f'{ENDPOINT}stats'
+    params = statistics_params(player[0], conversation.query)
+    columns = await run_blocking(collect_statistics, endpoint, params)
+    summary = aggregate(columns, last)
+    text = 'К сожалению ничего не найдено'
+    if summary is not None:
+        title = 'за выборку игр'
+        if last:
+            title = f'за последние {summary.games} игр выборки'
+        text = 'Статистика игрока *{} {}* {}:\n\n{}'.format(
+            player[1], player[2], title, statistics_per_range(summary)
+        )
+
+    return await send_text_message(
         context=context,
         chat_id=chat.id,
         text=text,
         reply_markup=telegram.ReplyKeyboardMarkup(
-            button,
+            [AGGREGATE_BUTTONS, ['В начало']],
             resize_keyboard=True
         )
     )
 
 
-def view_statistics(update, context):
+@metrics.handler
+async def view_statistics(update, context):
     """
     Функция отображения статистики игрока по играм.
     Получает данные из словаря user_data объекта context об игроке и 
-    параметрах выборки. 
+    записи параметров выборки StatisticsQuery. 
     Создает из параметров запрос, обрабатывает ответ и предоставляет его 
     пользователю.
     JSON-ответ обрабатывает с помощью функции statistics_per_game() 
@@ -550,52 +1111,32 @@ def view_statistics(update, context):
     text = 'К сожалению ничего не найдено'
     player = context.user_data.get('player')
     player_id, first_name, last_name = player[0], player[1], player[2]
-    user_data = context.user_data.get('statistics')
-    game_id, playoff, season = user_data[0], user_data[1], user_data[2]
-    params ={
-        'per_page': 5,
-        'player_ids[]': player_id,
-        'postseason': playoff,
-        'game_ids[]': game_id,
-        'seasons[]': season
-    }
+    query = context.user_data.get('dialog').query
+    params = statistics_params(player_id, query)
+    params['per_page'] = 5
 
-    if not isinstance(season, str):
-        if user_data[3]:
-            date = user_data[4]
-            params.update({'dates[]': date})
-        else:
-            user_data = (user_data[4]).split(' ')
-            start_date, end_date = *user_data,
-            start_date = '-'.join(reversed(start_date.split('-')))
-            end_date = '-'.join(reversed(end_date.split('-')))
-            pairs = {'start_date': start_date, 'end_date': end_date}
-            params.update(pairs)
-
-    response, final_url = check_api_service(endpoint, params)
-    response = check_response_content(response, final_url)
-    if check_not_empty_response(response, final_url):
+    response, base_url, pages_count = await request_newest_page(
+        endpoint, params
+    )
+    if check_not_empty_response(response, base_url):
         response_list = response.get('data')
         games_count = response.get('meta').get('total_count')
-        pages_count = response.get('meta').get('total_pages')
         result = [statistics_per_game(i) for i in response_list]
+        if query.game_id is None:
+            button = [AGGREGATE_BUTTONS, ['В начало']]
         if pages_count > 1:
-            page = pages_count
-            button = [['Следующие игры'], ['В начало']]
-            context.user_data['current_endpoint'] = final_url
-            context.user_data['current_page'] = page
-            params.update({'page': page})
-            response, endpoint = check_api_service(endpoint, params)
-            response = check_response_content(response, endpoint)
-            if check_not_empty_response(response, final_url):
-                response_list = response.get('data')
-                result = [statistics_per_game(i) for i in response_list]
+            button = [['Следующие игры'], AGGREGATE_BUTTONS, ['В начало']]
+            context.user_data['current_endpoint'] = base_url
+            context.user_data['current_page'] = pages_count
+            page_prefetcher.schedule(
+                chat.id, base_url, pages_count, pages_count
+            )
         text = ('Статистика игрока *{} {}* по играм:\n\n'
                 'Количество игр в выборке: *{}*\n\n{}').format(
             first_name, last_name, games_count, '\n'.join(reversed(result))
         )
 
-    return send_text_message(
+    return await send_text_message(
         context=context,
         chat_id=chat.id,
         text=text,
@@ -606,58 +1147,177 @@ def view_statistics(update, context):
     )
 
 
-def view_season_statistics(update, context):
+@metrics.handler
+async def view_season_statistics(update, context, outcome=None):
     """
     Функция возвращает пользователю данные статистики игрока 
     за конкретный сезон. 
     Данные об игроке получает из словаря user_data объекта 
-    context. Валидацию ответа пользователя производит с помощью функции 
-    validator().
-    JSON-ответ обрабатывает с помощью функции statistics_per_season() 
-    модуля models.
+    context, сезон - из записи параметров диалога. Валидацию ответа 
+    пользователя выполняет автомат диалогов, результат проверки 
+    передается в аргументе outcome.
+    Показатели берет через request_season_averages() и обрабатывает 
+    с помощью функции statistics_per_season() модуля models.
     """
     logger.debug('Начало работы функции %s.', view_season_statistics.__name__)
-    endpoint = f'{ENDPOINT}season_averages'
     chat = update.effective_chat
-    button = [['В начало']]
-    text = (
-        'Введите сезон, в пределах которого '
-        'Вас интересует статистика игрока.\n'
-        'К примеру, если требуется статистика игрока '
-        'за сезон 2016-2017 ввести нужно - "*2016*".\n'
-        'Запрос должен содержать только четыре цифры.'
-    )
-    answer = update.message.text
-    flag_dict = context.user_data.get('average')
+    conversation = context.user_data.get('dialog')
+    button = conversation.step.button
+    text = conversation.step.text
     player = context.user_data.get('player')
     player_id, first_name, last_name = player[0], player[1], player[2]
 
-    if flag_dict is None or answer == 'Выбрать другой сезон':
-        context.user_data['average'] = []
-    else:
-        if not validator(update, context):
-            text = ('Убедитесь, что Вы ввели верный запрос')
-        else:    
-            params = {
-                'season': answer,
-                'player_ids[]': player_id
-            }
-            response, endpoint = check_api_service(endpoint, params)
-            response = check_response_content(response, endpoint, False)
-            if not check_not_empty_response(response, endpoint, False):
-                text='К сожалению ничего не найдено'
-            else:
-                response_list = response.get('data')
-                response = response_list[0]
-                result = statistics_per_season(response)
-                text = (f'Статистика игрока *{first_name} {last_name}*:'
-                        f'\n\n{result}')
-                button = [
-                    ['Выбрать другой сезон', 'Статистика по играм'],
-                    ['В начало']
-                ]
+    if outcome == REJECTED:
+        text = ('Убедитесь, что Вы ввели верный запрос')
+    elif outcome == DONE:
+        averages = await request_season_averages(
+            [player_id], conversation.query.season
+        )
+        if averages[player_id] is None:
+            text='К сожалению ничего не найдено'
+        else:
+            result = statistics_per_season(averages[player_id])
+            text = (f'Статистика игрока *{first_name} {last_name}*:'
+                    f'\n\n{result}')
+            button = [
+                ['Выбрать другой сезон', 'Статистика по играм'],
+                ['В начало']
+            ]
+
+    return await send_text_message(
+        context=context,
+        chat_id=chat.id,
+        text=text,
+        reply_markup=telegram.ReplyKeyboardMarkup(
+            button,
+            resize_keyboard=True
+        )
+    )
 
-    return send_text_message(
+
+async def request_season_averages(player_ids, season):
+    """
+    Возвращает средние показатели игроков за сезон: словарь 
+    {ID игрока: запись SeasonAverage или None, если данных нет}.
+    Уже известные показатели берет из кэша season_averages, остальных 
+    игроков запрашивает одним запросом с несколькими player_ids[].
+    Поиск в кэше может обратиться к хранилищу истории на диске, поэтому 
+    выполняется через run_blocking().
+    """
+    found, missing = await run_blocking(
+        season_averages.lookup, player_ids, season
+    )
+    if missing:
+        endpoint = f'{ENDPOINT}season_averages'
+        params = {'season': season, 'player_ids[]': missing}
+        response, endpoint = await call_api(endpoint, params)
+        response = check_response_content(response, endpoint, False)
+        found.update(
+            season_averages.update(missing, season, response.get('data'))
+        )
+    return found
+
+
+async def resolve_players(names):
+    """
+    Ищет игроков по именам в каталоге player_catalog, а если там 
+    игрок не найден - через API-сервис. Возвращает пару: кортеж 
+    найденных игроков (ID, имя, фамилия) без повторов и список 
+    имен, которые не удалось определить однозначно, с пояснениями.
+    """
+    players = []
+    problems = []
+    for name in names:
+        found = player_catalog.search(name)
+        if found is None or not found[1]:
+            found = await search_player_api(name)
+        candidates, count = found
+        exact = [
+            item for item in candidates
+            if normalize_name(full_name(item)) == normalize_name(name)
+        ]
+        if count == 1 or len(exact) == 1:
+            chosen = candidates[0] if count == 1 else exact[0]
+            player = (
+                chosen['id'], chosen['first_name'], chosen['last_name']
+            )
+            if player not in players:
+                players.append(player)
+        elif not count:
+            problems.append(f'{name} - игрок не найден')
+        else:
+            problems.append('{} - уточните имя: {}'.format(
+                name, ', '.join(map(full_name, candidates[:3]))
+            ))
+    return tuple(players), problems
+
+
+@metrics.handler
+async def compare_players(update, context, outcome=None):
+    """
+    Функция сравнения средних показателей нескольких игроков за сезон. 
+    Имена игроков (через запятую, от COMPARE_MIN_PLAYERS 
+    до COMPARE_MAX_PLAYERS) и сезон уточняет автомат диалогов, 
+    результат проверки ответа передается в аргументе outcome 
+    (None - пользователь только начал сравнение). Имена игроков 
+    определяет resolve_players() сразу после ввода, показатели всех 
+    игроков берет через request_season_averages() одним запросом и 
+    выводит таблицей с помощью функции season_comparison() модуля models.
+    """
+    logger.debug('Начало работы функции %s.', compare_players.__name__)
+    chat = update.effective_chat
+    conversation = context.user_data.get('dialog')
+    if outcome is None:
+        conversation = Conversation.start('compare')
+        context.user_data['dialog'] = conversation
+    query = conversation.query
+    text = conversation.step.text
+    button = conversation.step.button
+
+    if conversation.state == COMPARE_PLAYERS:
+        query.players = None
+    if outcome == REJECTED:
+        text = (
+            'Введенный запрос не прошел проверку.\n'
+            'Убедитесь что Вы ввели верный запрос на латинице'
+        )
+    elif outcome == MOVED and query.players is None and (
+        conversation.state == COMPARE_SEASON
+    ):
+        players, problems = await resolve_players(query.names)
+        if problems or len(players) < COMPARE_MIN_PLAYERS:
+            conversation.move(COMPARE_PLAYERS)
+            problems = problems or ['Все имена относятся к одному игроку']
+            text = 'Не удалось определить игроков:\n_{}_\n\n{}'.format(
+                '\n'.join(problems), conversation.step.text
+            )
+            button = conversation.step.button
+        else:
+            query.players = players
+    elif outcome == DONE:
+        averages = await request_season_averages(
+            [player[0] for player in query.players], query.season
+        )
+        button = [
+            ['Выбрать другой сезон', 'Сравнить других игроков'],
+            ['В начало']
+        ]
+        text = 'К сожалению ничего не найдено'
+        if any(averages.values()):
+            table = season_comparison(
+                [averages[player[0]] for player in query.players],
+                [player[2] for player in query.players]
+            )
+            text = 'Сравнение игроков за сезон *{}-{}*:\n{}\n\n{}'.format(
+                query.season, query.season + 1,
+                '\n'.join(
+                    f'{first_name} {last_name}'
+                    for _, first_name, last_name in query.players
+                ),
+                table
+            )
+
+    return await send_text_message(
         context=context,
         chat_id=chat.id,
         text=text,
@@ -668,49 +1328,33 @@ def view_season_statistics(update, context):
     )
 
 
-def preview_games(update, context):
+@metrics.handler
+async def preview_games(update, context, outcome=None):
     """
     Функция возвращает этапы диалога с пользователем для уточнения параметров 
     выборки отображения игр.
-    По результатам диалога в словаре user_data объекта context создается 
-    список параметров с ключом 'games', который будет использован функцией 
-    view_games(). Список вопросов, уточняющих вопросов и наборы кнопок 
-    диалогового меню находятся в словаре VIEW_GAMES модуля constants. 
-    Ответы пользователя на уточняющие вопросы проходят валидацию 
-    в функции validator().
+    По результатам диалога в словаре user_data объекта context по ключу 
+    'dialog' собирается запись параметров GamesQuery, которая будет 
+    использована функцией view_games(). Шаги диалога собраны модулем 
+    dialog из словаря VIEW_GAMES модуля constants. Ответ пользователя 
+    уже применен к диалогу в check_answer(), результат передается 
+    в аргументе outcome (None - диалог только начинается).
     """
     logger.debug('Начало работы функции %s.', preview_games.__name__)
     chat = update.effective_chat
-    answer = update.message.text
-    flag_dict = context.user_data.get('games')
-    button = [['Назад'], ['В начало']]
-    text = None
-
-    if flag_dict is None:
-        text = 'Какие игры Вас интересуют?'
-        button = [['Только плей-офф'], ['Все игры'], ['В начало']]
-        context.user_data['games'] = []
-
-    else:    
-        count = len(flag_dict)
-        if answer == VIEW_GAMES.get(count).get('answer')[0]:
-            text = VIEW_GAMES.get(count).get('additional')
-            if text is None:
-                context.user_data.get('games').append(True)
-        elif answer == VIEW_GAMES.get(count).get('answer')[1]:
-            context.user_data.get('games').append(None)
-        elif validator(update, context):
-            context.user_data.get('games').append(answer)
-            if len(context.user_data.get('games')) in (3, 5):
-                return view_games(update, context)
-        else:
-            text = 'Попробуйте уточнить запрос. Ответа не найдено.'
-
-        if text is None or answer == 'Назад':
-            text = VIEW_GAMES.get(count).get('text')
-            button = VIEW_GAMES.get(count).get('button')
-
-    return send_text_message(
+    conversation = context.user_data.get('dialog')
+    if outcome is None:
+        conversation = Conversation.start('games')
+        context.user_data['dialog'] = conversation
+    elif outcome == DONE:
+        return await view_games(update, context)
+    text = conversation.step.text
+    button = conversation.step.button
+    if outcome == REJECTED:
+        text = 'Попробуйте уточнить запрос. Ответа не найдено.'
+        button = [['Назад'], ['В начало']]
+
+    return await send_text_message(
         context=context,
         chat_id=chat.id,
         text=text,
@@ -721,10 +1365,12 @@ def preview_games(update, context):
     )
 
 
-def view_games(update, context):
+@metrics.handler
+async def view_games(update, context):
     """
     Функция отображения игр в рамках выборки пользователя.
-    Получает данные из user_data объекта context о параметрах выборки. 
+    Получает из user_data объекта context запись параметров выборки 
+    GamesQuery. 
     Создает из параметров запрос, обрабатывает ответ и предоставляет его 
     пользователю. 
     JSON-ответ обрабатывает с помощью функции game_view() модуля models.
@@ -738,50 +1384,37 @@ def view_games(update, context):
     chat = update.effective_chat
     button = [['В начало']]
     text = 'К сожалению ничего не найдено'
-    user_data = context.user_data.get('games')
-    playoff, team_id, season = user_data[0], user_data[1], user_data[2]
+    query = context.user_data.get('dialog').query
     params ={
         'per_page': 5,
-        'postseason': playoff,
-        'team_ids[]': team_id,
-        'seasons[]': season
+        'postseason': query.playoff,
+        'team_ids[]': query.team_id,
+        'seasons[]': query.season
     }
 
-    if not isinstance(season, str):
-        if not user_data[3]:
-            user_data = (user_data[4]).split(' ')
-            start_date, end_date = *user_data,
-            start_date = '-'.join(reversed(start_date.split('-')))
-            end_date = '-'.join(reversed(end_date.split('-')))
-            pairs = {'start_date': start_date, 'end_date': end_date}
-            params.update(pairs)
-        else:
-            date = user_data[4]
-            params.update({'dates[]': date})
+    if query.season is None:
+        params.update(date_params(query))
 
-    response, final_url = check_api_service(endpoint, params)
-    response = check_response_content(response, endpoint)
-    if check_not_empty_response(response, endpoint):
+    response, base_url, pages_count = await request_newest_page(
+        endpoint, params
+    )
+    if check_not_empty_response(response, base_url):
         response_list = response.get('data')
         games_count = response.get('meta').get('total_count')
-        pages_count = response.get('meta').get('total_pages')
-        result = [game_view(i) for i in response_list]
+        timezone = user_timezone(context)
+        result = [game_view(i, timezone) for i in response_list]
         if pages_count > 1:
-            page = pages_count
             button = [['Следующие игры'], ['В начало']]
-            context.user_data['current_endpoint'] = final_url
-            context.user_data['current_page'] = page
-            params.update({'page': page})
-            response, endpoint = check_api_service(endpoint, params)
-            response = check_response_content(response, endpoint)
-            if check_not_empty_response(response, endpoint):
-                response_list = response.get('data')
-                result = [game_view(i) for i in response_list]
+            context.user_data['current_endpoint'] = base_url
+            context.user_data['current_page'] = pages_count
+            page_prefetcher.schedule(
+                chat.id, base_url, pages_count, pages_count
+            )
         text = ('Количество игр в выборке: *{}*\nСписок игр:\n{}'.format(
                 games_count, '\n'.join(reversed(result))
         ))
  
-    return send_text_message(
+    return await send_text_message(
         context=context,
         chat_id=chat.id,
         text=text,
@@ -792,39 +1425,46 @@ def view_games(update, context):
     )
 
 
-def flipp_pages(update, context):
+@metrics.handler
+async def flipp_pages(update, context):
     """
     Функция позволяет пользователю 'листать страницы' в случае 
     получения большого количества игр по результатам выборки.
     Необходимые параметры: эндпоинт и текущую страницу получает 
     из словаря user_data объекта context. Оттуда же достает 
-    сведения о типе отображаемых данных - 'статистика игрока' 
-    или 'список игр' - для вызова необходимой функции обработки 
-    и представления полученной информации.
+    текущий диалог - 'статистика игрока' или 'список игр' - для вызова 
+    необходимой функции обработки и представления полученной информации.
     """
     logger.debug('Начало работы функции %s.', flipp_pages.__name__)
     chat = update.effective_chat
     answer = update.message.text
     button = [['Предыдущие игры'], ['Следующие игры'], ['В начало']]
-    endpoint = context.user_data.get('current_endpoint')
+    base_url = context.user_data.get('current_endpoint')
     current_page = context.user_data.get('current_page')
+    conversation = context.user_data.get('dialog')
+    flow = conversation.flow if conversation is not None else None
+    if base_url is None:
+        return await get_head_page(update, context, False)
     if answer == 'Следующие игры':
         page = current_page - 1
     else:
         page = current_page + 1
     context.user_data['current_page'] = page
     params = {'page': page}
-    response, endpoint = check_api_service(endpoint, params)
+    response, endpoint = await call_api(base_url, params)
     response = check_response_content(response, endpoint)
     if check_not_empty_response(response, endpoint):
         response_list = response.get('data')
         pages_count = response.get('meta').get('total_pages')
         games_count = response.get('meta').get('total_count')
+        page_planner.remember(base_url, pages_count, page)
+        page_prefetcher.schedule(chat.id, base_url, page, pages_count)
         if page == pages_count:
             button = [['Следующие игры'], ['В начало']]
         if page == 1:
             button = [['Предыдущие игры'], ['В начало']]
-        if context.user_data.get('statistics'):
+        if flow == 'statistics':
+            button.insert(-1, AGGREGATE_BUTTONS)
             result = [statistics_per_game(i) for i in response_list]
             first_name = context.user_data.get('player')[1]
             last_name = context.user_data.get('player')[2]
@@ -833,8 +1473,9 @@ def flipp_pages(update, context):
                 first_name, last_name, games_count,
                 '\n'.join(reversed(result))
             )
-        elif context.user_data.get('games'):
-            result = [game_view(i) for i in response_list]
+        elif flow == 'games':
+            timezone = user_timezone(context)
+            result = [game_view(i, timezone) for i in response_list]
             text = ('Количество игр в выборке: *{}*\nСписок игр:\n{}'.format(
                 games_count, '\n'.join(reversed(result))
             ))
@@ -846,7 +1487,7 @@ def flipp_pages(update, context):
             )
             text = 'Что-то пошло не так. Попробуйте позднее.'
 
-    return send_text_message(
+    return await send_text_message(
         context=context,
         chat_id=chat.id,
         text=text,
@@ -857,19 +1498,192 @@ def flipp_pages(update, context):
     )
 
 
+COMMANDS = {
+    'В начало': functools.partial(get_head_page, start=False),
+    'Назад': back_to_the_future,
+    'Следующие игры': flipp_pages,
+    'Предыдущие игры': flipp_pages,
+    AGGREGATE_BUTTONS[0]: aggregate_statistics,
+    AGGREGATE_BUTTONS[1]: functools.partial(
+        aggregate_statistics, last=AGGREGATE_LAST_GAMES
+    ),
+}
+
+PAGED_VIEW_ANSWERS = {
+    'Следующие игры', 'Предыдущие игры', *AGGREGATE_BUTTONS
+}
+
+MENU_COMMANDS = {
+    'Игры': preview_games,
+    'Команды': view_teams,
+    'Игроки и статистика': search_player,
+    'Сравнение игроков': compare_players,
+}
+
+FLOW_HANDLERS = {
+    'player': search_player,
+    'average': view_season_statistics,
+    'games': preview_games,
+    'statistics': preview_statistics,
+    'compare': compare_players,
+}
+
+
+def check_modes():
+    """Проверяет режимы работы бота, заданные переменными окружения."""
+    if EXECUTION_MODE not in EXECUTION_MODES:
+        logger.critical(
+            'Неизвестный режим работы EXECUTION_MODE: %s. '
+            'Допустимые значения: %s.', EXECUTION_MODE, EXECUTION_MODES
+        )
+        return False
+    if SERVING_MODE not in SERVING_MODES:
+        logger.critical(
+            'Неизвестный способ получения обновлений SERVING_MODE: %s. '
+            'Допустимые значения: %s.', SERVING_MODE, SERVING_MODES
+        )
+        return False
+    if SERVING_MODE == 'webhook' and not WEBHOOK_SECRET:
+        logger.critical(
+            'Для работы через вебхук нужна переменная окружения '
+            'WEBHOOK_SECRET.'
+        )
+        return False
+    return True
+
+
+def start_webhook(updater):
+    """
+    Запускает диспетчер и встроенный HTTP-сервер вебхука.
+    Если задан внешний адрес WEBHOOK_URL, регистрирует вебхук в Телеграм.
+    """
+    server = WebhookServer(
+        WEBHOOK_LISTEN, WEBHOOK_PORT, WEBHOOK_SECRET,
+        updater.bot, updater.update_queue
+    )
+    threading.Thread(
+        target=updater.dispatcher.start, name='dispatcher', daemon=True
+    ).start()
+    updater.job_queue.start()
+    server.start()
+    if WEBHOOK_URL:
+        updater.bot.set_webhook(
+            url=f'{WEBHOOK_URL.rstrip("/")}/{WEBHOOK_SECRET}',
+            secret_token=WEBHOOK_SECRET
+        )
+    return server
+
+
+def start_metrics():
+    """
+    Подключает счетчики кэшей, хранилища, ограничителя частоты, клиентов 
+    API и фоновых задач к реестру metrics и запускает HTTP-сервер метрик 
+    на METRICS_LISTEN:METRICS_PORT.
+    """
+    sources = {
+        'response_cache': response_cache.stats,
+        'history_store': history_store.stats,
+        'rate_limiter': lambda: dict(
+            rate_limiter.stats(), limit=API_RATE_LIMIT, period=API_RATE_PERIOD
+        ),
+        'api_client': lambda: {'endpoints': api_client.stats()},
+        'async_api_client': lambda: {'endpoints': async_api_client.stats()},
+        'page_planner': page_planner.stats,
+        'page_prefetcher': page_prefetcher.stats,
+        'page_fetcher': page_fetcher.stats,
+        'player_catalog': player_catalog.stats,
+        'fragment_cache': fragment_cache.stats,
+        'time_cache': lambda: {'caches': time_cache_info()},
+        'game_follower': game_follower.stats,
+        'season_averages': season_averages.stats,
+        'request_flights': request_flights.stats,
+        'send_queue': send_queue.stats,
+    }
+    for name, collect in sources.items():
+        metrics.register(name, collect)
+    return MetricsServer(METRICS_LISTEN, METRICS_PORT, metrics).start()
+
+
+def wait_for_stop_signal():
+    """Блокирует главный поток до получения сигнала остановки."""
+    stop = threading.Event()
+    for signum in (signal.SIGINT, signal.SIGTERM, signal.SIGABRT):
+        signal.signal(signum, lambda *args: stop.set())
+    while not stop.wait(1):
+        pass
+
+
 def main():
     logger.debug('Начало работы функции %s.', main.__name__)
-    if not check_tokens():
+    if not check_tokens() or not check_modes():
         raise SystemExit
 
+    team_registry.start(load_teams)
+    player_catalog.start(load_players)
+    game_follower.start(load_followed_games)
+    page_prefetcher.start(
+        functools.partial(check_api_service, priority=PRIORITY_BACKGROUND)
+    )
+    page_fetcher.start(
+        functools.partial(fetch_page, priority=PRIORITY_INTERACTIVE)
+    )
+    send_queue.start()
+    metrics_server = start_metrics() if METRICS_PORT else None
     updater = Updater(token=BOT_TOKEN)
 
-    updater.dispatcher.add_handler(CommandHandler('start', get_head_page))
-    updater.dispatcher.add_handler(MessageHandler(Filters.all, check_answer))
-    updater.dispatcher.add_error_handler(send_error_message)
+    runner = None
+    wrap = sync_callback
+    wrap_error = sync_callback
+    if EXECUTION_MODE == 'asyncio':
+        runner = EventLoopThread().start()
+        wrap = runner.callback
+        wrap_error = functools.partial(runner.callback, report_errors=False)
+    logger.info(
+        'Режим работы обработчиков: %s, получение обновлений: %s.',
+        EXECUTION_MODE, SERVING_MODE
+    )
 
-    updater.start_polling(poll_interval=4.0)
-    updater.idle()
+    updater.dispatcher.add_handler(
+        CommandHandler('start', wrap(get_head_page))
+    )
+    updater.dispatcher.add_handler(
+        CommandHandler('timezone', wrap(set_timezone))
+    )
+    updater.dispatcher.add_handler(
+        CommandHandler('follow', wrap(follow_game))
+    )
+    updater.dispatcher.add_handler(
+        CommandHandler('unfollow', wrap(unfollow_game))
+    )
+    updater.dispatcher.add_handler(
+        CommandHandler('profile', wrap(start_profiling))
+    )
+    updater.job_queue.run_repeating(
+        poll_followed_games, interval=FOLLOW_POLL_INTERVAL,
+        first=FOLLOW_POLL_INTERVAL
+    )
+    updater.dispatcher.add_handler(
+        MessageHandler(Filters.all, wrap(check_answer))
+    )
+    updater.dispatcher.add_error_handler(wrap_error(send_error_message))
+
+    if SERVING_MODE == 'webhook':
+        server = start_webhook(updater)
+        wait_for_stop_signal()
+        server.stop()
+        updater.job_queue.stop()
+        updater.dispatcher.stop()
+    else:
+        updater.start_polling(poll_interval=POLL_INTERVAL)
+        updater.idle()
+    page_prefetcher.stop()
+    page_fetcher.stop()
+    send_queue.stop()
+    profiler.stop()
+    if metrics_server is not None:
+        metrics_server.stop()
+    if runner is not None:
+        runner.stop(async_api_client.close())
 
 
 if __name__ == '__main__':
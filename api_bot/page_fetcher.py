@@ -0,0 +1,131 @@
+"""
+Параллельная загрузка всех страниц больших выборок (статистика игрока
+за сезон, игры сезона). Первая страница сообщает число страниц
+meta.total_pages, остальные запрашиваются одновременно в пуле потоков,
+а отдаются потребителю строго по порядку номеров.
+"""
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from api_client import backoff_delay
+from constants import API_PAGE_SIZE, PAGE_FETCH_RETRIES, PAGE_FETCH_WORKERS
+from pagination import page_params
+
+logger = logging.getLogger(__name__)
+
+
+class PageFetcher:
+    """
+    Загружает страницы выборки в пуле из workers потоков.
+    Функция запроса передается в start(): она должна сама ходить через
+    кэш и ограничитель частоты, поэтому параллельные запросы не выходят
+    за общий лимит API-сервиса. Вперед запрашивается не больше
+    2 * workers страниц, так что память не зависит от размера выборки.
+    Неудачная страница запрашивается повторно до retries раз,
+    остальные страницы при этом не перезапрашиваются.
+    """
+
+    def __init__(
+        self, workers=PAGE_FETCH_WORKERS, retries=PAGE_FETCH_RETRIES
+    ):
+        self.workers = workers
+        self.retries = retries
+        self.fetch = None
+        self._executor = None
+        self._lock = threading.Lock()
+        self.queries = 0
+        self.pages = 0
+        self.retried = 0
+        self.failed = 0
+
+    def start(self, fetch):
+        """Запускает пул потоков с функцией запроса fetch(url, params)."""
+        self.fetch = fetch
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.workers, thread_name_prefix='page-fetch'
+        )
+        return self
+
+    def stop(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+    def iter_pages(self, endpoint, params=None, per_page=API_PAGE_SIZE):
+        """
+        Генератор страниц выборки (списков data) по порядку номеров.
+        Без запущенного пула страницы запрашиваются по очереди в текущем
+        потоке. Прерванный обход отменяет еще не начатые запросы.
+        """
+        with self._lock:
+            self.queries += 1
+        response = self._fetch_page(endpoint, params, 1, per_page)
+        yield response.get('data')
+        pages_count = response.get('meta').get('total_pages') or 1
+        numbers = iter(range(2, pages_count + 1))
+        executor = self._executor
+        if executor is None:
+            for page in numbers:
+                response = self._fetch_page(endpoint, params, page, per_page)
+                yield response.get('data')
+            return
+        window = deque()
+        try:
+            for page in numbers:
+                window.append(executor.submit(
+                    self._fetch_page, endpoint, params, page, per_page
+                ))
+                if len(window) >= 2 * self.workers:
+                    break
+            while window:
+                response = window.popleft().result()
+                page = next(numbers, None)
+                if page is not None:
+                    window.append(executor.submit(
+                        self._fetch_page, endpoint, params, page, per_page
+                    ))
+                yield response.get('data')
+        finally:
+            for future in window:
+                future.cancel()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'workers': self.workers,
+                'queries': self.queries,
+                'pages': self.pages,
+                'retried': self.retried,
+                'failed': self.failed,
+            }
+
+    def _fetch_page(self, endpoint, params, page, per_page):
+        attempt = 0
+        while True:
+            try:
+                response = self.fetch(
+                    endpoint, page_params(params, page, per_page)
+                )
+            except Exception as error:
+                if attempt >= self.retries:
+                    with self._lock:
+                        self.failed += 1
+                    raise
+                logger.warning(
+                    'Повтор запроса страницы %s для %s: %s',
+                    page, endpoint, error
+                )
+                with self._lock:
+                    self.retried += 1
+                time.sleep(backoff_delay(attempt))
+                attempt += 1
+            else:
+                with self._lock:
+                    self.pages += 1
+                return response
+
+
+page_fetcher = PageFetcher()
@@ -0,0 +1,105 @@
+"""
+Планировщик постраничных запросов.
+Запоминает количество страниц для каждой выборки, чтобы следующий такой же
+запрос сразу уходил за последней (самой свежей) страницей.
+Для массового чтения выборок - итераторы страниц и записей, которые
+запрашивают страницы по одной по мере потребления.
+"""
+import threading
+from collections import OrderedDict
+
+from cache import normalize_url
+from constants import API_PAGE_SIZE, PAGE_PLANNER_SIZE
+
+
+class PagePlanner:
+    """
+    Хранит число страниц по нормализованному URL выборки (без номера
+    страницы). Размер ограничен, старые выборки вытесняются.
+    """
+
+    def __init__(self, size=PAGE_PLANNER_SIZE):
+        self.size = size
+        self._pages = OrderedDict()
+        self._lock = threading.Lock()
+        self.planned = 0
+        self.replanned = 0
+
+    @staticmethod
+    def query_key(endpoint, params=None):
+        """Нормализованный URL выборки без параметра page."""
+        params = {
+            key: value for key, value in (params or {}).items()
+            if key != 'page'
+        }
+        return normalize_url(endpoint, params)
+
+    def first_page(self, key):
+        """
+        Номер страницы, с которой начинать выборку: запомненная последняя
+        страница или 1, если выборка встречается впервые.
+        """
+        with self._lock:
+            pages = self._pages.get(key)
+            if pages is None:
+                return 1
+            self._pages.move_to_end(key)
+            self.planned += 1
+            return pages
+
+    def remember(self, key, pages, requested_page):
+        """
+        Запоминает число страниц выборки. Возвращает номер последней
+        страницы, если запрошенная страница ей не является и нужен еще
+        один запрос, иначе None.
+        """
+        pages = max(pages or 1, 1)
+        with self._lock:
+            self._pages[key] = pages
+            self._pages.move_to_end(key)
+            while len(self._pages) > self.size:
+                self._pages.popitem(last=False)
+            if pages == requested_page:
+                return None
+            if requested_page != 1:
+                self.replanned += 1
+            return pages
+
+    def stats(self):
+        with self._lock:
+            return {
+                'queries': len(self._pages),
+                'planned': self.planned,
+                'replanned': self.replanned,
+            }
+
+
+page_planner = PagePlanner()
+
+
+def page_params(params, page, per_page):
+    params = dict(params or {})
+    params.update({'page': page, 'per_page': per_page})
+    return params
+
+
+def iter_pages(fetch, endpoint, params=None, per_page=API_PAGE_SIZE):
+    """
+    Генератор страниц выборки: списков data ответов API-сервиса.
+    fetch(endpoint, params) запрашивает одну страницу и возвращает
+    проверенный ответ; следующая страница запрашивается, только когда
+    потребитель дошел до нее, поэтому в памяти находится одна страница,
+    а прерванный обход не делает лишних запросов.
+    """
+    page = 1
+    while page:
+        response = fetch(endpoint, page_params(params, page, per_page))
+        yield response.get('data')
+        page = response.get('meta').get('next_page')
+
+
+def iter_records(fetch, endpoint, params=None, per_page=API_PAGE_SIZE):
+    """Генератор записей выборки по всем ее страницам."""
+    for page in iter_pages(fetch, endpoint, params, per_page):
+        yield from page
+
@@ -0,0 +1,237 @@
+"""
+Локальный каталог игроков NBA для поиска без обращения к API-сервису.
+Каталог синхронизируется с API в фоновом потоке и сохраняется на диск.
+"""
+import bisect
+import json
+import logging
+import os
+import re
+import threading
+import time
+
+from constants import (
+    DATA_DIR, PLAYER_FUZZY_THRESHOLD, PLAYER_SUGGESTIONS,
+    PLAYERS_REFRESH_INTERVAL
+)
+
+logger = logging.getLogger(__name__)
+
+
+def catalog_path():
+    """Путь к сохраненному каталогу игроков."""
+    return os.path.join(os.getenv('DATA_DIR', DATA_DIR), 'players.json')
+
+
+def normalize_name(text):
+    """
+    Приводит имя к виду для поиска: нижний регистр, только латинские
+    буквы, слова через один пробел. 'D'Angelo_Russell' -> 'dangelo russell'.
+    """
+    text = text.lower().replace("'", '')
+    return ' '.join(re.findall(r'[a-z]+', text))
+
+
+def full_name(player):
+    return '{} {}'.format(player.get('first_name'), player.get('last_name'))
+
+
+def trigrams(name):
+    padded = f' {name} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class PlayerIndex:
+    """
+    Индексы каталога игроков, собранные один раз при загрузке:
+    точное полное имя, отсортированный список слов имени для поиска
+    по префиксам и триграммы для нечеткого поиска с опечатками.
+    """
+
+    def __init__(self, players):
+        self.players = {player['id']: player for player in players}
+        self.by_name = {}
+        self.by_token = {}
+        self.by_trigram = {}
+        self.names = {}
+        self.sizes = {}
+        for player_id, player in self.players.items():
+            name = normalize_name(full_name(player))
+            self.names[player_id] = name
+            self.by_name.setdefault(name, []).append(player_id)
+            for token in name.split():
+                self.by_token.setdefault(token, set()).add(player_id)
+            name_trigrams = trigrams(name)
+            self.sizes[player_id] = len(name_trigrams)
+            for trigram in name_trigrams:
+                self.by_trigram.setdefault(trigram, set()).add(player_id)
+        self.tokens = sorted(self.by_token)
+
+    def exact(self, name):
+        return self.by_name.get(name, [])
+
+    def prefix(self, name):
+        """
+        Игроки, у которых каждое слово запроса является началом
+        какого-либо слова имени.
+        """
+        tokens = name.split()
+        found = None
+        for token in tokens:
+            ids = set()
+            start = bisect.bisect_left(self.tokens, token)
+            for candidate in self.tokens[start:]:
+                if not candidate.startswith(token):
+                    break
+                ids |= self.by_token[candidate]
+            found = ids if found is None else found & ids
+            if not found:
+                return []
+
+        def rank(player_id):
+            words = self.names[player_id].split()
+            whole = sum(token in words for token in tokens)
+            return -whole, len(self.names[player_id]), self.names[player_id]
+
+        return sorted(found, key=rank)
+
+    def fuzzy(self, name, threshold=PLAYER_FUZZY_THRESHOLD):
+        """
+        Игроки, похожие на запрос по триграммам (коэффициент Жаккара
+        не ниже threshold), в порядке убывания сходства.
+        """
+        query = trigrams(name)
+        common = {}
+        for trigram in query:
+            for player_id in self.by_trigram.get(trigram, ()):
+                common[player_id] = common.get(player_id, 0) + 1
+        scored = []
+        for player_id, count in common.items():
+            total = len(query) + self.sizes[player_id] - count
+            score = count / total
+            if score >= threshold:
+                scored.append((-score, self.names[player_id], player_id))
+        return [player_id for _, _, player_id in sorted(scored)]
+
+
+class PlayerCatalog:
+    """
+    Каталог игроков с поиском по имени.
+    Сохраненный на диск снимок читается и индексируется в start(), еще
+    до приема сообщений: в режиме asyncio поиск выполняется в потоке
+    цикла событий, и разбор файла при первом поиске задержал бы все
+    чаты. Без start() снимок загружается при первом обращении.
+    Функция загрузки из API передается в start() и вызывается в фоне
+    раз в PLAYERS_REFRESH_INTERVAL секунд; первый раз - сразу, если
+    снимка нет или он устарел.
+    Пока каталог пуст, search() возвращает None, и поиск должен
+    выполняться через API-сервис.
+    """
+
+    def __init__(self):
+        self.loader = None
+        self._index = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def search(self, query, limit=PLAYER_SUGGESTIONS):
+        """
+        Ищет игроков по имени. Возвращает пару: список не более limit
+        игроков, упорядоченный по релевантности, и общее число
+        найденных. Запрос однозначен, если найден ровно один игрок.
+        Сначала ищет точное совпадение полного имени, затем совпадение
+        по началу слов, затем - похожие имена с учетом опечаток.
+        """
+        index = self._current()
+        if index is None or not index.players:
+            return None
+        name = normalize_name(query.replace('_', ' '))
+        found = []
+        if name:
+            found = (
+                index.exact(name) or index.prefix(name) or index.fuzzy(name)
+            )
+        if found:
+            self.hits += 1
+        else:
+            self.misses += 1
+        return [index.players[i] for i in found[:limit]], len(found)
+
+    def get(self, player_id):
+        """Возвращает игрока по ID или None."""
+        index = self._current()
+        return index.players.get(player_id) if index else None
+
+    def update(self, players):
+        """Перестраивает индексы и сохраняет каталог на диск."""
+        if not players:
+            return
+        self._index = PlayerIndex(players)
+        path = catalog_path()
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f'{path}.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as file:
+                json.dump({'data': players}, file, ensure_ascii=False)
+            os.replace(tmp_path, path)
+        except OSError as error:
+            logger.warning('Не удалось сохранить каталог игроков: %s', error)
+        logger.info('Каталог игроков обновлен: %s игроков.', len(players))
+
+    def start(self, loader, interval=PLAYERS_REFRESH_INTERVAL):
+        """
+        Индексирует сохраненный снимок и запускает фоновую
+        синхронизацию каталога функцией loader().
+        """
+        self.loader = loader
+        self._current()
+        thread = threading.Thread(
+            target=self._refresh_loop, args=(interval,),
+            name='players-refresh', daemon=True
+        )
+        thread.start()
+        return thread
+
+    def stats(self):
+        index = self._current()
+        return {
+            'players': len(index.players) if index else 0,
+            'hits': self.hits,
+            'misses': self.misses,
+        }
+
+    def _current(self):
+        if self._index is None:
+            with self._lock:
+                if self._index is None:
+                    self._index = PlayerIndex(self._read_snapshot())
+        return self._index
+
+    def _read_snapshot(self):
+        try:
+            with open(catalog_path(), encoding='utf-8') as file:
+                return json.load(file).get('data') or []
+        except (OSError, ValueError) as error:
+            logger.debug('Каталог игроков не прочитан: %s', error)
+        return []
+
+    def _snapshot_age(self):
+        try:
+            return time.time() - os.path.getmtime(catalog_path())
+        except OSError:
+            return None
+
+    def _refresh_loop(self, interval):
+        age = self._snapshot_age()
+        wait = 0 if age is None else max(interval - age, 0)
+        while True:
+            time.sleep(wait)
+            wait = interval
+            try:
+                self.update(self.loader())
+            except Exception as error:
+                logger.error('Сбой при обновлении каталога игроков: %s', error)
+
+
+player_catalog = PlayerCatalog()
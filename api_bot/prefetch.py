@@ -0,0 +1,144 @@
+"""
+Фоновая подгрузка соседних страниц выборки.
+Пока пользователь читает страницу N, страницы N-1 и N+1 запрашиваются
+в фоне и оседают в кэше ответов, поэтому листание не ждет сети.
+"""
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from constants import PREFETCH_WORKERS
+from exceptions import RateLimitTimeout, RequestCancelled
+
+logger = logging.getLogger(__name__)
+
+
+class PagePrefetcher:
+    """
+    Подгружает страницы в небольшом пуле потоков.
+    Функция запроса передается в start(): она должна сама ходить через
+    кэш и ограничитель частоты с фоновым приоритетом, чтобы подгрузка
+    не отнимала очередь у запросов пользователей.
+    Задания привязаны к чату: новое задание или cancel() отменяют
+    все еще не выполненные запросы этого чата. Событие отмены передается
+    в функцию запроса, поэтому отменяются и запросы, уже ждущие токен
+    в ограничителе частоты: они не расходуют лимит API-сервиса.
+    """
+
+    def __init__(self, workers=PREFETCH_WORKERS):
+        self.workers = workers
+        self.fetch = None
+        self._executor = None
+        self._jobs = {}
+        self._lock = threading.RLock()
+        self.scheduled = 0
+        self.fetched = 0
+        self.cancelled = 0
+        self.failed = 0
+
+    def start(self, fetch):
+        """
+        Запускает пул потоков с функцией запроса
+        fetch(url, params, cancelled=событие отмены).
+        """
+        self.fetch = fetch
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.workers, thread_name_prefix='prefetch'
+        )
+        return self
+
+    def stop(self):
+        with self._lock:
+            for chat_id in list(self._jobs):
+                self._cancel(chat_id)
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+    def schedule(self, chat_id, url, page, pages_count):
+        """
+        Ставит в очередь соседние с page страницы выборки url, отменяя
+        прежние задания чата. Без запущенного пула ничего не делает.
+        """
+        pages = [
+            number for number in (page - 1, page + 1)
+            if 1 <= number <= (pages_count or 0)
+        ]
+        with self._lock:
+            self._cancel(chat_id)
+            if self._executor is None or not pages:
+                return
+            cancelled = threading.Event()
+            futures = [
+                self._executor.submit(self._run, cancelled, url, number)
+                for number in pages
+            ]
+            job = self._jobs[chat_id] = (cancelled, futures)
+            self.scheduled += len(futures)
+        for future in futures:
+            future.add_done_callback(
+                lambda future: self._finish(chat_id, job)
+            )
+
+    def cancel(self, chat_id):
+        """Отменяет подгрузку для чата, покинувшего листание страниц."""
+        with self._lock:
+            self._cancel(chat_id)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'scheduled': self.scheduled,
+                'fetched': self.fetched,
+                'cancelled': self.cancelled,
+                'failed': self.failed,
+                'chats': len(self._jobs),
+            }
+
+    def _cancel(self, chat_id):
+        job = self._jobs.pop(chat_id, None)
+        if job is None:
+            return
+        cancelled, futures = job
+        cancelled.set()
+        for future in futures:
+            if future.cancel():
+                self.cancelled += 1
+
+    def _finish(self, chat_id, job):
+        with self._lock:
+            if self._jobs.get(chat_id) is job and all(
+                future.done() for future in job[1]
+            ):
+                del self._jobs[chat_id]
+
+    def _run(self, cancelled, url, page):
+        if cancelled.is_set():
+            with self._lock:
+                self.cancelled += 1
+            return
+        try:
+            self.fetch(url, {'page': page}, cancelled=cancelled)
+        except RequestCancelled:
+            with self._lock:
+                self.cancelled += 1
+        except RateLimitTimeout:
+            logger.debug(
+                'Подгрузка страницы %s для %s пропущена: нет токенов.',
+                page, url
+            )
+            with self._lock:
+                self.failed += 1
+        except Exception as error:
+            logger.warning(
+                'Не удалось подгрузить страницу %s для %s: %s',
+                page, url, error
+            )
+            with self._lock:
+                self.failed += 1
+        else:
+            with self._lock:
+                self.fetched += 1
+
+
+page_prefetcher = PagePrefetcher()
@@ -0,0 +1,183 @@
+"""
+Выборочный профилировщик всех потоков процесса.
+Отдельный поток раз в interval секунд снимает стеки всех остальных
+потоков через sys._current_frames() и считает, сколько раз встретилась
+каждая функция и каждый стек целиком. Накладные расходы не зависят
+от числа вызовов функций, поэтому профилировать можно работающего бота.
+Результат - сводка функций с наибольшим временем и стеки в свернутом
+формате (collapsed stacks) для построения flame graph.
+Профиль измеряет время по часам, а не процессорное: поток, который ждет
+внутри C-функции (ответа сокета, time.sleep), попадает в выборку
+функцией, которая ее вызвала, - так видно, где обработчики теряют время
+на ожидании API. Не учитываются только заведомо простаивающие потоки:
+ждущие очереди, события или готовности сокетов, спящие между
+обновлениями фоновые циклы и долгий опрос Телеграма.
+"""
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+from constants import PROFILE_INTERVAL, PROFILE_TOP
+
+IDLE_FRAMES = {
+    ('threading.py', 'wait'),
+    ('threading.py', '_wait_for_tstate_lock'),
+    ('queue.py', 'get'),
+    ('selectors.py', 'select'),
+    ('players.py', '_refresh_loop'),
+    ('updater.py', 'idle'),
+}
+
+IDLE_CALLERS = {
+    ('bot.py', 'get_updates'),
+}
+
+
+def frame_label(code):
+    return '{} ({}:{})'.format(
+        code.co_name, os.path.basename(code.co_filename), code.co_firstlineno
+    )
+
+
+def frame_key(code):
+    return os.path.basename(code.co_filename), code.co_name
+
+
+def is_idle(frame):
+    """
+    Поток простаивает: на вершине стека ожидание (IDLE_FRAMES) или цикл,
+    который вне своих вложенных вызовов только спит в time.sleep,
+    либо где-то в стеке долгий опрос (IDLE_CALLERS), который ждет
+    ответа сокета без питоновского кадра ожидания.
+    """
+    if frame_key(frame.f_code) in IDLE_FRAMES:
+        return True
+    while frame is not None:
+        if frame_key(frame.f_code) in IDLE_CALLERS:
+            return True
+        frame = frame.f_back
+    return False
+
+
+class Profile:
+    """
+    Результат профилирования: число выборок, собственные (функция
+    на вершине стека) и полные (функция где-то в стеке) счетчики
+    функций и счетчики свернутых стеков 'поток;внешняя;...;внутренняя'.
+    """
+
+    def __init__(self, duration, samples, own, total, stacks, threads):
+        self.duration = duration
+        self.samples = samples
+        self.own = own
+        self.total = total
+        self.stacks = stacks
+        self.threads = threads
+
+    def summary(self, top=PROFILE_TOP):
+        """Текстовая сводка top функций с наибольшим собственным временем."""
+        lines = [
+            'Профиль за {:.1f} с: {} выборок по {} потокам '
+            '(время по часам, простаивающие потоки не учитываются).'.format(
+                self.duration, self.samples, len(self.threads)
+            )
+        ]
+        if not self.samples:
+            return lines[0]
+        lines.append('\nсобств.  полное  функция')
+        for label, count in self.own.most_common(top):
+            lines.append('{:6.1f}% {:6.1f}%  {}'.format(
+                count * 100 / self.samples,
+                self.total[label] * 100 / self.samples, label
+            ))
+        lines.append('\nВыборки по потокам: ' + ', '.join(
+            f'{name} - {count}' for name, count in self.threads.most_common()
+        ))
+        return '\n'.join(lines)
+
+    def collapsed(self):
+        """Стеки в свернутом формате: строка 'стек число' на стек."""
+        return ''.join(
+            f'{stack} {count}\n' for stack, count in sorted(
+                self.stacks.items()
+            )
+        )
+
+
+class SamplingProfiler:
+    """
+    Профилировщик с одним сеансом за раз: start() запускает поток
+    выборок на seconds секунд, result() дожидается его окончания
+    и возвращает Profile.
+    """
+
+    def __init__(self, interval=PROFILE_INTERVAL):
+        self.interval = interval
+        self._thread = None
+        self._profile = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, seconds):
+        """Запускает сеанс. Возвращает False, если сеанс уже идет."""
+        with self._lock:
+            if self.running:
+                return False
+            self._stop.clear()
+            self._profile = None
+            self._thread = threading.Thread(
+                target=self._sample, args=(seconds,), name='profiler',
+                daemon=True
+            )
+            self._thread.start()
+            return True
+
+    def stop(self):
+        self._stop.set()
+
+    def result(self, timeout=None):
+        """Дожидается окончания сеанса и возвращает его Profile."""
+        thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+        return self._profile
+
+    def _sample(self, seconds):
+        own = Counter()
+        total = Counter()
+        stacks = Counter()
+        threads = Counter()
+        samples = 0
+        me = threading.get_ident()
+        start = time.monotonic()
+        deadline = start + seconds
+        while not self._stop.is_set() and time.monotonic() < deadline:
+            names = {
+                thread.ident: thread.name for thread in threading.enumerate()
+            }
+            for ident, frame in sys._current_frames().items():
+                if ident == me or is_idle(frame):
+                    continue
+                labels = []
+                while frame is not None:
+                    labels.append(frame_label(frame.f_code))
+                    frame = frame.f_back
+                name = names.get(ident, str(ident)).replace(';', ' ')
+                samples += 1
+                threads[name] += 1
+                own[labels[0]] += 1
+                total.update(set(labels))
+                stacks[';'.join([name] + labels[::-1])] += 1
+            self._stop.wait(self.interval)
+        self._profile = Profile(
+            time.monotonic() - start, samples, own, total, stacks, threads
+        )
+
+
+profiler = SamplingProfiler()
@@ -0,0 +1,192 @@
+"""
+Общий для процесса ограничитель частоты запросов к API-сервису.
+Реализован как 'ведро с токенами' с очередью ожидающих запросов,
+упорядоченной по приоритету.
+"""
+import asyncio
+import heapq
+import itertools
+import logging
+import threading
+import time
+
+from constants import (
+    API_QUEUE_DEADLINE, API_RATE_BURST, API_RATE_LIMIT, API_RATE_PERIOD,
+    CANCEL_CHECK_INTERVAL, PRIORITY_BACKGROUND, PRIORITY_INTERACTIVE,
+    RESERVED_TOKENS
+)
+from exceptions import RateLimitTimeout, RequestCancelled
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucketLimiter:
+    """
+    Ведро с токенами: каждый запрос к API забирает один токен.
+    Скорость пополнения подобрана так, чтобы вместе с запасом burst
+    за любой период period уходило не больше limit запросов.
+    Запросы, которым не хватило токена, ждут в очереди: сначала
+    обслуживаются интерактивные запросы пользователей, затем фоновые.
+    Для фоновых запросов часть токенов резервируется (RESERVED_TOKENS),
+    чтобы они не выбирали весь запас перед приходом пользователя.
+    """
+
+    def __init__(
+        self, limit=API_RATE_LIMIT, period=API_RATE_PERIOD,
+        burst=API_RATE_BURST
+    ):
+        self.capacity = burst
+        self.rate = (limit - burst) / period
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self._waiters = []
+        self._counter = itertools.count()
+        self._condition = threading.Condition()
+        self.granted = {PRIORITY_INTERACTIVE: 0, PRIORITY_BACKGROUND: 0}
+        self.expired = {PRIORITY_INTERACTIVE: 0, PRIORITY_BACKGROUND: 0}
+
+    def acquire(
+        self, priority=PRIORITY_INTERACTIVE, timeout=None, cancelled=None
+    ):
+        """
+        Забирает токен, при необходимости дожидаясь своей очереди.
+        Если токен не получен за timeout секунд (по умолчанию - из
+        API_QUEUE_DEADLINE для данного приоритета), поднимает исключение
+        RateLimitTimeout.
+        Если передано событие cancelled, ожидание проверяет его не реже
+        раза в CANCEL_CHECK_INTERVAL секунд и после отмены поднимает
+        RequestCancelled, не забирая токен.
+        """
+        if timeout is None:
+            timeout = API_QUEUE_DEADLINE[priority]
+        deadline = time.monotonic() + timeout
+        waiter = (priority, next(self._counter))
+        with self._condition:
+            heapq.heappush(self._waiters, waiter)
+            try:
+                while True:
+                    if cancelled is not None and cancelled.is_set():
+                        raise RequestCancelled(
+                            'Запрос к API-сервису отменен в очереди.'
+                        )
+                    now = time.monotonic()
+                    self._refill(now)
+                    wait = self._wait_time(waiter, now)
+                    if wait == 0:
+                        self.tokens -= 1
+                        self.granted[priority] += 1
+                        return
+                    if now + wait > deadline:
+                        wait = deadline - now
+                        if wait <= 0:
+                            self.expired[priority] += 1
+                            raise RateLimitTimeout(
+                                f'Запрос не дождался очереди к API-сервису '
+                                f'за {timeout} сек.'
+                            )
+                    if cancelled is not None:
+                        wait = min(wait, CANCEL_CHECK_INTERVAL)
+                    self._condition.wait(wait)
+            finally:
+                self._waiters.remove(waiter)
+                heapq.heapify(self._waiters)
+                self._condition.notify_all()
+
+    async def acquire_async(self, priority=PRIORITY_INTERACTIVE, timeout=None):
+        """
+        Асинхронный аналог acquire() для режима asyncio: ожидание токена
+        не блокирует поток цикла событий. Корутины уступают очередь
+        потокам, которые ждут токен с тем же или более высоким приоритетом.
+        """
+        if timeout is None:
+            timeout = API_QUEUE_DEADLINE[priority]
+        deadline = time.monotonic() + timeout
+        while True:
+            with self._condition:
+                now = time.monotonic()
+                self._refill(now)
+                wait = self._try_acquire(priority, now)
+            if wait == 0:
+                return
+            if now + wait > deadline:
+                wait = deadline - now
+                if wait <= 0:
+                    with self._condition:
+                        self.expired[priority] += 1
+                    raise RateLimitTimeout(
+                        f'Запрос не дождался очереди к API-сервису '
+                        f'за {timeout} сек.'
+                    )
+            await asyncio.sleep(wait)
+
+    def pause(self, seconds):
+        """
+        Приостанавливает выдачу токенов (например, после ответа 429).
+        Запросы остаются в очереди и ждут окончания паузы.
+        """
+        with self._condition:
+            self.paused_until = max(
+                self.paused_until, time.monotonic() + seconds
+            )
+            self.tokens = 0.0
+            self._condition.notify_all()
+        logger.warning(
+            'Выдача токенов для запросов к API приостановлена на %s сек.',
+            seconds
+        )
+
+    def stats(self):
+        """Возвращает снимок состояния ведра и счетчиков."""
+        with self._condition:
+            self._refill(time.monotonic())
+            return {
+                'tokens': self.tokens,
+                'queued': len(self._waiters),
+                'granted': dict(self.granted),
+                'expired': dict(self.expired),
+            }
+
+    def _refill(self, now):
+        if now < self.paused_until:
+            self.updated = now
+            return
+        elapsed = max(0.0, now - max(self.updated, self.paused_until))
+        self.tokens = min(self.capacity, self.tokens + elapsed * self.rate)
+        self.updated = now
+
+    def _wait_time(self, waiter, now):
+        """
+        Время до момента, когда ожидающий запрос сможет забрать токен.
+        Ноль означает, что токен можно забирать прямо сейчас.
+        """
+        if now < self.paused_until:
+            return self.paused_until - now
+        if self._waiters[0] != waiter:
+            return self._next_token_time(1)
+        need = 1 + RESERVED_TOKENS[waiter[0]]
+        if self.tokens >= need:
+            return 0
+        return self._next_token_time(need)
+
+    def _try_acquire(self, priority, now):
+        """
+        Забирает токен без постановки в очередь потоков.
+        Возвращает ноль при успехе или время до следующей попытки.
+        """
+        if now < self.paused_until:
+            return self.paused_until - now
+        if self._waiters and self._waiters[0][0] <= priority:
+            return self._next_token_time(1)
+        need = 1 + RESERVED_TOKENS[priority]
+        if self.tokens < need:
+            return self._next_token_time(need)
+        self.tokens -= 1
+        self.granted[priority] += 1
+        return 0
+
+    def _next_token_time(self, need):
+        return max((need - self.tokens) / self.rate, 0.01)
+
+
+rate_limiter = TokenBucketLimiter()
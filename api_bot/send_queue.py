@@ -0,0 +1,334 @@
+"""
+Очередь исходящих сообщений в Телеграм.
+Телеграм пропускает от бота около 30 сообщений в секунду на все чаты
+и около одного сообщения в секунду в один чат, а при превышении
+отвечает ошибкой RetryAfter. Очередь выдерживает оба ограничения
+ведрами с токенами (общим и по чатам), отправляет ответы пользователям
+раньше уведомлений, а после RetryAfter приостанавливает отправку
+на указанное время и повторяет сообщение. Всплески сообщений
+растягиваются во времени, а не заканчиваются ошибками.
+В многопоточном режиме обработчики выполняются в единственном потоке
+диспетчера, поэтому там сообщение только ставится в очередь: ожидание
+темпа одного чата не должно задерживать ответы другим чатам.
+"""
+import asyncio
+import functools
+import heapq
+import itertools
+import logging
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from telegram.error import RetryAfter
+
+from async_runner import in_event_loop, run_blocking
+from constants import (
+    PRIORITY_BACKGROUND, PRIORITY_INTERACTIVE, TELEGRAM_CHAT_BURST,
+    TELEGRAM_CHAT_RATE, TELEGRAM_RATE_BURST, TELEGRAM_RATE_LIMIT,
+    TELEGRAM_RATE_PERIOD, TELEGRAM_SEND_RETRIES, TELEGRAM_SEND_WORKERS
+)
+from metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+PRUNE_INTERVAL = 60
+
+
+def method_name(func):
+    return getattr(func, '__name__', 'send')
+
+
+def report_failure(method, chat_id, future):
+    """Логирует сбой сообщения, отправленного без ожидания результата."""
+    if future.cancelled():
+        return
+    error = future.exception()
+    if error is not None:
+        logger.error(
+            'Сбой при отправке сообщения (%s) в чат %s: %s',
+            method, chat_id, error
+        )
+
+
+class Bucket:
+    """Ведро с запасом capacity токенов и пополнением rate токенов в с."""
+
+    def __init__(self, rate, capacity, now):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated = now
+
+    def wait_time(self, now):
+        """Время до появления целого токена; ноль - токен есть."""
+        if now > self.updated:
+            self.tokens = min(
+                self.capacity, self.tokens + (now - self.updated) * self.rate
+            )
+            self.updated = now
+        return max((1 - self.tokens) / self.rate, 0.0)
+
+    def take(self):
+        self.tokens -= 1
+
+    def empty(self, until):
+        """Забирает все токены; пополнение начнется с момента until."""
+        self.tokens = 0.0
+        self.updated = max(self.updated, until)
+
+
+class SendJob:
+    """Сообщение в очереди: вызов func(chat_id=chat_id, **kwargs)."""
+
+    def __init__(self, func, chat_id, kwargs, priority, seq):
+        self.func = func
+        self.chat_id = chat_id
+        self.kwargs = kwargs
+        self.priority = priority
+        self.seq = seq
+        self.queued = time.monotonic()
+        self.attempts = 0
+        self.future = Future()
+
+
+class SendQueue:
+    """
+    Очередь сообщений с приоритетами. Поток-планировщик выбирает первое
+    по приоритету и времени постановки сообщение, для которого есть
+    токен в общем ведре и в ведре его чата, и передает его в пул из
+    workers потоков отправки. Сообщения одного чата отправляются
+    по одному и в порядке постановки. Скорость общего ведра подобрана
+    так же, как в rate_limiter.TokenBucketLimiter: вместе с запасом burst
+    за любой период period уходит не больше limit сообщений.
+    После RetryAfter отправка всех сообщений приостанавливается
+    на retry_after секунд, а сообщение повторяется до retries раз.
+    """
+
+    def __init__(
+        self, limit=TELEGRAM_RATE_LIMIT, period=TELEGRAM_RATE_PERIOD,
+        burst=TELEGRAM_RATE_BURST, chat_rate=TELEGRAM_CHAT_RATE,
+        chat_burst=TELEGRAM_CHAT_BURST, workers=TELEGRAM_SEND_WORKERS,
+        retries=TELEGRAM_SEND_RETRIES
+    ):
+        self.rate = (limit - burst) / period
+        self.burst = burst
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.workers = workers
+        self.retries = retries
+        self.paused_until = 0.0
+        self._bucket = Bucket(self.rate, burst, time.monotonic())
+        self._chats = {}
+        self._busy = set()
+        self._queue = []
+        self._counter = itertools.count()
+        self._condition = threading.Condition()
+        self._executor = None
+        self._thread = None
+        self._pruned = time.monotonic()
+        self.sent = {PRIORITY_INTERACTIVE: 0, PRIORITY_BACKGROUND: 0}
+        self.throttled = 0
+        self.retried = 0
+        self.failed = 0
+
+    @property
+    def running(self):
+        return self._executor is not None
+
+    def start(self):
+        """Запускает планировщик и пул потоков отправки."""
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.workers, thread_name_prefix='telegram-send'
+        )
+        self._thread = threading.Thread(
+            target=self._dispatch, name='telegram-queue', daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Останавливает очередь; неотправленные сообщения отменяются."""
+        with self._condition:
+            executor, self._executor = self._executor, None
+            queue, self._queue = self._queue, []
+            self._condition.notify_all()
+        if executor is None:
+            return
+        self._thread.join()
+        executor.shutdown(wait=False)
+        for _, _, job in queue:
+            job.future.cancel()
+
+    def submit(
+        self, func, chat_id, priority=PRIORITY_INTERACTIVE, **kwargs
+    ):
+        """
+        Ставит вызов func(chat_id=chat_id, **kwargs) в очередь.
+        Возвращает concurrent.futures.Future с результатом отправки.
+        """
+        with self._condition:
+            job = SendJob(
+                func, chat_id, kwargs, priority, next(self._counter)
+            )
+            heapq.heappush(self._queue, (priority, job.seq, job))
+            self._condition.notify_all()
+        return job.future
+
+    async def send(
+        self, func, chat_id, priority=PRIORITY_INTERACTIVE, **kwargs
+    ):
+        """
+        Отправляет сообщение через очередь. В цикле событий дожидается
+        результата, не занимая поток; в многопоточном режиме только
+        ставит сообщение в очередь и возвращает None, а сбои отправки
+        логирует. Без запущенной очереди вызывает func сразу.
+        """
+        if not self.running:
+            with metrics.timer('telegram_send', method=method_name(func)):
+                return await run_blocking(func, chat_id=chat_id, **kwargs)
+        future = self.submit(func, chat_id, priority, **kwargs)
+        if in_event_loop():
+            return await asyncio.wrap_future(future)
+        future.add_done_callback(
+            functools.partial(report_failure, method_name(func), chat_id)
+        )
+        return None
+
+    def stats(self):
+        with self._condition:
+            queued = {PRIORITY_INTERACTIVE: 0, PRIORITY_BACKGROUND: 0}
+            for priority, _, _ in self._queue:
+                queued[priority] = queued.get(priority, 0) + 1
+            return {
+                'queued': queued,
+                'in_flight': len(self._busy),
+                'paused': max(self.paused_until - time.monotonic(), 0.0),
+                'chats': len(self._chats),
+                'sent': dict(self.sent),
+                'throttled': self.throttled,
+                'retried': self.retried,
+                'failed': self.failed,
+            }
+
+    def _dispatch(self):
+        while True:
+            with self._condition:
+                while True:
+                    if self._executor is None:
+                        return
+                    now = time.monotonic()
+                    entry, wait = self._next_job(now)
+                    if entry is not None:
+                        break
+                    self._condition.wait(wait)
+                self._queue.remove(entry)
+                heapq.heapify(self._queue)
+                job = entry[2]
+                self._bucket.take()
+                self._chats[job.chat_id].take()
+                self._busy.add(job.chat_id)
+                executor = self._executor
+                if now - self._pruned > PRUNE_INTERVAL:
+                    self._prune(now)
+            if not job.attempts:
+                metrics.observe(
+                    'telegram_queue_wait_seconds', now - job.queued,
+                    priority=job.priority
+                )
+            executor.submit(self._send, job)
+
+    def _next_job(self, now):
+        """
+        Первое сообщение, которое можно отправить сейчас, или None
+        и время до следующей проверки (None - до изменения очереди).
+        """
+        if now < self.paused_until:
+            return None, self.paused_until - now
+        wait = self._bucket.wait_time(now)
+        if wait > 0:
+            return None, wait
+        wait = None
+        for entry in sorted(self._queue):
+            chat_id = entry[2].chat_id
+            if chat_id in self._busy:
+                continue
+            bucket = self._chats.get(chat_id)
+            if bucket is None:
+                bucket = self._chats[chat_id] = Bucket(
+                    self.chat_rate, self.chat_burst, now
+                )
+            chat_wait = bucket.wait_time(now)
+            if chat_wait == 0:
+                return entry, None
+            wait = chat_wait if wait is None else min(wait, chat_wait)
+        return None, wait
+
+    def _prune(self, now):
+        """Забывает ведра чатов, которые успели наполниться."""
+        self._pruned = now
+        for chat_id, bucket in list(self._chats.items()):
+            if chat_id in self._busy:
+                continue
+            bucket.wait_time(now)
+            if bucket.tokens >= bucket.capacity:
+                del self._chats[chat_id]
+
+    def _send(self, job):
+        try:
+            result = self._call(job)
+        except RetryAfter as error:
+            if not self._throttle(job, error.retry_after):
+                job.future.set_exception(error)
+        except BaseException as error:
+            self._release(job, 'failed')
+            job.future.set_exception(error)
+        else:
+            self._release(job, 'sent')
+            job.future.set_result(result)
+
+    @staticmethod
+    def _call(job):
+        with metrics.timer(
+            'telegram_send', method=method_name(job.func)
+        ) as labels:
+            try:
+                return job.func(chat_id=job.chat_id, **job.kwargs)
+            except RetryAfter:
+                labels['status'] = 'retry_after'
+                raise
+
+    def _throttle(self, job, retry_after):
+        """
+        Приостанавливает отправку после RetryAfter и возвращает
+        сообщение в очередь, если повторы не исчерпаны.
+        """
+        logger.warning(
+            'Телеграм ограничил отправку сообщений: пауза %s сек.',
+            retry_after
+        )
+        with self._condition:
+            self.throttled += 1
+            self.paused_until = max(
+                self.paused_until, time.monotonic() + retry_after
+            )
+            self._bucket.empty(self.paused_until)
+            retry = job.attempts < self.retries and self.running
+            if retry:
+                job.attempts += 1
+                self.retried += 1
+                heapq.heappush(self._queue, (job.priority, job.seq, job))
+        self._release(job, 'retried' if retry else 'failed')
+        return retry
+
+    def _release(self, job, outcome):
+        with self._condition:
+            self._busy.discard(job.chat_id)
+            if outcome == 'sent':
+                self.sent[job.priority] = self.sent.get(job.priority, 0) + 1
+            elif outcome == 'failed':
+                self.failed += 1
+            self._condition.notify_all()
+
+
+send_queue = SendQueue()
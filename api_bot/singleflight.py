@@ -0,0 +1,117 @@
+"""
+Объединение одинаковых одновременных запросов к API-сервису.
+Пока запрос по ключу (нормализованному URL) выполняется, все такие же
+запросы того же или более низкого приоритета не уходят на сервис,
+а дожидаются его результата. Ожидать можно как из потоков, так и
+из корутин цикла событий.
+"""
+import asyncio
+import threading
+from concurrent.futures import Future
+
+from constants import PRIORITY_INTERACTIVE
+from exceptions import RateLimitTimeout, RequestCancelled
+
+
+class Flight:
+    """Выполняющийся запрос: его результат и приоритет ведущего."""
+
+    def __init__(self, priority):
+        self.priority = priority
+        self.future = Future()
+
+
+class SingleFlight:
+    """
+    Выполняющиеся запросы по ключам. Первый вызов с ключом выполняет
+    функцию запроса, одновременные вызовы с тем же ключом получают
+    его результат или его исключение. Результат не запоминается:
+    после окончания запроса следующий вызов выполнит его заново
+    (повторы отсекает кэш ответов).
+    Вызов не присоединяется к запросу с более низким приоритетом
+    (меньшее число - более высокий приоритет): запрос пользователя
+    не должен ждать в очереди фоновых запросов. Такой вызов сам
+    выполняет запрос, и следующие вызовы ждут уже его.
+    Если ведущий запрос не дождался очереди или был отменен (исключения
+    retry_errors), ожидавшие его вызовы выполняют запрос сами.
+    """
+
+    def __init__(self, retry_errors=(RateLimitTimeout, RequestCancelled)):
+        self.retry_errors = retry_errors
+        self._calls = {}
+        self._lock = threading.Lock()
+        self.executed = 0
+        self.coalesced = 0
+        self.retried = 0
+
+    def do(self, key, fetch, priority=PRIORITY_INTERACTIVE):
+        """
+        Возвращает пару: результат fetch() и признак того, что он получен
+        от чужого запроса.
+        """
+        flight, leader = self._join(key, priority)
+        if not leader:
+            try:
+                return flight.future.result(), True
+            except self.retry_errors:
+                self._count_retry()
+                return fetch(), False
+        try:
+            result = fetch()
+        except BaseException as error:
+            self._finish(key, flight, error=error)
+            raise
+        self._finish(key, flight, result)
+        return result, False
+
+    async def do_async(self, key, fetch, priority=PRIORITY_INTERACTIVE):
+        """Аналог do() для корутины fetch()."""
+        flight, leader = self._join(key, priority)
+        if not leader:
+            try:
+                return await asyncio.wrap_future(flight.future), True
+            except self.retry_errors:
+                self._count_retry()
+                return await fetch(), False
+        try:
+            result = await fetch()
+        except BaseException as error:
+            self._finish(key, flight, error=error)
+            raise
+        self._finish(key, flight, result)
+        return result, False
+
+    def stats(self):
+        with self._lock:
+            return {
+                'in_flight': len(self._calls),
+                'executed': self.executed,
+                'coalesced': self.coalesced,
+                'retried': self.retried,
+            }
+
+    def _join(self, key, priority):
+        with self._lock:
+            flight = self._calls.get(key)
+            if flight is not None and flight.priority <= priority:
+                self.coalesced += 1
+                return flight, False
+            flight = self._calls[key] = Flight(priority)
+            self.executed += 1
+            return flight, True
+
+    def _count_retry(self):
+        with self._lock:
+            self.retried += 1
+
+    def _finish(self, key, flight, result=None, error=None):
+        with self._lock:
+            if self._calls.get(key) is flight:
+                del self._calls[key]
+        if error is not None:
+            flight.future.set_exception(error)
+        else:
+            flight.future.set_result(result)
+
+
+request_flights = SingleFlight()
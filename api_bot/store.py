@@ -0,0 +1,186 @@
+"""
+Постоянное хранилище неизменяемых исторических данных API-сервиса:
+оконченных игр, статистики по ним и средних показателей прошедших сезонов.
+Данные хранятся в SQLite и переживают перезапуск бота.
+"""
+import contextlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+from api_client import endpoint_name
+from constants import DATA_DIR
+from models import SeasonAverage
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS responses (
+    url TEXT PRIMARY KEY,
+    endpoint TEXT NOT NULL,
+    final_url TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    stored_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS season_averages (
+    player_id INTEGER NOT NULL,
+    season INTEGER NOT NULL,
+    payload TEXT NOT NULL,
+    PRIMARY KEY (player_id, season)
+);
+'''
+
+
+def default_path():
+    return os.path.join(os.getenv('DATA_DIR', DATA_DIR), 'history.sqlite3')
+
+
+class HistoryStore:
+    """
+    Хранилище ответов API в SQLite.
+    Страницы ответов сохраняются целиком по нормализованному URL, а средние
+    за сезон - дополнительно по паре (ID игрока, сезон), чтобы сравнение
+    игроков собирало их без запроса к API.
+    Соединение открывается при первом обращении и общее для всех потоков.
+    Сбои базы данных не ломают работу бота: при первой же ошибке
+    открытия, чтения или записи хранилище отключается до перезапуска,
+    и запросы идут в API-сервис.
+    Методы обращаются к диску, поэтому из цикла событий их вызывают
+    через run_blocking().
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+        self._connection = None
+        self._disabled = False
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        """
+        Возвращает сохраненный ответ: тройку (ответ, итоговый URL,
+        размер тела ответа) или None.
+        """
+        row = self._fetchone(
+            'SELECT payload, final_url FROM responses WHERE url = ?', (key,)
+        )
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return json.loads(row[0]), row[1], len(row[0])
+
+    def put(self, key, payload, final_url, text=None):
+        """
+        Сохраняет страницу ответа, а средние за сезон - еще и по игрокам.
+        """
+        if text is None:
+            text = json.dumps(payload)
+        name = endpoint_name(key)
+        data = payload.get('data') or []
+        with self._transaction() as cursor:
+            if cursor is None:
+                return
+            cursor.execute(
+                'INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?)',
+                (key, name, final_url, text, time.time())
+            )
+            if name == 'season_averages':
+                cursor.executemany(
+                    'INSERT OR REPLACE INTO season_averages VALUES (?, ?, ?)',
+                    [
+                        (item.get('player_id'), item.get('season'),
+                         json.dumps(item))
+                        for item in data
+                    ]
+                )
+
+    def season_average(self, player_id, season):
+        """Возвращает средние показатели игрока за сезон или None."""
+        row = self._fetchone(
+            'SELECT payload FROM season_averages '
+            'WHERE player_id = ? AND season = ?', (player_id, season)
+        )
+        if row is None:
+            return None
+        return SeasonAverage.from_json(json.loads(row[0]))
+
+    def stats(self):
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'disabled': int(self._disabled),
+        }
+
+    def _connect(self):
+        if self._connection is None and not self._disabled:
+            path = self.path or default_path()
+            try:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                connection = sqlite3.connect(path, check_same_thread=False)
+                connection.execute('PRAGMA journal_mode=WAL')
+                connection.executescript(SCHEMA)
+            except (OSError, sqlite3.Error) as error:
+                logger.error(
+                    'Хранилище истории %s недоступно: %s', path, error
+                )
+                self._disabled = True
+                return None
+            self._connection = connection
+        return self._connection
+
+    def _disable(self, action, error):
+        logger.error(
+            'Сбой %s хранилища истории, хранилище отключено: %s',
+            action, error
+        )
+        self._disabled = True
+        connection, self._connection = self._connection, None
+        with contextlib.suppress(sqlite3.Error):
+            connection.close()
+
+    def _fetchone(self, query, params):
+        rows = self._fetchall(query, params)
+        return rows[0] if rows else None
+
+    def _fetchall(self, query, params):
+        with self._lock:
+            connection = self._connect()
+            if connection is None:
+                return []
+            try:
+                return connection.execute(query, params).fetchall()
+            except sqlite3.Error as error:
+                self._disable('чтения', error)
+                return []
+
+    @contextlib.contextmanager
+    def _transaction(self):
+        """
+        Транзакция записи: фиксируется целиком или откатывается.
+        Сбой базы данных отключает хранилище, любое другое исключение
+        после отката передается вызывающему коду.
+        """
+        with self._lock:
+            connection = self._connect()
+            if connection is None:
+                yield None
+                return
+            try:
+                yield connection.cursor()
+                connection.commit()
+            except sqlite3.Error as error:
+                with contextlib.suppress(sqlite3.Error):
+                    connection.rollback()
+                self._disable('записи', error)
+            except BaseException:
+                with contextlib.suppress(sqlite3.Error):
+                    connection.rollback()
+                raise
+
+
+history_store = HistoryStore()
@@ -0,0 +1,139 @@
+"""
+Реестр команд NBA.
+Загружается лениво из сохраненного снимка (или снимка, поставляемого
+вместе с ботом) и обновляется из API-сервиса в фоновом потоке.
+"""
+import json
+import logging
+import os
+import threading
+import time
+
+from constants import (
+    DATA_DIR, TEAMS_MISS_REFRESH_INTERVAL, TEAMS_REFRESH_INTERVAL,
+    TEAMS_SNAPSHOT
+)
+
+logger = logging.getLogger(__name__)
+
+
+def persisted_snapshot_path():
+    """Путь к снимку, сохраненному после последнего обновления из API."""
+    return os.path.join(os.getenv('DATA_DIR', DATA_DIR), 'teams.json')
+
+
+class TeamRegistry:
+    """
+    Хранит команды в словарях по ID и по аббревиатуре, поэтому поиск
+    команды не зависит от того, идут ли ID подряд.
+    При первом обращении читает снимок с диска - сеть для старта бота
+    не нужна. Функция загрузки из API передается в start() и вызывается
+    в фоне раз в TEAMS_REFRESH_INTERVAL секунд или раньше, если
+    запрошена неизвестная реестру команда, но не чаще раза
+    в miss_interval секунд: список с несуществующей командой
+    не должен обновлять реестр при каждом показе.
+    """
+
+    def __init__(
+        self, bundled_path=TEAMS_SNAPSHOT,
+        miss_interval=TEAMS_MISS_REFRESH_INTERVAL
+    ):
+        self.bundled_path = bundled_path
+        self.miss_interval = miss_interval
+        self.loader = None
+        self.refreshed = None
+        self._by_id = None
+        self._by_abbreviation = None
+        self._lock = threading.Lock()
+        self._refresh = threading.Event()
+
+    def get(self, team_id):
+        """Возвращает команду по ID или None."""
+        team = self._teams().get(team_id)
+        if team is None and (
+            self.refreshed is None
+            or time.monotonic() - self.refreshed >= self.miss_interval
+        ):
+            self._refresh.set()
+        return team
+
+    def by_abbreviation(self, abbreviation):
+        """Возвращает команду по аббревиатуре (без учета регистра) или None."""
+        return self._indexes()[1].get(abbreviation.upper())
+
+    def all(self):
+        """Возвращает список команд, упорядоченный по ID."""
+        teams = self._teams()
+        return [teams[key] for key in sorted(teams)]
+
+    def update(self, teams):
+        """Заменяет содержимое реестра и сохраняет снимок на диск."""
+        if not teams:
+            return
+        self._set(teams)
+        path = persisted_snapshot_path()
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f'{path}.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as file:
+                json.dump({'data': teams}, file, ensure_ascii=False)
+            os.replace(tmp_path, path)
+        except OSError as error:
+            logger.warning('Не удалось сохранить список команд: %s', error)
+
+    def start(self, loader, interval=TEAMS_REFRESH_INTERVAL):
+        """Запускает фоновое обновление реестра функцией loader()."""
+        self.loader = loader
+        self._refresh.set()
+        thread = threading.Thread(
+            target=self._refresh_loop, args=(interval,),
+            name='teams-refresh', daemon=True
+        )
+        thread.start()
+        return thread
+
+    def _teams(self):
+        return self._indexes()[0]
+
+    def _indexes(self):
+        if self._by_id is None:
+            with self._lock:
+                if self._by_id is None:
+                    self._set(self._read_snapshot(), locked=True)
+        return self._by_id, self._by_abbreviation
+
+    def _set(self, teams, locked=False):
+        by_id = {team['id']: team for team in teams}
+        by_abbreviation = {
+            team['abbreviation'].upper(): team
+            for team in teams if team.get('abbreviation')
+        }
+        if locked:
+            self._by_abbreviation = by_abbreviation
+            self._by_id = by_id
+            return
+        with self._lock:
+            self._by_abbreviation = by_abbreviation
+            self._by_id = by_id
+
+    def _read_snapshot(self):
+        for path in (persisted_snapshot_path(), self.bundled_path):
+            try:
+                with open(path, encoding='utf-8') as file:
+                    return json.load(file).get('data') or []
+            except (OSError, ValueError) as error:
+                logger.debug('Снимок команд %s не прочитан: %s', path, error)
+        return []
+
+    def _refresh_loop(self, interval):
+        while True:
+            self._refresh.wait(interval)
+            self._refresh.clear()
+            self.refreshed = time.monotonic()
+            try:
+                self.update(self.loader())
+            except Exception as error:
+                logger.error('Сбой при обновлении списка команд: %s', error)
+
+
+team_registry = TeamRegistry()
@@ -0,0 +1,112 @@
+"""
+Преобразование дат и времени для отображения игр и статистики.
+Разбор дат и статусов начала игр и смещения часовых поясов на каждый
+день запоминаются: у игр одного дня одна и та же дата, и время начала
+игр повторяется ('7:00 PM', '7:30 PM', ...).
+"""
+import functools
+import re
+from datetime import date, datetime
+
+import pytz
+
+from constants import DEFAULT_TIMEZONE, SOURCE_TIMEZONE, TIME_CACHE_SIZE
+
+TIPOFF_PATTERN = re.compile(r'^\s*(\d{1,2}):(\d{2})\s*([AaPp])[Mm]')
+OFFSET_HOUR = 12
+
+
+@functools.lru_cache(maxsize=TIME_CACHE_SIZE)
+def parse_date(value):
+    """'гггг-мм-дд' или 'гггг-мм-ддTчч:мм:сс...' -> datetime.date."""
+    return date(int(value[0:4]), int(value[5:7]), int(value[8:10]))
+
+
+@functools.lru_cache(maxsize=TIME_CACHE_SIZE)
+def date_view(value):
+    """'гггг-мм-дд...' -> 'дд-мм-гггг'."""
+    return parse_date(value).strftime('%d-%m-%Y')
+
+
+@functools.lru_cache(maxsize=TIME_CACHE_SIZE)
+def parse_tipoff(status):
+    """
+    Время начала игры из статуса еще не начавшейся игры: '7:30 PM' ->
+    (19, 30), '12:00 PM' -> (12, 0), '12:00 AM' -> (0, 0). Для других
+    статусов ('Final', '2nd Qtr', пустой) и невозможного времени
+    ('13:00 PM', '0:30 AM') возвращает None.
+    """
+    match = TIPOFF_PATTERN.match(status or '')
+    if match is None:
+        return None
+    hour, minute = int(match.group(1)), int(match.group(2))
+    if not 1 <= hour <= 12 or minute > 59:
+        return None
+    hour %= 12
+    if match.group(3) in 'Pp':
+        hour += 12
+    return hour, minute
+
+
+@functools.lru_cache(maxsize=None)
+def get_timezone(name):
+    """Часовой пояс по имени; pytz.UnknownTimeZoneError для неизвестного."""
+    return pytz.timezone(name)
+
+
+def is_timezone(name):
+    try:
+        get_timezone(name)
+    except pytz.UnknownTimeZoneError:
+        return False
+    return True
+
+
+@functools.lru_cache(maxsize=TIME_CACHE_SIZE)
+def day_offset(day, target=DEFAULT_TIMEZONE, source=SOURCE_TIMEZONE):
+    """
+    Разница между часовыми поясами target и source в день day.
+    Переход на летнее время происходит ночью, а игры - днем и вечером,
+    поэтому смещения, посчитанного на полдень, хватает на весь день.
+    """
+    moment = get_timezone(source).localize(
+        datetime(day.year, day.month, day.day, OFFSET_HOUR)
+    )
+    return (
+        moment.astimezone(get_timezone(target)).utcoffset()
+        - moment.utcoffset()
+    )
+
+
+def tipoff(value, status, target=DEFAULT_TIMEZONE):
+    """
+    Время начала игры в часовом поясе target по дате игры и статусу
+    '7:30 PM' (время восточного побережья США) -> наивный datetime
+    или None, если статус не содержит времени.
+    """
+    time = parse_tipoff(status)
+    if time is None:
+        return None
+    day = parse_date(value)
+    start = datetime(day.year, day.month, day.day, *time)
+    return start + day_offset(day, target)
+
+
+def tipoff_view(value, status, target=DEFAULT_TIMEZONE):
+    """
+    Пара строк (дата 'дд-мм-гггг', время 'чч:мм') начала игры
+    в часовом поясе target или None.
+    """
+    start = tipoff(value, status, target)
+    if start is None:
+        return None
+    return start.strftime('%d-%m-%Y'), start.strftime('%H:%M')
+
+
+def cache_info():
+    return {
+        'dates': parse_date.cache_info()._asdict(),
+        'tipoffs': parse_tipoff.cache_info()._asdict(),
+        'offsets': day_offset.cache_info()._asdict(),
+    }
+
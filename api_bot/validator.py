@@ -1,30 +1,105 @@
 """Проверяет правильность вводимых пользователем данных."""
+import functools
 import re
+from datetime import date
 
-from constants import VALID_ETALONS
+from constants import COMPARE_MIN_PLAYERS, TIME_CACHE_SIZE, VALID_ETALONS
 
+PERIOD_END_GROUP = 5
 
-def validator(update, context):
+
+def parse_number(match):
+    return int(match.group(0))
+
+
+def parse_text(match):
+    return match.group(0)
+
+
+def parse_date(match, first=1):
+    """
+    Дата дд-мм-гггг из групп эталона, начиная с группы first,
+    -> datetime.date. Несуществующая дата (31-02-2021) не принимается.
+    """
+    day, month, year = match.group(first, first + 1, first + 2)
+    return date(int(year), int(month), int(day))
+
+
+def parse_period(match):
+    """
+    Период 'дд-мм-гггг дд-мм-гггг' -> пара дат (начальная, конечная).
+    Период, у которого начальная дата позже конечной, не принимается.
+    """
+    start_date = parse_date(match)
+    end_date = parse_date(match, PERIOD_END_GROUP)
+    if start_date > end_date:
+        raise ValueError('Начальная дата периода позже конечной.')
+    return start_date, end_date
+
+
+def parse_names(match):
     """
-    Функция сравнивает введенный пользователем уточняющий запрос 
-    с соответствующим эталонным регулярным выражением. 
-    Эталон регулярного выражения подтягивается из словаря 
-    VALID_ETALONS модуля constants.
+    Имена игроков через запятую -> кортеж имен без повторов.
+    Меньше COMPARE_MIN_PLAYERS разных имен не принимается.
     """
-    etalon = '^$'
-    for item in ('games', 'statistics'):
-        if context.user_data.get(item) is not None:
-            choice_dict = VALID_ETALONS[item]
-            user_data = context.user_data.get(item)
-            idx = len(user_data)
-            etalon = choice_dict.get(idx, '^$')
-            if idx > 3:
-                if not user_data[3]:
-                    etalon = choice_dict[idx + 1]
+    names = []
+    for name in match.group(0).split(','):
+        name = ' '.join(name.split())
+        if name and name.lower() not in (item.lower() for item in names):
+            names.append(name)
+    if len(names) < COMPARE_MIN_PLAYERS:
+        raise ValueError('Для сравнения нужно несколько разных игроков.')
+    return tuple(names)
+
+
+class Rule:
+    """
+    Правило проверки ответа: заранее скомпилированное регулярное
+    выражение и функция, которая превращает найденное совпадение
+    в значение нужного типа.
+    """
+
+    __slots__ = ('pattern', 'parser')
+
+    def __init__(self, etalon, parser=parse_text):
+        self.pattern = re.compile(etalon)
+        self.parser = parser
+
+    def __call__(self, text):
+        match = self.pattern.match(text)
+        if match is None:
+            return None
+        try:
+            return self.parser(match)
+        except ValueError:
+            return None
+
+
+def remembered(rule, size=TIME_CACHE_SIZE):
+    """
+    Правило, которое запоминает результаты проверки по тексту ответа.
+    Разбор дат и периодов дороже простого совпадения с эталоном, а
+    пользователи разных чатов вводят одни и те же даты (сегодня, начало
+    сезона), поэтому повторный ответ берется из кэша, как в timeconv.
+    """
+    return functools.lru_cache(maxsize=size)(rule)
+
 
-    for item in ('player', 'average'):
-        if context.user_data.get(item) is not None:
-            etalon = VALID_ETALONS[item] 
+RULES = {
+    ('games', 1): Rule(VALID_ETALONS['games'][1], parse_number),
+    ('games', 2): Rule(VALID_ETALONS['games'][2], parse_number),
+    ('games', 4): remembered(Rule(VALID_ETALONS['games'][4], parse_date)),
+    ('games', 5): remembered(Rule(VALID_ETALONS['games'][5], parse_period)),
+    ('statistics', 0): Rule(VALID_ETALONS['statistics'][0], parse_number),
+    ('statistics', 2): Rule(VALID_ETALONS['statistics'][2], parse_number),
+    ('statistics', 4): remembered(
+        Rule(VALID_ETALONS['statistics'][4], parse_date)
+    ),
+    ('statistics', 5): remembered(
+        Rule(VALID_ETALONS['statistics'][5], parse_period)
+    ),
+    ('average', None): Rule(VALID_ETALONS['average'], parse_number),
+    ('player', None): Rule(VALID_ETALONS['player']),
+    ('compare', None): Rule(VALID_ETALONS['compare'], parse_names),
+}
 
-    text = update.message.text
-    return re.match(rf'{etalon}', text)
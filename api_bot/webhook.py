@@ -0,0 +1,96 @@
+"""
+Прием обновлений от Телеграм через вебхук.
+Встроенный HTTP-сервер принимает POST-запросы на секретный путь и
+передает обновления в очередь диспетчера бота.
+"""
+import json
+import logging
+import threading
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import telegram
+
+from constants import WEBHOOK_MAX_BODY, WEBHOOK_READ_TIMEOUT
+
+logger = logging.getLogger(__name__)
+
+SECRET_HEADER = 'X-Telegram-Bot-Api-Secret-Token'
+
+
+class WebhookHandler(BaseHTTPRequestHandler):
+    """
+    Обработчик запросов вебхука.
+    Принимает только POST на секретный путь с заголовком секретного
+    токена и телом не больше max_body байт.
+    """
+
+    timeout = WEBHOOK_READ_TIMEOUT
+
+    def do_POST(self):
+        server = self.server
+        if self.path.rstrip('/') != server.path:
+            return self._reply(HTTPStatus.NOT_FOUND)
+        if self.headers.get(SECRET_HEADER) != server.secret:
+            return self._reply(HTTPStatus.FORBIDDEN)
+        try:
+            length = int(self.headers.get('Content-Length'))
+        except (TypeError, ValueError):
+            return self._reply(HTTPStatus.LENGTH_REQUIRED)
+        if length < 0 or length > server.max_body:
+            return self._reply(HTTPStatus.REQUEST_ENTITY_TOO_LARGE)
+        try:
+            data = json.loads(self.rfile.read(length))
+            if not isinstance(data, dict):
+                raise ValueError('тело запроса - не объект JSON')
+            update = telegram.Update.de_json(data, server.bot)
+        except (ValueError, TypeError, KeyError, AttributeError) as error:
+            logger.warning('Вебхук получил некорректное обновление: %s', error)
+            return self._reply(HTTPStatus.BAD_REQUEST)
+        if update is None:
+            return self._reply(HTTPStatus.BAD_REQUEST)
+        server.update_queue.put(update)
+        return self._reply(HTTPStatus.OK)
+
+    def do_GET(self):
+        self._reply(HTTPStatus.METHOD_NOT_ALLOWED)
+
+    def log_message(self, format, *args):
+        logger.debug('Вебхук: %s', format % args)
+
+    def _reply(self, status):
+        self.send_response(status)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+
+class WebhookServer(ThreadingHTTPServer):
+    """HTTP-сервер вебхука, работающий в отдельном потоке."""
+
+    daemon_threads = True
+
+    def __init__(
+        self, listen, port, secret, bot, update_queue,
+        max_body=WEBHOOK_MAX_BODY
+    ):
+        super().__init__((listen, port), WebhookHandler)
+        self.path = f'/{secret}'
+        self.secret = secret
+        self.bot = bot
+        self.update_queue = update_queue
+        self.max_body = max_body
+        self.thread = None
+
+    def start(self):
+        self.thread = threading.Thread(
+            target=self.serve_forever, name='webhook', daemon=True
+        )
+        self.thread.start()
+        logger.info(
+            'Вебхук слушает %s:%s.', *self.server_address[:2]
+        )
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
@@ -0,0 +1,359 @@
+"""
+Нагрузочный бенчмарк обработчиков бота на локальной замене API.
+Запускает fake_api.FakeApi с синтетическими данными, направляет на него
+бота через переменные окружения API_ENDPOINT и PHOTO_SEARCH_ENDPOINT
+и проводит N чатов по сценариям диалогов через настоящий обработчик
+check_answer() (в многопоточном режиме или в режиме asyncio).
+Как и в диспетчере python-telegram-bot, обновления всех чатов проходят
+через один поток: в многопоточном режиме он сам выполняет обработчики,
+в режиме asyncio - ставит их в цикл событий. Ответы уходят через
+запущенную очередь отправки send_queue с ограничениями Телеграма.
+Сообщения одного чата идут по очереди: следующее - после доставки
+всех ответов на предыдущее; разные чаты - одновременно.
+Отчет: пропускная способность, задержка ответа (от сообщения до
+доставки первого ответа, p50/p95/p99), число запросов к API на одно
+действие пользователя, ответы 429 и повторы запросов. Данные
+сохраняются во временный каталог, логирование бота отключено.
+
+Запуск из корня репозитория:
+    python benchmarks/bench_chats.py [--chats 50] [--mode threaded]
+        [--latency 0.05] [--throttle 0.01]
+"""
+import argparse
+import functools
+import logging
+import os
+import queue
+import random
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter, defaultdict
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import date, timedelta
+from types import SimpleNamespace
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(os.path.dirname(BENCH_DIR), 'api_bot'))
+
+from fake_api import SEASON_START, STARS, FakeApi, Fixtures  # noqa: E402
+
+SCENARIOS = (
+    ('команды', ('Команды', 'В начало')),
+    (
+        'игрок: сезон',
+        (
+            'Игроки и статистика', '{player}', 'Статистика сезона',
+            '{season}', 'В начало',
+        ),
+    ),
+    (
+        'игрок: игры сезона',
+        (
+            'Игроки и статистика', '{player}', 'Статистика по играм', 'Нет',
+            'Все игры', 'Сезон', '{season}', 'Следующие игры',
+            'Предыдущие игры', 'Средние за выборку', 'В начало',
+        ),
+    ),
+    (
+        'игры за период',
+        (
+            'Игры', 'Все игры', 'Все команды', 'Временной период',
+            'Начальная + конечная дата', '{period}', 'Следующие игры',
+            'В начало',
+        ),
+    ),
+    (
+        'сравнение',
+        ('Сравнение игроков', '{players}', '{season}', 'В начало'),
+    ),
+)
+COMPARED_PLAYERS = 3
+PERIOD_DAYS = 7
+DELIVERY_TIMEOUT = 30
+
+
+class FakeBot:
+    """
+    Заменяет telegram.Bot: запоминает моменты доставки сообщений
+    по чатам. Число сообщений, поставленных в очередь отправки,
+    считает обертка track_submit().
+    """
+
+    def __init__(self):
+        self.submitted = Counter()
+        self.delivered = defaultdict(list)
+        self.condition = threading.Condition()
+
+    def track_submit(self, submit):
+        @functools.wraps(submit)
+        def wrapper(func, chat_id, *args, **kwargs):
+            with self.condition:
+                self.submitted[chat_id] += 1
+            return submit(func, chat_id, *args, **kwargs)
+        return wrapper
+
+    def send_message(self, chat_id, text, **kwargs):
+        self._deliver(chat_id)
+
+    def send_photo(self, chat_id, photo, caption, **kwargs):
+        self._deliver(chat_id)
+
+    def wait_replies(self, chat_id, delivered):
+        """
+        Дожидается доставки всех ответов чату. Возвращает момент
+        доставки первого ответа после delivered сообщений или None.
+        """
+        with self.condition:
+            self.condition.wait_for(
+                lambda: len(self.delivered[chat_id])
+                >= self.submitted[chat_id], DELIVERY_TIMEOUT
+            )
+            times = self.delivered[chat_id]
+            return times[delivered] if len(times) > delivered else None
+
+    def _deliver(self, chat_id):
+        with self.condition:
+            self.delivered[chat_id].append(time.perf_counter())
+            self.condition.notify_all()
+
+
+def make_update(chat_id, text):
+    chat = SimpleNamespace(id=chat_id, first_name=f'User {chat_id}')
+    return SimpleNamespace(
+        message=SimpleNamespace(text=text, chat=chat),
+        effective_chat=chat,
+        effective_user=SimpleNamespace(id=chat_id),
+    )
+
+
+def make_context(bot):
+    return SimpleNamespace(
+        bot=bot, user_data={}, chat_data={}, bot_data={}, args=[],
+        error=None, dispatcher=None,
+    )
+
+
+def script(rng, steps, seasons):
+    """Сообщения сценария с подставленными игроками, сезоном и датами."""
+    season = rng.choice(seasons)
+    start = date(season, *SEASON_START) + timedelta(days=rng.randint(0, 60))
+    values = {
+        'season': str(season),
+        'player': ' '.join(rng.choice(STARS)).lower(),
+        'players': ', '.join(
+            ' '.join(name) for name in rng.sample(STARS, COMPARED_PLAYERS)
+        ),
+        'period': '{} {}'.format(
+            start.strftime('%d-%m-%Y'),
+            (start + timedelta(days=PERIOD_DAYS)).strftime('%d-%m-%Y')
+        ),
+    }
+    return [step.format(**values) for step in steps]
+
+
+def dispatch(handler, updates):
+    """
+    Поток диспетчера: обрабатывает обновления всех чатов по одному,
+    как Dispatcher python-telegram-bot без run_async.
+    """
+    while True:
+        item = updates.get()
+        if item is None:
+            return
+        update, context, done = item
+        try:
+            done.set_result(handler(update, context))
+        except Exception as error:
+            done.set_exception(error)
+
+
+def run_chat(updates, bot, chat_id, messages, think):
+    """
+    Проводит один чат по сообщениям messages. Возвращает список
+    задержек ответа в секундах и число ошибок.
+    """
+    context = make_context(bot)
+    timings = []
+    errors = 0
+    for text in messages:
+        delivered = len(bot.delivered[chat_id])
+        start = time.perf_counter()
+        done = Future()
+        updates.put((make_update(chat_id, text), context, done))
+        try:
+            result = done.result()
+            if isinstance(result, Future):
+                result.result()
+        except Exception:
+            errors += 1
+        replied = bot.wait_replies(chat_id, delivered)
+        timings.append((replied or time.perf_counter()) - start)
+        if think:
+            time.sleep(think)
+    return timings, errors
+
+
+def percentile(values, share):
+    """Процентиль по методу ближайшего ранга."""
+    ordered = sorted(values)
+    index = max(int(round(share * len(ordered) + 0.5)) - 1, 0)
+    return ordered[min(index, len(ordered) - 1)]
+
+
+def latency_row(name, timings):
+    return '{:<22}{:>8}{:>9.1f}{:>9.1f}{:>9.1f}{:>9.1f}'.format(
+        name, len(timings), percentile(timings, 0.5) * 1000,
+        percentile(timings, 0.95) * 1000, percentile(timings, 0.99) * 1000,
+        max(timings) * 1000,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--chats', type=int, default=50)
+    parser.add_argument('--rounds', type=int, default=1,
+                        help='сценариев подряд в каждом чате')
+    parser.add_argument('--mode', choices=('threaded', 'asyncio'),
+                        default='threaded')
+    parser.add_argument('--latency', type=float, default=0.05,
+                        help='задержка ответа API, с')
+    parser.add_argument('--jitter', type=float, default=0.02,
+                        help='случайная добавка к задержке, с')
+    parser.add_argument('--throttle', type=float, default=0.0,
+                        help='доля ответов 429')
+    parser.add_argument('--retry-after', type=int, default=1)
+    parser.add_argument('--rate', type=int, default=6000,
+                        help='лимит ограничителя частоты, запросов в минуту')
+    parser.add_argument('--think', type=float, default=0.0,
+                        help='пауза пользователя между сообщениями, с')
+    parser.add_argument('--games', type=int, default=600,
+                        help='игр в сезоне')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    fixtures = Fixtures(games_per_season=args.games, seed=args.seed)
+    seasons = sorted({game['season'] for game in fixtures.games})
+    api = FakeApi(
+        fixtures, latency=args.latency, jitter=args.jitter,
+        throttle=args.throttle, retry_after=args.retry_after, seed=args.seed
+    ).start()
+    data_dir = tempfile.TemporaryDirectory(prefix='bench-chats-')
+    os.environ.update({
+        'API_ENDPOINT': api.url, 'PHOTO_SEARCH_ENDPOINT': api.photo_url,
+        'DATA_DIR': data_dir.name, 'EXECUTION_MODE': args.mode,
+        'BOT_TOKEN': os.getenv('BOT_TOKEN', '0:benchmark'),
+    })
+
+    import nba_api_bot as bot
+    from async_runner import EventLoopThread, sync_callback
+    from constants import PRIORITY_BACKGROUND, PRIORITY_INTERACTIVE
+    from rate_limiter import TokenBucketLimiter
+    logging.disable(logging.CRITICAL)
+
+    bot.rate_limiter = TokenBucketLimiter(limit=args.rate)
+    bot.page_prefetcher.start(functools.partial(
+        bot.check_api_service, priority=PRIORITY_BACKGROUND
+    ))
+    bot.page_fetcher.start(functools.partial(
+        bot.fetch_page, priority=PRIORITY_INTERACTIVE
+    ))
+    fake_bot = FakeBot()
+    bot.send_queue.submit = fake_bot.track_submit(bot.send_queue.submit)
+    bot.send_queue.start()
+    bot.team_registry.update(bot.load_teams())
+    bot.player_catalog.update(bot.load_players())
+    warmup_calls = api.total_calls()
+    api.reset()
+
+    runner = None
+    handler = sync_callback(bot.check_answer)
+    if args.mode == 'asyncio':
+        runner = EventLoopThread().start()
+        handler = runner.callback(bot.check_answer)
+    updates = queue.Queue()
+    dispatcher = threading.Thread(target=dispatch, args=(handler, updates))
+    dispatcher.start()
+    rng = random.Random(args.seed)
+    chats = []
+    for chat_id in range(1, args.chats + 1):
+        plan = [rng.choice(SCENARIOS) for _ in range(args.rounds)]
+        chats.append((chat_id, plan, [
+            message for _, steps in plan
+            for message in script(rng, steps, seasons)
+        ]))
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.chats) as executor:
+        results = list(executor.map(
+            lambda chat: run_chat(
+                updates, fake_bot, chat[0], chat[2], args.think
+            ),
+            chats
+        ))
+    elapsed = time.perf_counter() - started
+    updates.put(None)
+    dispatcher.join()
+    send_stats = bot.send_queue.stats()
+    bot.send_queue.stop()
+    if runner is not None:
+        runner.stop(bot.async_api_client.close())
+    bot.page_prefetcher.stop()
+    bot.page_fetcher.stop()
+
+    timings = []
+    by_scenario = defaultdict(list)
+    errors = 0
+    for (chat_id, plan, messages), (chat_timings, chat_errors) in zip(
+        chats, results
+    ):
+        timings.extend(chat_timings)
+        errors += chat_errors
+        position = 0
+        for name, steps in plan:
+            by_scenario[name].extend(
+                chat_timings[position:position + len(steps)]
+            )
+            position += len(steps)
+    actions = len(timings)
+    calls = api.total_calls()
+    client = bot.async_api_client if runner is not None else bot.api_client
+    retries = sum(
+        endpoint['retries'] for endpoint in client.stats().values()
+    )
+
+    print(
+        f'режим: {args.mode}, чатов: {args.chats}, действий: {actions}, '
+        f'ошибок: {errors}, время: {elapsed:.2f} с'
+    )
+    print(f'пропускная способность: {actions / elapsed:.1f} действий/с')
+    print(
+        f'запросов к API: {calls} ({calls / actions:.2f} на действие), '
+        f'ответов 429: {api.throttled}, повторов: {retries}, '
+        f'прогрев каталогов: {warmup_calls}'
+    )
+    print('по эндпоинтам на действие: ' + ', '.join(
+        f'{name} {count / actions:.2f}'
+        for name, count in sorted(api.calls.items())
+    ))
+    print(
+        'сообщений отправлено: {}, RetryAfter: {}, сбоев отправки: {}'.format(
+            sum(send_stats['sent'].values()), send_stats['throttled'],
+            send_stats['failed']
+        )
+    )
+    print()
+    print('{:<22}{:>8}{:>9}{:>9}{:>9}{:>9}'.format(
+        'ответ, мс', 'n', 'p50', 'p95', 'p99', 'max'
+    ))
+    print(latency_row('все действия', timings))
+    for name, _ in SCENARIOS:
+        if by_scenario[name]:
+            print(latency_row(name, by_scenario[name]))
+    api.stop()
+    data_dir.cleanup()
+
+
+if __name__ == '__main__':
+    main()
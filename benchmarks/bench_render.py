@@ -0,0 +1,226 @@
+"""
+Микробенчмарк отображения игр и статистики по играм.
+Сравнивает прежние функции game_view() и statistics_per_game(), которые
+разбирали даты вручную и переводили время начала игры через strptime и
+pytz для каждой игры, с функциями модуля models: записи моделей,
+запомненные преобразования модуля timeconv и кэш фрагментов
+('новое' - промах кэша: запись изменилась и фрагмент собирается заново,
+'из кэша' - запись не менялась).
+
+Запуск из корня репозитория:
+    python benchmarks/bench_render.py [--number 20000]
+"""
+import argparse
+import itertools
+import os
+import sys
+import timeit
+from datetime import datetime as DT
+
+import pytz
+
+BOT_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'api_bot'
+)
+sys.path.insert(0, BOT_DIR)
+
+from models import (  # noqa: E402
+    Game, StatLine, game_view, statistics_per_game, team_full_name_by_id
+)
+
+TZ1 = pytz.timezone('US/Eastern')
+TZ2 = pytz.timezone('Europe/Moscow')
+
+LAKERS = {
+    'id': 14, 'abbreviation': 'LAL', 'city': 'Los Angeles',
+    'conference': 'West', 'division': 'Pacific',
+    'full_name': 'Los Angeles Lakers', 'name': 'Lakers',
+}
+CELTICS = {
+    'id': 2, 'abbreviation': 'BOS', 'city': 'Boston',
+    'conference': 'East', 'division': 'Atlantic',
+    'full_name': 'Boston Celtics', 'name': 'Celtics',
+}
+GAME = {
+    'id': 47179, 'date': '2021-01-30T00:00:00.000Z', 'home_team': LAKERS,
+    'home_team_score': 96, 'period': 4, 'postseason': False,
+    'season': 2020, 'status': 'Final', 'time': ' ',
+    'visitor_team': CELTICS, 'visitor_team_score': 95,
+}
+SCHEDULED = dict(
+    GAME, id=47180, period=0, status='7:30 PM', time='',
+    home_team_score=0, visitor_team_score=0,
+)
+STAT = {
+    'id': 1, 'ast': 5, 'blk': 1, 'dreb': 6, 'fg3_pct': 0.333, 'fg3a': 3,
+    'fg3m': 1, 'fg_pct': 0.5, 'fga': 20, 'fgm': 10, 'ft_pct': 0.8,
+    'fta': 5, 'ftm': 4, 'min': '34:12', 'oreb': 2, 'pf': 3, 'pts': 25,
+    'reb': 8, 'stl': 2, 'turnover': 4,
+    'game': {
+        'id': 47179, 'date': '2021-01-30T00:00:00.000Z',
+        'home_team_id': 14, 'home_team_score': 96, 'season': 2020,
+        'status': 'Final', 'visitor_team_id': 2, 'visitor_team_score': 95,
+        'period': 4, 'postseason': False, 'time': ' ',
+    },
+    'player': {
+        'id': 237, 'first_name': 'LeBron', 'last_name': 'James',
+        'position': 'F', 'team_id': 14,
+    },
+    'team': LAKERS,
+}
+
+
+def legacy_game_view(response):
+    """Прежняя реализация game_view() - для сравнения."""
+    id = response.get('id')
+    date = response.get('date').split('T')[0]
+    date = date.split('-')
+    date = '-'.join([date[2], date[1], date[0]])
+    home_team_score = response.get('home_team_score')
+    visitor_team_score = response.get('visitor_team_score')
+    season = response.get('season')
+    if season:
+        season = '{}-{}'.format(season, season + 1)
+    period = response.get('period')
+    status = response.get('status')
+    time = response.get('time')
+    date_time = date + ' ' + status
+    game_type = 'Регулярный чемпионат'
+    if response.get('postseason'):
+        game_type = 'Игры плей-офф'
+    home_team = response.get('home_team').get('full_name')
+    visitor_team = response.get('visitor_team').get('full_name')
+    if period == 0:
+        time = TZ1.localize(
+            DT.strptime(date_time, "%d-%m-%Y %I:%M %p")
+        ).astimezone(TZ2).strftime("%d-%m-%Y %H:%M")
+        time = time.split()
+        status_view = (
+            'Начало игры {} в {} мск времени.\n'.format(time[0], time[1])
+        )
+    elif status == 'Final':
+        status_view = 'Дата {}.\nИгра окончена.\n'.format(date)
+    elif status == 'Halftime':
+        status_view = 'Большой перерыв.\n'
+    else:
+        status_view = 'Идёт {}-ый период.\nВремя игры в периоде {}.\n'.format(
+            status[:1], time
+        )
+    return (
+        'Сезон: {}\nID игры: {}\n{} против {}\n{}\n{}\nСчёт: {}:{}\n'
+    ).format(
+        season, id, home_team, visitor_team, game_type, status_view,
+        home_team_score, visitor_team_score,
+    )
+
+
+def legacy_percent(response, name):
+    value = response.get(name)
+    if 1 > value < 0:
+        value = response.get(name) * 100
+    return value
+
+
+def legacy_statistics_per_game(response):
+    """Прежняя реализация statistics_per_game() - для сравнения."""
+    game = response.get('game')
+    game_date = game.get('date').split('T')[0]
+    game_date = game_date.split('-')
+    game_date = '-'.join([game_date[2], game_date[1], game_date[0]])
+    game_season = game.get('season')
+    if game_season:
+        game_season = '{}-{}'.format(game_season, game_season + 1)
+    return (
+        'Сезон: {}\n{}\n{} против {}\nСчёт: {}:{}\n'
+        'Средняя статистика за игру по показателям:\n'
+        '+ сыгранные минуты: *{}*\n+ набранные очки: *{}*\n'
+        '+ броски с игры: *{}* из них результативных: *{}*\n'
+        '++ точность бросков с игры: *{:.1f}* %\n'
+        '+ 3-очковые броски: *{}* из них результативных: *{}*\n'
+        '++ точность 3-очковых бросков: *{:.1f}* %\n'
+        '+ штрафные броски: *{}* из них результативных: *{}*\n'
+        '++ точность штрафных бросков: *{:.1f}* %\n'
+        '+ подборы: *{}*, из них в нападении - *{}* и в защите - *{}*\n'
+        '+ результативные передачи: *{}*\n+ перехваты: *{}*\n'
+        '+ блоки: *{}*\n- потери мяча: *{}*\n'
+        '- персональные замечания: *{}*\n'
+    ).format(
+        game_season, game_date,
+        team_full_name_by_id(game.get('home_team_id')),
+        team_full_name_by_id(game.get('visitor_team_id')),
+        game.get('home_team_score'), game.get('visitor_team_score'),
+        response.get('min'), response.get('pts'), response.get('fga'),
+        response.get('fgm'), legacy_percent(response, 'fg_pct'),
+        response.get('fg3a'), response.get('fg3m'),
+        legacy_percent(response, 'fg3_pct'), response.get('fta'),
+        response.get('ftm'), legacy_percent(response, 'ft_pct'),
+        response.get('reb'), response.get('oreb'), response.get('dreb'),
+        response.get('ast'), response.get('stl'), response.get('blk'),
+        response.get('turnover'), response.get('pf'),
+    )
+
+
+def changing(render, record_type, data, field):
+    """
+    Отображение записи, которая меняется между вызовами: две версии
+    с одним ключом и разными значениями field чередуются, поэтому
+    каждый вызов - промах кэша, как у обновившейся записи в боте.
+    """
+    records = [
+        record_type.from_json(data),
+        record_type.from_json(dict(data, **{field: data[field] + 1})),
+    ]
+    versions = itertools.cycle(records)
+
+    def call(record):
+        return render(next(versions))
+    return call
+
+
+CASES = (
+    (
+        'игра, еще не началась', legacy_game_view, game_view, Game,
+        SCHEDULED, 'home_team_score'
+    ),
+    (
+        'игра окончена', legacy_game_view, game_view, Game, GAME,
+        'home_team_score'
+    ),
+    (
+        'статистика по игре', legacy_statistics_per_game,
+        statistics_per_game, StatLine, STAT, 'pts'
+    ),
+)
+
+
+def measure(func, argument, number):
+    timer = timeit.Timer(lambda: func(argument))
+    return min(timer.repeat(repeat=5, number=number)) / number * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--number', type=int, default=20000)
+    args = parser.parse_args()
+
+    print(
+        f'{"отображение, мкс":<24}{"прежнее":>10}{"новое":>10}'
+        f'{"из кэша":>10}{"x":>8}'
+    )
+    for name, legacy, render, record_type, data, field in CASES:
+        record = record_type.from_json(data)
+        if legacy(data) != render(record):
+            raise SystemExit(f'Результаты отображения ({name}) расходятся.')
+        before = measure(legacy, data, args.number)
+        after = measure(
+            changing(render, record_type, data, field), record, args.number
+        )
+        cached = measure(render, record, args.number)
+        print(
+            f'{name:<24}{before:>10.2f}{after:>10.2f}{cached:>10.2f}'
+            f'{before / cached:>8.1f}'
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,139 @@
+"""
+Микробенчмарк проверки ответов пользователя.
+Сравнивает прежний способ (поиск эталона в user_data и re.match по
+строке эталона на каждое сообщение) с тем, что делает бот сейчас:
+Conversation.answer() проверяет ответ заранее скомпилированным правилом
+текущего шага диалога (таблица validator.RULES) и записывает значение
+в параметры выборки.
+
+Запуск из корня репозитория:
+    python benchmarks/bench_validator.py [--number 100000]
+"""
+import argparse
+import os
+import re
+import sys
+import timeit
+from types import SimpleNamespace
+
+BOT_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'api_bot'
+)
+sys.path.insert(0, BOT_DIR)
+
+from constants import VALID_ETALONS  # noqa: E402
+from dialog import (  # noqa: E402
+    AVERAGE, GAMES_DATES, GAMES_DAY, GAMES_SEASON, GAMES_TEAM_ID,
+    PLAYER_SEARCH, REJECTED, STATISTICS_DATES, STATISTICS_DAY,
+    STATISTICS_GAME_ID, STATISTICS_SEASON, Conversation
+)
+
+CASES = (
+    ('games 1 (ID команды)', {'games': [True]}, GAMES_TEAM_ID, '14'),
+    ('games 2 (сезон)', {'games': [True, None]}, GAMES_SEASON, '2020'),
+    (
+        'games 4 (день)', {'games': [True, None, None, True]}, GAMES_DAY,
+        '16-01-2021'
+    ),
+    (
+        'games 5 (период)', {'games': [True, None, None, None]},
+        GAMES_DATES, '01-01-2021 01-02-2021'
+    ),
+    (
+        'statistics 0 (ID игры)', {'statistics': []}, STATISTICS_GAME_ID,
+        '473'
+    ),
+    (
+        'statistics 2 (сезон)', {'statistics': [None, True]},
+        STATISTICS_SEASON, '2020'
+    ),
+    (
+        'statistics 4 (день)', {'statistics': [None, True, None, True]},
+        STATISTICS_DAY, '16-01-2021'
+    ),
+    (
+        'statistics 5 (период)', {'statistics': [None, True, None, None]},
+        STATISTICS_DATES, '01-01-2021 01-02-2021'
+    ),
+    ('player', {'player': []}, PLAYER_SEARCH, 'lebron james'),
+    ('average', {'player': [1], 'average': []}, AVERAGE, '2020'),
+)
+
+
+def legacy_validator(update, context):
+    """Прежняя функция validator() - для сравнения."""
+    etalon = '^$'
+    for item in ('games', 'statistics'):
+        if context.user_data.get(item) is not None:
+            choice_dict = VALID_ETALONS[item]
+            user_data = context.user_data.get(item)
+            idx = len(user_data)
+            etalon = choice_dict.get(idx, '^$')
+            if idx > 3:
+                if not user_data[3]:
+                    etalon = choice_dict[idx + 1]
+    for item in ('player', 'average'):
+        if context.user_data.get(item) is not None:
+            etalon = VALID_ETALONS[item]
+    text = update.message.text
+    return re.match(rf'{etalon}', text)
+
+
+def legacy_with_parsing(update, context):
+    """
+    Прежняя проверка плюс разбор дат, который раньше выполнялся
+    в view_games() и view_statistics().
+    """
+    match = legacy_validator(update, context)
+    if match is None:
+        return None
+    text = update.message.text
+    if '-' in text:
+        return [
+            '-'.join(reversed(item.split('-'))) for item in text.split(' ')
+        ]
+    return text
+
+
+def answer(conversation, state, query, text):
+    """
+    Ответ на вопрос шага state, как его обрабатывает бот. Диалог
+    каждый раз возвращается к этому шагу и записи параметров.
+    """
+    conversation.state = state
+    conversation.query = query
+    return conversation.answer(text)
+
+
+def measure(func, number):
+    timer = timeit.Timer(func)
+    return min(timer.repeat(repeat=5, number=number)) / number * 1e9
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--number', type=int, default=100000)
+    args = parser.parse_args()
+
+    print(f'{"эталон":<26}{"прежний, нс":>14}{"диалог, нс":>14}{"x":>7}')
+    for name, user_data, state, text in CASES:
+        update = SimpleNamespace(message=SimpleNamespace(text=text))
+        context = SimpleNamespace(user_data=user_data)
+        conversation = Conversation(state)
+        query = conversation.query
+        if answer(conversation, state, query, text) == REJECTED:
+            raise SystemExit(f'Ответ {text!r} для {name} не прошел проверку.')
+        legacy = measure(
+            lambda: legacy_with_parsing(update, context), args.number
+        )
+        current = measure(
+            lambda: answer(conversation, state, query, text), args.number
+        )
+        print(
+            f'{name:<26}{legacy:>14.0f}{current:>14.0f}'
+            f'{legacy / current:>7.2f}'
+        )
+
+
+if __name__ == '__main__':
+    main()
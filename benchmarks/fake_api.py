@@ -0,0 +1,415 @@
+"""
+Локальная замена API-сервиса balldontlie.io для бенчмарков.
+Отдает эндпоинты /players, /teams, /games, /stats и /season_averages
+по синтетическим данным, которые строятся детерминированно по зерну
+генератора: команды - из снимка api_bot/data/teams.json, игроки, игры
+сезонов и статистика игроков по играм - сгенерированы. Задержка ответа
+и доля ответов 429 настраиваются. Запросы к поиску фотографий
+(путь /photo) получают пустой ответ.
+"""
+import json
+import math
+import os
+import random
+import threading
+import time
+from collections import Counter, defaultdict
+from datetime import date, timedelta
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+TEAMS_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    'api_bot', 'data', 'teams.json'
+)
+STARS = (
+    ('LeBron', 'James'), ('Stephen', 'Curry'), ('Kevin', 'Durant'),
+    ('James', 'Harden'), ('Chris', 'Paul'), ('Giannis', 'Antetokounmpo'),
+    ('Luka', 'Doncic'), ('Nikola', 'Jokic'), ('Joel', 'Embiid'),
+    ('Jayson', 'Tatum'),
+)
+FIRST_NAMES = (
+    'Aaron', 'Brandon', 'Cameron', 'Derrick', 'Eric', 'Frank', 'Gary',
+    'Harrison', 'Isaiah', 'Jalen', 'Kyle', 'Lonzo', 'Marcus', 'Nick',
+    'Otto', 'Patrick', 'Quentin', 'Robert', 'Seth', 'Tyler',
+)
+LAST_NAMES = (
+    'Allen', 'Brown', 'Carter', 'Davis', 'Evans', 'Fox', 'Green', 'Hill',
+    'Irving', 'Johnson', 'King', 'Lopez', 'Miller', 'Nelson', 'Oliver',
+    'Porter', 'Randle', 'Smith', 'Thompson', 'Walker', 'White', 'Young',
+)
+POSITIONS = ('G', 'F', 'C', 'G-F', 'F-C')
+GAME_FIELDS = (
+    'id', 'date', 'season', 'status', 'period', 'time', 'postseason',
+    'home_team_score', 'visitor_team_score',
+)
+PLAYER_FIELDS = (
+    'id', 'first_name', 'last_name', 'position', 'height_feet',
+    'height_inches', 'weight_pounds',
+)
+AVERAGE_FIELDS = (
+    'pts', 'reb', 'oreb', 'dreb', 'ast', 'stl', 'blk', 'turnover', 'pf',
+    'fga', 'fgm', 'fg3a', 'fg3m', 'fta', 'ftm',
+)
+ROTATION = 8
+GAMES_PER_DAY = 8
+PLAYOFF_SHARE = 0.1
+SEASON_START = (10, 20)
+
+
+def load_teams():
+    with open(TEAMS_PATH, encoding='utf-8') as file:
+        return json.load(file)['data']
+
+
+def shooting(made, attempted):
+    return round(made / attempted, 3) if attempted else 0.0
+
+
+def minutes_value(value):
+    minutes, _, seconds = value.partition(':')
+    return int(minutes) + (int(seconds) / 60 if seconds else 0)
+
+
+class Fixtures:
+    """
+    Синтетические данные: players игроков (первые - звезды из STARS),
+    по games_per_season игр в каждом из сезонов seasons (последняя доля
+    PLAYOFF_SHARE игр - плей-офф) и по ROTATION строк статистики
+    на каждую команду в игре.
+    """
+
+    def __init__(
+        self, players=400, seasons=(2020, 2021), games_per_season=600,
+        seed=1
+    ):
+        rng = random.Random(seed)
+        self.teams = load_teams()
+        self.players = self._players(rng, players)
+        self.rosters = defaultdict(list)
+        for player in self.players:
+            self.rosters[player['team']['id']].append(player)
+        self.games = []
+        self.stats = []
+        for season in seasons:
+            self._season(rng, season, games_per_season)
+        self.games_by_id = {game['id']: game for game in self.games}
+        self.players_by_id = {
+            player['id']: player for player in self.players
+        }
+        self.stats_by_player = defaultdict(list)
+        for line in self.stats:
+            self.stats_by_player[line['player']['id']].append(line)
+
+    def _players(self, rng, count):
+        names = list(STARS)
+        names.extend(
+            (first, last) for last in LAST_NAMES for first in FIRST_NAMES
+        )
+        players = []
+        for number, (first, last) in enumerate(names[:count], start=1):
+            players.append({
+                'id': number, 'first_name': first, 'last_name': last,
+                'position': rng.choice(POSITIONS),
+                'height_feet': rng.randint(6, 7),
+                'height_inches': rng.randint(0, 11),
+                'weight_pounds': rng.randint(180, 280),
+                'team': self.teams[(number - 1) % len(self.teams)],
+            })
+        return players
+
+    def _season(self, rng, season, count):
+        start = date(season, *SEASON_START)
+        playoffs = count - int(count * PLAYOFF_SHARE)
+        for number in range(count):
+            home, visitor = rng.sample(self.teams, 2)
+            day = start + timedelta(days=number // GAMES_PER_DAY)
+            game = {
+                'id': len(self.games) + 1,
+                'date': f'{day.isoformat()}T00:00:00.000Z',
+                'season': season, 'status': 'Final', 'period': 4,
+                'time': ' ', 'postseason': number >= playoffs,
+                'home_team': home, 'home_team_score': 0,
+                'visitor_team': visitor, 'visitor_team_score': 0,
+            }
+            self.games.append(game)
+            lines = []
+            for side in ('home_team', 'visitor_team'):
+                team = game[side]
+                for player in self.rosters[team['id']][:ROTATION]:
+                    line = self._stat_line(rng, player, team)
+                    game[f'{side}_score'] += line['pts']
+                    lines.append(line)
+            game_view = {key: game[key] for key in GAME_FIELDS}
+            game_view['home_team_id'] = game['home_team']['id']
+            game_view['visitor_team_id'] = game['visitor_team']['id']
+            for line in lines:
+                line['id'] = len(self.stats) + 1
+                line['game'] = game_view
+                self.stats.append(line)
+
+    def _stat_line(self, rng, player, team):
+        minutes = rng.randint(8, 40) if rng.random() > 0.05 else 0
+        fga = rng.randint(0, minutes // 2)
+        fgm = rng.randint(0, fga)
+        fg3a = rng.randint(0, fga)
+        fg3m = rng.randint(0, min(fg3a, fgm))
+        fta = rng.randint(0, 10) if minutes else 0
+        ftm = rng.randint(0, fta)
+        oreb = rng.randint(0, 4) if minutes else 0
+        dreb = rng.randint(0, 10) if minutes else 0
+        played = 1 if minutes else 0
+        player_view = {key: player[key] for key in PLAYER_FIELDS}
+        player_view['team_id'] = team['id']
+        return {
+            'min': f'{minutes}:{rng.randint(0, 59):02d}' if minutes else '0',
+            'pts': 2 * fgm + fg3m + ftm, 'reb': oreb + dreb,
+            'oreb': oreb, 'dreb': dreb, 'ast': rng.randint(0, 12) * played,
+            'stl': rng.randint(0, 3) * played,
+            'blk': rng.randint(0, 3) * played,
+            'turnover': rng.randint(0, 5) * played,
+            'pf': rng.randint(0, 6) * played,
+            'fga': fga, 'fgm': fgm, 'fg_pct': shooting(fgm, fga),
+            'fg3a': fg3a, 'fg3m': fg3m, 'fg3_pct': shooting(fg3m, fg3a),
+            'fta': fta, 'ftm': ftm, 'ft_pct': shooting(ftm, fta),
+            'player': player_view, 'team': team,
+        }
+
+    def season_average(self, player_id, season):
+        lines = [
+            line for line in self.stats_by_player.get(player_id, ())
+            if line['game']['season'] == season and line['min'] != '0'
+            and not line['game']['postseason']
+        ]
+        if not lines:
+            return None
+        games = len(lines)
+        average = {
+            field: round(sum(line[field] for line in lines) / games, 2)
+            for field in AVERAGE_FIELDS
+        }
+        minutes = sum(minutes_value(line['min']) for line in lines) / games
+        average.update({
+            'games_played': games, 'player_id': player_id, 'season': season,
+            'min': '{}:{:02d}'.format(int(minutes), int(minutes % 1 * 60)),
+            'fg_pct': shooting(average['fgm'], average['fga']),
+            'fg3_pct': shooting(average['fg3m'], average['fg3a']),
+            'ft_pct': shooting(average['ftm'], average['fta']),
+        })
+        return average
+
+
+def flag(values):
+    return values[0].lower() == 'true'
+
+
+def in_dates(game, query):
+    day = game['date'][:10]
+    if 'dates[]' in query and day not in query['dates[]']:
+        return False
+    if 'start_date' in query and day < query['start_date'][0]:
+        return False
+    if 'end_date' in query and day > query['end_date'][0]:
+        return False
+    return True
+
+
+def games_filter(query):
+    seasons = set(map(int, query.get('seasons[]', ())))
+    team_ids = set(map(int, query.get('team_ids[]', ())))
+
+    def match(game):
+        if seasons and game['season'] not in seasons:
+            return False
+        if team_ids and not team_ids & {
+            game['home_team']['id'], game['visitor_team']['id']
+        }:
+            return False
+        if 'postseason' in query and (
+            game['postseason'] != flag(query['postseason'])
+        ):
+            return False
+        return in_dates(game, query)
+    return match
+
+
+def page(items, query):
+    per_page = min(int(query.get('per_page', ['25'])[0]), 100)
+    number = int(query.get('page', ['1'])[0])
+    pages = max(math.ceil(len(items) / per_page), 1)
+    return {
+        'data': items[(number - 1) * per_page:number * per_page],
+        'meta': {
+            'total_pages': pages, 'current_page': number,
+            'next_page': number + 1 if number < pages else None,
+            'per_page': per_page, 'total_count': len(items),
+        },
+    }
+
+
+class FakeApi:
+    """
+    HTTP-сервер с API по данным fixtures. Каждый ответ задерживается
+    на latency секунд плюс случайные 0..jitter, доля throttle запросов
+    получает ответ 429 с заголовком Retry-After: retry_after.
+    Считает запросы по эндпоинтам и ответы 429.
+    """
+
+    def __init__(
+        self, fixtures, latency=0.05, jitter=0.0, throttle=0.0,
+        retry_after=1, seed=1
+    ):
+        self.fixtures = fixtures
+        self.latency = latency
+        self.jitter = jitter
+        self.throttle = throttle
+        self.retry_after = retry_after
+        self.calls = Counter()
+        self.throttled = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f'http://{host}:{port}/api/v1/'
+
+    @property
+    def photo_url(self):
+        host, port = self._server.server_address[:2]
+        return f'http://{host}:{port}/photo'
+
+    def start(self, host='127.0.0.1', port=0):
+        api = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                api.handle(self)
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(
+            target=self._server.serve_forever, name='fake-api', daemon=True
+        ).start()
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+
+    def reset(self):
+        with self._lock:
+            self.calls.clear()
+            self.throttled = 0
+
+    def total_calls(self):
+        with self._lock:
+            return sum(self.calls.values())
+
+    def handle(self, request):
+        parts = urlsplit(request.path)
+        query = parse_qs(parts.query)
+        path = parts.path.strip('/').split('/')
+        name = path[2] if path[:2] == ['api', 'v1'] and len(path) > 2 else (
+            path[0]
+        )
+        with self._lock:
+            self.calls[name] += 1
+            throttled = self._random.random() < self.throttle
+            self.throttled += throttled
+            delay = self.latency + self._random.uniform(0, self.jitter)
+        time.sleep(delay)
+        if throttled:
+            return self.respond(
+                request, HTTPStatus.TOO_MANY_REQUESTS,
+                {'error': 'Too Many Requests'},
+                {'Retry-After': str(self.retry_after)}
+            )
+        item_id = path[3] if len(path) > 3 else None
+        try:
+            body = self.route(name, item_id, query)
+        except (KeyError, ValueError):
+            body = None
+        if body is None:
+            return self.respond(
+                request, HTTPStatus.NOT_FOUND, {'error': 'Not Found'}
+            )
+        return self.respond(request, HTTPStatus.OK, body)
+
+    def route(self, name, item_id, query):
+        fixtures = self.fixtures
+        if name == 'photo':
+            return {'results': []}
+        if name == 'teams':
+            if item_id is not None:
+                return fixtures.teams[int(item_id) - 1]
+            return page(fixtures.teams, query)
+        if name == 'players':
+            if item_id is not None:
+                return fixtures.players_by_id[int(item_id)]
+            words = query.get('search', [''])[0].replace('_', ' ')
+            words = words.lower().split()
+            return page([
+                player for player in fixtures.players
+                if all(
+                    word in '{} {}'.format(
+                        player['first_name'], player['last_name']
+                    ).lower()
+                    for word in words
+                )
+            ], query)
+        if name == 'games':
+            if item_id is not None:
+                return fixtures.games_by_id[int(item_id)]
+            if 'game_ids[]' in query:
+                games = [
+                    fixtures.games_by_id[int(game_id)]
+                    for game_id in query['game_ids[]']
+                    if int(game_id) in fixtures.games_by_id
+                ]
+            else:
+                games = fixtures.games
+            return page(list(filter(games_filter(query), games)), query)
+        if name == 'stats':
+            lines = fixtures.stats
+            if 'player_ids[]' in query:
+                by_player = fixtures.stats_by_player
+                lines = [
+                    line for player_id in query['player_ids[]']
+                    for line in by_player.get(int(player_id), ())
+                ]
+            if 'game_ids[]' in query:
+                game_ids = set(map(int, query['game_ids[]']))
+                lines = [
+                    line for line in lines if line['game']['id'] in game_ids
+                ]
+            match = games_filter(query)
+            return page(
+                [line for line in lines if match(line['game'])], query
+            )
+        if name == 'season_averages':
+            season = int(query['season'][0])
+            return {'data': [
+                average for average in (
+                    fixtures.season_average(int(player_id), season)
+                    for player_id in query.get('player_ids[]', ())
+                ) if average is not None
+            ]}
+        return None
+
+    @staticmethod
+    def respond(request, status, body, headers=None):
+        content = json.dumps(body).encode()
+        request.send_response(status)
+        request.send_header('Content-Type', 'application/json')
+        request.send_header('Content-Length', str(len(content)))
+        for name, value in (headers or {}).items():
+            request.send_header(name, value)
+        request.end_headers()
+        request.wfile.write(content)
@@ -0,0 +1,53 @@
+import os
+import sys
+from types import SimpleNamespace
+
+import pytest
+
+sys.path.insert(
+    0, os.path.join(os.path.dirname(os.path.dirname(__file__)), 'api_bot')
+)
+
+
+class FakeTelegramBot:
+    """Заменяет telegram.Bot: запоминает отправленные сообщения."""
+
+    def __init__(self):
+        self.sent = []
+
+    def send_message(self, chat_id, text, **kwargs):
+        self.sent.append((chat_id, text))
+
+    def send_photo(self, chat_id, photo, caption, **kwargs):
+        self.sent.append((chat_id, caption))
+
+    def send_document(self, chat_id, document, **kwargs):
+        self.sent.append((chat_id, kwargs.get('filename')))
+
+
+@pytest.fixture
+def bot(tmp_path, monkeypatch):
+    """Модуль бота с данными во временном каталоге."""
+    monkeypatch.setenv('DATA_DIR', str(tmp_path))
+    monkeypatch.setenv('BOT_TOKEN', '0:test')
+    import nba_api_bot
+    return nba_api_bot
+
+
+@pytest.fixture
+def make_update():
+    def make(text, chat_id=1):
+        chat = SimpleNamespace(id=chat_id, first_name=f'User {chat_id}')
+        return SimpleNamespace(
+            message=SimpleNamespace(text=text, chat=chat),
+            effective_chat=chat, effective_user=SimpleNamespace(id=chat_id)
+        )
+    return make
+
+
+@pytest.fixture
+def context():
+    return SimpleNamespace(
+        bot=FakeTelegramBot(), user_data={}, chat_data={}, bot_data={},
+        args=[], error=None, dispatcher=None
+    )
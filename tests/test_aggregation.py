@@ -0,0 +1,74 @@
+import math
+
+import pytest
+
+from aggregation import StatColumns, aggregate, parse_minutes
+from models import StatLine
+
+
+def make_line(date, minutes, **values):
+    return StatLine.from_json(dict(
+        values, min=minutes, game={'id': 1, 'date': f'{date}T00:00:00Z'}
+    ))
+
+
+def make_columns():
+    columns = StatColumns()
+    columns.extend([
+        make_line(
+            '2024-01-03', '30:30', pts=20, fga=10, fgm=5, fg3a=0, fg3m=0,
+            fta=4, ftm=3
+        ),
+        make_line('2024-01-01', '36:00', pts=30, fga=20, fgm=10, fg3a=0),
+    ])
+    columns.extend([
+        make_line('2024-01-02', '00', pts=None),
+        make_line('2024-01-04', '5', fga=2, fgm=1, fg3a=None),
+    ])
+    return columns
+
+
+@pytest.mark.parametrize('value, minutes', [
+    ('34:12', 34.2), ('30:30', 30.5), ('5', 5.0), ('00', 0.0),
+    ('', 0.0), (None, 0.0), ('DNP', 0.0), (36, 36.0),
+])
+def test_parse_minutes(value, minutes):
+    assert parse_minutes(value) == pytest.approx(minutes)
+
+
+@pytest.mark.filterwarnings('error')
+def test_aggregate_skips_missing_values_and_idle_games():
+    summary = aggregate(make_columns())
+    assert summary.games == 3
+    assert summary.minutes == pytest.approx(71.5)
+    assert (summary.first_date, summary.last_date) == (
+        '2024-01-01', '2024-01-04'
+    )
+    assert summary.totals['pts'] == 50
+    assert summary.totals['reb'] == 0
+    assert summary.averages['pts'] == pytest.approx(50 / 3)
+    assert summary.per_minutes['pts'] == pytest.approx(50 * 36 / 71.5)
+    assert summary.percent('fgm', 'fga') == pytest.approx(50)
+    assert summary.percent('ftm', 'fta') == pytest.approx(75)
+    assert summary.percent('fg3m', 'fg3a') is None
+    for values in (summary.totals, summary.averages, summary.per_minutes):
+        assert all(math.isfinite(value) for value in values.values())
+
+
+@pytest.mark.filterwarnings('error')
+def test_last_games_are_chosen_by_date():
+    summary = aggregate(make_columns(), last=2)
+    assert summary.games == 2
+    assert summary.minutes == pytest.approx(35.5)
+    assert summary.totals['pts'] == 20
+    assert summary.totals['fga'] == 12
+    assert (summary.first_date, summary.last_date) == (
+        '2024-01-03', '2024-01-04'
+    )
+
+
+def test_no_played_games():
+    columns = StatColumns()
+    assert aggregate(columns) is None
+    columns.extend([make_line('2024-01-02', '0:00', pts=3)])
+    assert aggregate(columns) is None
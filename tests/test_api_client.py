@@ -0,0 +1,71 @@
+import pytest
+import requests
+
+import api_client
+from api_client import ApiClient
+from constants import PRIORITY_BACKGROUND, PRIORITY_INTERACTIVE
+from exceptions import ApiRequestTrouble
+
+
+class FailingSession:
+    def __init__(self):
+        self.calls = 0
+
+    def get(self, url, params=None, timeout=None):
+        self.calls += 1
+        raise requests.ConnectionError('нет соединения')
+
+
+class StatusSession:
+    def __init__(self, status):
+        self.status = status
+        self.calls = 0
+
+    def get(self, url, params=None, timeout=None):
+        self.calls += 1
+        response = requests.Response()
+        response.status_code = self.status
+        return response
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    delays = []
+    monkeypatch.setattr(api_client.time, 'sleep', delays.append)
+    monkeypatch.setattr(
+        api_client, 'backoff_delay', lambda attempt: 0.4
+    )
+    monkeypatch.setitem(
+        api_client.API_RETRY_BUDGET, PRIORITY_INTERACTIVE, 1
+    )
+    monkeypatch.setitem(
+        api_client.API_RETRY_BUDGET, PRIORITY_BACKGROUND, 10
+    )
+    return delays
+
+
+def test_interactive_retries_fail_fast_after_budget(sleeps):
+    client = ApiClient(retries=10)
+    client.session = FailingSession()
+    with pytest.raises(ApiRequestTrouble):
+        client.get('https://example.com/games')
+    assert sleeps == pytest.approx([0.4, 0.4, 0.2])
+    assert client.session.calls == 4
+
+
+def test_background_retries_use_their_own_budget(sleeps):
+    client = ApiClient(retries=3)
+    client.session = FailingSession()
+    with pytest.raises(ApiRequestTrouble):
+        client.get('https://example.com/games', priority=PRIORITY_BACKGROUND)
+    assert sleeps == pytest.approx([0.4, 0.4, 0.4])
+    assert client.session.calls == 4
+
+
+def test_retry_status_is_returned_after_budget(sleeps):
+    client = ApiClient(retries=10)
+    client.session = StatusSession(503)
+    response = client.get('https://example.com/games')
+    assert response.status_code == 503
+    assert sum(sleeps) == pytest.approx(1)
+    assert client.stats()['games']['retries'] == 3
@@ -0,0 +1,106 @@
+import asyncio
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+from async_runner import (
+    EventLoopThread, in_event_loop, run_blocking, run_sync, sync_callback
+)
+from exceptions import CoroutineSuspended
+
+
+def current_thread():
+    return threading.current_thread().name
+
+
+async def handler(update, context):
+    return update, await run_blocking(current_thread), in_event_loop()
+
+
+@pytest.fixture
+def event_loop_thread():
+    runner = EventLoopThread().start()
+    yield runner
+    runner.stop()
+
+
+def test_run_sync_returns_result_and_raises_errors():
+    async def broken():
+        raise ValueError('сбой')
+
+    assert run_sync(handler('игры', None)) == (
+        'игры', current_thread(), False
+    )
+    with pytest.raises(ValueError):
+        run_sync(broken())
+
+
+def test_run_sync_rejects_suspending_coroutine():
+    closed = []
+
+    async def waiting(update, context):
+        try:
+            await asyncio.sleep(0)
+        finally:
+            closed.append(update)
+
+    with pytest.raises(CoroutineSuspended) as error:
+        sync_callback(waiting)('игры', None)
+    assert 'waiting' in str(error.value)
+    assert 'sleep' in str(error.value)
+    assert closed == ['игры']
+
+
+def test_event_loop_callback_runs_blocking_calls_in_executor(
+    event_loop_thread
+):
+    callback = event_loop_thread.callback(handler)
+    update = SimpleNamespace(effective_chat=SimpleNamespace(id=1))
+    result, thread, in_loop = callback(update, None).result(5)
+    assert result is update
+    assert in_loop
+    assert thread not in (current_thread(), 'asyncio-loop')
+
+
+def test_event_loop_serializes_messages_of_one_chat(event_loop_thread):
+    events = []
+
+    async def slow(update, context):
+        events.append(('start', update.effective_chat.id))
+        await asyncio.sleep(0.05)
+        events.append(('end', update.effective_chat.id))
+
+    callback = event_loop_thread.callback(slow)
+    chat = SimpleNamespace(effective_chat=SimpleNamespace(id=1))
+    other = SimpleNamespace(effective_chat=SimpleNamespace(id=2))
+    futures = [callback(chat, None), callback(other, None)]
+    futures.append(callback(chat, None))
+    for future in futures:
+        future.result(5)
+    assert events[:2] == [('start', 1), ('start', 2)]
+    assert events.index(('end', 1)) < events.index(('start', 1), 1)
+    assert not event_loop_thread._chat_locks
+
+
+def test_event_loop_reports_errors_to_dispatcher(event_loop_thread):
+    reported = threading.Event()
+    errors = []
+
+    def dispatch_error(update, error):
+        errors.append((update, error))
+        reported.set()
+
+    async def broken(update, context):
+        raise ValueError('сбой')
+
+    context = SimpleNamespace(dispatcher=SimpleNamespace(
+        error_handlers={'handler': None}, dispatch_error=dispatch_error
+    ))
+    update = SimpleNamespace(effective_chat=SimpleNamespace(id=1))
+    future = event_loop_thread.callback(broken)(update, context)
+    with pytest.raises(ValueError):
+        future.result(5)
+    assert reported.wait(5)
+    assert errors[0][0] is update
+    assert isinstance(errors[0][1], ValueError)
@@ -0,0 +1,57 @@
+import cache
+from cache import ResponseCache, normalize_url, ttl_policy
+from constants import LIVE_TTL, TEAMS_TTL
+
+API = 'https://api.example.com/v1/'
+FINAL = {'data': [{'status': 'Final'}], 'meta': {}}
+
+
+def test_normalize_url_ignores_parameter_order():
+    first = normalize_url(f'{API}games', {'seasons[]': 2019, 'page': 2})
+    second = normalize_url(f'{API}games', {'page': 2, 'seasons[]': 2019})
+    assert first == second
+    assert normalize_url(f'{API}games', {'page': None}) == f'{API}games'
+
+
+def test_ttl_policy_by_endpoint_and_content():
+    past = f'{API}games?seasons[]=2000'
+    assert ttl_policy('games', past, FINAL) is None
+    live = {'data': [{'status': '3rd Qtr'}]}
+    assert ttl_policy('games', past, live) == LIVE_TTL
+    assert ttl_policy('games', f'{API}games', FINAL) == LIVE_TTL
+    assert ttl_policy('teams', f'{API}teams', {'data': []}) == TEAMS_TTL
+    assert ttl_policy('games', past, {'error': 'сбой'}) == 0
+
+
+def test_entries_expire(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(cache.time, 'monotonic', lambda: now[0])
+    responses = ResponseCache()
+    key = f'{API}games'
+    responses.put(key, FINAL, key, 10)
+    assert responses.get(key) == (FINAL, key)
+    now[0] += LIVE_TTL
+    assert responses.get(key) is None
+    assert responses.stats()['hits'] == {'games': 1}
+    assert responses.stats()['misses'] == {'games': 1}
+
+
+def test_least_recently_used_entries_are_evicted():
+    responses = ResponseCache(max_bytes=25, policy=lambda *args: None)
+    keys = [f'{API}games?page={page}' for page in range(3)]
+    responses.put(keys[0], FINAL, keys[0], 10)
+    responses.put(keys[1], FINAL, keys[1], 10)
+    responses.get(keys[0])
+    responses.put(keys[2], FINAL, keys[2], 10)
+    assert responses.get(keys[1]) is None
+    assert responses.get(keys[0]) is not None
+    assert responses.stats()['evictions'] == 1
+    assert responses.stats()['bytes'] == 20
+
+
+def test_uncacheable_and_oversized_responses_are_skipped():
+    responses = ResponseCache(max_bytes=5, policy=lambda *args: 0)
+    responses.put(f'{API}games', FINAL, f'{API}games', 1)
+    responses.policy = lambda *args: None
+    responses.put(f'{API}stats', FINAL, f'{API}stats', 6)
+    assert responses.stats()['entries'] == 0
@@ -0,0 +1,53 @@
+import pickle
+from datetime import date
+
+from dialog import (
+    DONE, GAMES_DAY, GAMES_PERIOD, GAMES_PLAYOFF, GAMES_SEASON, GAMES_TEAM,
+    MOVED, PLAYER, REJECTED, STATISTICS_GAME, Conversation, GamesQuery,
+    StatisticsQuery
+)
+
+
+def test_games_flow_collects_query():
+    conversation = Conversation.start('games')
+    assert conversation.state == GAMES_PLAYOFF
+    assert conversation.answer('Только плей-офф') == MOVED
+    assert conversation.answer('Все команды') == MOVED
+    assert conversation.state == GAMES_PERIOD
+    assert conversation.answer('Сезон') == MOVED
+    assert conversation.state == GAMES_SEASON
+    assert conversation.answer('двадцатый') == REJECTED
+    assert conversation.answer('2020') == DONE
+    assert conversation.query == GamesQuery(True, None, 2020)
+
+
+def test_day_answer_is_parsed_to_date():
+    conversation = Conversation(GAMES_DAY)
+    assert conversation.answer('16-01-2021') == DONE
+    assert conversation.query.day == date(2021, 1, 16)
+    assert conversation.answer('31-02-2021') == REJECTED
+
+
+def test_back_returns_to_previous_question():
+    conversation = Conversation.start('games')
+    conversation.answer('Все игры')
+    assert conversation.state == GAMES_TEAM
+    assert conversation.back()
+    assert conversation.state == GAMES_PLAYOFF
+    assert not conversation.back()
+
+
+def test_moving_to_another_flow_starts_a_new_query():
+    conversation = Conversation(PLAYER)
+    conversation.query.name = 'LeBron James'
+    assert conversation.answer('Статистика по играм') == MOVED
+    assert conversation.state == STATISTICS_GAME
+    assert conversation.query == StatisticsQuery()
+
+
+def test_conversation_survives_pickling():
+    conversation = Conversation.start('games')
+    conversation.answer('Только плей-офф')
+    restored = pickle.loads(pickle.dumps(conversation))
+    assert restored.state == conversation.state
+    assert restored.query == conversation.query
@@ -0,0 +1,76 @@
+from follow import GameFollower, describe_changes, game_state
+from models import Game
+
+
+def make_game(game_id=1, home=0, visitor=0, period=1, status='1st Qtr'):
+    return Game.from_json({
+        'id': game_id, 'date': '2024-01-16T00:00:00.000Z',
+        'home_team_score': home, 'visitor_team_score': visitor,
+        'period': period, 'status': status, 'time': '5:00',
+    })
+
+
+def make_follower(max_games=10):
+    follower = GameFollower(max_games=max_games)
+    fetches = []
+    games = {}
+
+    def fetch(game_ids):
+        fetches.append(game_ids)
+        return [games[game_id] for game_id in game_ids]
+
+    follower.start(fetch)
+    return follower, games, fetches
+
+
+def test_describe_score_period_and_status_changes():
+    previous = game_state(make_game(home=50, visitor=48, period=2))
+    assert describe_changes(
+        previous, make_game(home=52, visitor=48, period=3, status='3rd Qtr')
+    ) == ['Счёт: *52:48* (был 50:48).', 'Начался 3-ый период.']
+    assert describe_changes(
+        previous, make_game(home=50, visitor=48, period=2, status='Halftime')
+    ) == ['Статус игры: Halftime.']
+
+
+def test_poll_reports_only_changes_to_all_subscribers():
+    follower, games, fetches = make_follower()
+    games[1] = make_game()
+    assert follower.follow(10, games[1])
+    assert follower.follow(20, games[1])
+    assert follower.poll() == []
+    games[1] = make_game(home=2)
+    (game, changes, chats), = follower.poll()
+    assert game is games[1]
+    assert changes == ['Счёт: *2:0* (был 0:0).']
+    assert chats == [10, 20]
+    games[1] = make_game(home=2)
+    games[1].time = '4:12'
+    assert follower.poll() == []
+    assert fetches == [[1], [1], [1]]
+
+
+def test_final_game_is_dropped_after_last_update():
+    follower, games, fetches = make_follower()
+    games[1] = make_game(home=100, visitor=99, period=4, status='4th Qtr')
+    follower.follow(10, games[1])
+    games[1] = make_game(home=101, visitor=99, period=4, status='Final')
+    (_, changes, chats), = follower.poll()
+    assert changes == ['Счёт: *101:99* (был 100:99).', 'Игра окончена.']
+    assert chats == [10]
+    assert follower.following(10) == []
+    assert follower.poll() == []
+    assert len(fetches) == 1
+    assert follower.stats()['games'] == 0
+
+
+def test_number_of_followed_games_is_capped():
+    follower, games, fetches = make_follower(max_games=2)
+    assert follower.follow(10, make_game(1))
+    assert follower.follow(10, make_game(2))
+    assert not follower.follow(20, make_game(3))
+    assert follower.follow(20, make_game(2))
+    assert follower.unfollow(10) == 2
+    assert follower.following(20) == [2]
+    assert follower.follow(20, make_game(3))
+    assert follower.stats()['subscriptions'] == 2
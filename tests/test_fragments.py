@@ -0,0 +1,58 @@
+import pytest
+
+import fragments
+from fragments import FragmentCache, fragment
+from models import Game
+
+GAME = {
+    'id': 47179, 'date': '2021-01-30T00:00:00.000Z', 'season': 2020,
+    'status': 'Final', 'period': 4, 'home_team_score': 96,
+    'visitor_team_score': 95,
+}
+
+
+@pytest.fixture
+def cache(monkeypatch):
+    cache = FragmentCache(size=2)
+    monkeypatch.setattr(fragments, 'fragment_cache', cache)
+    return cache
+
+
+@pytest.fixture
+def score_view(cache):
+    renders = []
+
+    @fragment
+    def score_view(game, suffix=''):
+        renders.append(game.id)
+        return f'{game.home_team_score}:{game.visitor_team_score}{suffix}'
+
+    score_view.renders = renders
+    return score_view
+
+
+def test_unchanged_record_is_served_from_cache(cache, score_view):
+    assert score_view(Game.from_json(GAME)) == '96:95'
+    assert score_view(Game.from_json(GAME)) == '96:95'
+    assert score_view.renders == [47179]
+    assert cache.stats() == {'fragments': 1, 'hits': 1, 'misses': 1}
+
+
+def test_changed_values_rebuild_fragment(cache, score_view):
+    score_view(Game.from_json(GAME))
+    updated = Game.from_json(dict(GAME, home_team_score=98))
+    assert score_view(updated) == '98:95'
+    assert score_view(updated, '!') == '98:95!'
+    assert score_view.renders == [47179] * 3
+    assert cache.stats()['fragments'] == 1
+
+
+def test_least_recently_used_fragment_is_evicted(cache, score_view):
+    games = [Game.from_json(dict(GAME, id=game_id)) for game_id in (1, 2)]
+    score_view(games[0])
+    score_view(games[1])
+    score_view(games[0])
+    score_view(Game.from_json(dict(GAME, id=3)))
+    score_view(games[0])
+    score_view(games[1])
+    assert score_view.renders == [1, 2, 3, 2]
@@ -0,0 +1,26 @@
+from async_runner import run_sync
+
+
+def test_leaving_paged_view_cancels_prefetch(
+    bot, monkeypatch, make_update, context
+):
+    cancelled = []
+    monkeypatch.setattr(bot.page_prefetcher, 'cancel', cancelled.append)
+    run_sync(bot.check_answer(make_update('Игры', chat_id=7), context))
+    assert 7 in cancelled
+    assert context.bot.sent
+
+
+def test_paging_keeps_prefetch(bot, monkeypatch, make_update, context):
+    cancelled = []
+    pages = []
+
+    async def flipp_pages(update, context):
+        pages.append(update.message.text)
+
+    monkeypatch.setattr(bot.page_prefetcher, 'cancel', cancelled.append)
+    monkeypatch.setitem(bot.COMMANDS, 'Следующие игры', flipp_pages)
+    run_sync(
+        bot.check_answer(make_update('Следующие игры', chat_id=7), context)
+    )
+    assert pages == ['Следующие игры'] and cancelled == []
@@ -0,0 +1,60 @@
+import asyncio
+
+import pytest
+
+from async_runner import run_sync
+from metrics import Metrics
+
+
+def handler_counts(registry):
+    return {
+        dict(labels)['handler']: histogram[2]
+        for (name, labels), histogram in registry._histograms.items()
+        if name == 'handler_duration_seconds'
+    }
+
+
+def make_handlers(registry):
+    @registry.handler
+    async def view_games(update):
+        return update
+
+    @registry.handler
+    async def check_answer(update):
+        return await view_games(update)
+
+    return check_answer, view_games
+
+
+@pytest.mark.parametrize('run', [run_sync, asyncio.run])
+def test_nested_handlers_are_timed_once(run):
+    registry = Metrics()
+    check_answer, view_games = make_handlers(registry)
+    assert run(check_answer('игры')) == 'игры'
+    assert run(view_games('игры')) == 'игры'
+    assert handler_counts(registry) == {'view_games': 2}
+
+
+def test_failed_handler_is_timed_with_error_status():
+    registry = Metrics()
+
+    @registry.handler
+    async def broken(update):
+        raise ValueError(update)
+
+    with pytest.raises(ValueError):
+        run_sync(broken('ответ'))
+    (name, labels), = registry._histograms
+    assert dict(labels) == {'handler': 'broken', 'status': 'error'}
+
+
+def test_render_includes_histograms_and_collectors():
+    registry = Metrics(buckets=(0.1, 1), prefix='bot')
+    registry.observe('api_request_duration_seconds', 0.5, endpoint='games')
+    registry.register('cache', lambda: {'hits': 3, 'size': {'games': 2}})
+    text = registry.render()
+    assert 'bot_api_request_duration_seconds_bucket' \
+        '{endpoint="games",le="1"} 1' in text
+    assert 'bot_api_request_duration_seconds_count{endpoint="games"} 1' \
+        in text
+    assert 'bot_cache_hits 3' in text
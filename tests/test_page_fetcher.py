@@ -0,0 +1,80 @@
+import threading
+
+import pytest
+
+import page_fetcher as page_fetcher_module
+from page_fetcher import PageFetcher
+
+
+def make_fetch(pages_count, failures=None):
+    failures = dict(failures or {})
+    calls = []
+    lock = threading.Lock()
+
+    def fetch(endpoint, params):
+        page = params['page']
+        with lock:
+            calls.append(page)
+            if failures.get(page):
+                failures[page] -= 1
+                raise ConnectionError(f'страница {page}')
+        return {'data': [page], 'meta': {'total_pages': pages_count}}
+
+    return fetch, calls
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(page_fetcher_module.time, 'sleep', lambda delay: None)
+
+
+@pytest.fixture
+def fetcher():
+    fetcher = PageFetcher(workers=2, retries=1)
+    yield fetcher
+    fetcher.stop()
+
+
+def test_pages_are_yielded_in_order(fetcher):
+    fetch, calls = make_fetch(7)
+    fetcher.start(fetch)
+    pages = list(fetcher.iter_pages('stats', {'seasons[]': 2020}))
+    assert pages == [[page] for page in range(1, 8)]
+    assert sorted(calls) == list(range(1, 8))
+    assert fetcher.stats()['pages'] == 7
+
+
+def test_without_pool_pages_are_fetched_in_current_thread(fetcher):
+    fetch, calls = make_fetch(3)
+    fetcher.fetch = fetch
+    assert list(fetcher.iter_pages('stats')) == [[1], [2], [3]]
+    assert calls == [1, 2, 3]
+
+
+def test_failed_page_is_retried_alone(fetcher):
+    fetch, calls = make_fetch(4, failures={3: 1})
+    fetcher.start(fetch)
+    assert list(fetcher.iter_pages('stats')) == [[1], [2], [3], [4]]
+    assert sorted(calls) == [1, 2, 3, 3, 4]
+    assert fetcher.stats()['retried'] == 1
+
+
+def test_page_error_is_raised_after_retries(fetcher):
+    fetch, calls = make_fetch(3, failures={2: 2})
+    fetcher.start(fetch)
+    pages = fetcher.iter_pages('stats')
+    assert next(pages) == [1]
+    with pytest.raises(ConnectionError):
+        next(pages)
+    assert fetcher.stats()['failed'] == 1
+
+
+def test_prefetch_window_is_bounded(fetcher):
+    fetch, calls = make_fetch(50)
+    fetcher.start(fetch)
+    pages = fetcher.iter_pages('stats')
+    next(pages)
+    next(pages)
+    pages.close()
+    fetcher.stop()
+    assert len(calls) <= 2 + 2 * fetcher.workers + 1
@@ -0,0 +1,43 @@
+from pagination import PagePlanner, iter_records
+
+
+def make_fetch(pages):
+    calls = []
+
+    def fetch(endpoint, params):
+        calls.append(params['page'])
+        page = params['page']
+        next_page = page + 1 if page < len(pages) else None
+        return {'data': pages[page - 1], 'meta': {'next_page': next_page}}
+
+    return fetch, calls
+
+
+def test_iter_records_reads_pages_lazily():
+    fetch, calls = make_fetch([[1, 2], [3, 4], [5]])
+    records = iter_records(fetch, 'players', {'search': 'x'}, per_page=2)
+    assert next(records) == 1
+    assert calls == [1]
+    assert list(records) == [2, 3, 4, 5]
+    assert calls == [1, 2, 3]
+
+
+def test_planner_starts_from_remembered_last_page():
+    planner = PagePlanner(size=2)
+    url = 'https://example.com/games'
+    key = planner.query_key(url, {'team_ids[]': 1, 'page': 3})
+    assert key == planner.query_key(url, {'team_ids[]': 1})
+    assert planner.first_page(key) == 1
+    assert planner.remember(key, 4, requested_page=1) == 4
+    assert planner.first_page(key) == 4
+    assert planner.remember(key, 4, requested_page=4) is None
+    assert planner.remember(key, 5, requested_page=4) == 5
+    assert planner.stats()['replanned'] == 1
+
+
+def test_planner_evicts_oldest_query():
+    planner = PagePlanner(size=2)
+    for key in ('a', 'b', 'c'):
+        planner.remember(key, 2, requested_page=2)
+    assert planner.first_page('a') == 1
+    assert planner.first_page('c') == 2
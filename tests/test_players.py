@@ -0,0 +1,123 @@
+import json
+import os
+import threading
+import time
+
+from async_runner import run_sync
+from players import PlayerCatalog, PlayerIndex
+
+PLAYERS = [
+    {'id': 1, 'first_name': 'LeBron', 'last_name': 'James'},
+    {'id': 2, 'first_name': 'Bronny', 'last_name': 'James'},
+    {'id': 3, 'first_name': 'James', 'last_name': 'Harden'},
+    {'id': 4, 'first_name': 'Stephen', 'last_name': 'Curry'},
+    {'id': 5, 'first_name': 'Seth', 'last_name': 'Curry'},
+    {'id': 6, 'first_name': 'Jamesy', 'last_name': 'Ho'},
+    {'id': 7, 'first_name': "D'Angelo", 'last_name': 'Russell'},
+]
+
+
+def make_catalog(players=PLAYERS):
+    catalog = PlayerCatalog()
+    catalog._index = PlayerIndex(players)
+    return catalog
+
+
+def ids(found):
+    players, count = found
+    return [player['id'] for player in players], count
+
+
+def write_snapshot(tmp_path, monkeypatch, players):
+    monkeypatch.setenv('DATA_DIR', str(tmp_path))
+    with open(tmp_path / 'players.json', 'w', encoding='utf-8') as file:
+        json.dump({'data': players}, file)
+
+
+def test_exact_name_wins():
+    catalog = make_catalog()
+    assert ids(catalog.search('LeBron  James')) == ([1], 1)
+    assert ids(catalog.search('dangelo_russell')) == ([7], 1)
+
+
+def test_prefix_prefers_whole_words_then_short_names():
+    catalog = make_catalog()
+    assert ids(catalog.search('james h')) == ([3, 6], 2)
+    assert ids(catalog.search('cur')) == ([5, 4], 2)
+    assert ids(catalog.search('james', limit=1)) == ([2], 4)
+
+
+def test_typos_are_found_by_trigrams():
+    catalog = make_catalog()
+    players, count = ids(catalog.search('lebrom jame'))
+    assert players[0] == 1
+    assert ids(catalog.search('zzzz qqqq')) == ([], 0)
+    assert catalog.stats()['misses'] == 1
+
+
+def test_empty_catalog_defers_to_api(tmp_path, monkeypatch):
+    monkeypatch.setenv('DATA_DIR', str(tmp_path))
+    assert PlayerCatalog().search('lebron james') is None
+
+
+def test_start_indexes_snapshot_before_refresh(tmp_path, monkeypatch):
+    write_snapshot(tmp_path, monkeypatch, PLAYERS)
+    loads = []
+    catalog = PlayerCatalog()
+    catalog.start(lambda: loads.append(1) or PLAYERS, interval=3600)
+    assert catalog._index is not None
+    assert catalog.stats()['players'] == len(PLAYERS)
+    assert loads == []
+
+
+def test_missing_snapshot_is_loaded_and_saved(tmp_path, monkeypatch):
+    monkeypatch.setenv('DATA_DIR', str(tmp_path))
+    loaded = threading.Event()
+    catalog = PlayerCatalog()
+
+    def loader():
+        loaded.set()
+        return PLAYERS[:2]
+
+    catalog.start(loader, interval=3600)
+    assert loaded.wait(2)
+    path = tmp_path / 'players.json'
+    for _ in range(200):
+        if os.path.exists(path):
+            break
+        time.sleep(0.01)
+    assert ids(catalog.search('bronny')) == ([2], 1)
+    assert os.path.exists(path)
+    assert PlayerCatalog().get(1)['last_name'] == 'James'
+
+
+def start_search(bot, monkeypatch, make_update, context, text):
+    api_calls = []
+
+    async def search_player_api(answer):
+        api_calls.append(answer)
+        return [], 0
+
+    monkeypatch.setattr(bot, 'player_catalog', make_catalog())
+    monkeypatch.setattr(bot, 'search_player_api', search_player_api)
+    context.user_data['dialog'] = bot.Conversation.start('player')
+    run_sync(bot.check_answer(make_update(text), context))
+    return api_calls
+
+
+def test_unknown_name_falls_back_to_api(
+    bot, monkeypatch, make_update, context
+):
+    api_calls = start_search(
+        bot, monkeypatch, make_update, context, 'zzzz qqqq'
+    )
+    assert api_calls == ['zzzz qqqq']
+    assert 'ничего не найдено' in context.bot.sent[-1][1]
+
+
+def test_known_name_is_answered_locally(
+    bot, monkeypatch, make_update, context
+):
+    api_calls = start_search(bot, monkeypatch, make_update, context, 'cur')
+    assert api_calls == []
+    assert 'Seth Curry' in context.bot.sent[-1][1]
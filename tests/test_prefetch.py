@@ -0,0 +1,73 @@
+import threading
+import time
+
+from constants import PRIORITY_BACKGROUND
+from prefetch import PagePrefetcher
+from rate_limiter import TokenBucketLimiter
+
+
+class LimitedApi:
+    """Запросы ждут токен фонового приоритета, как check_api_service."""
+
+    def __init__(self, tokens):
+        self.limiter = TokenBucketLimiter(limit=60, period=60, burst=10)
+        self.limiter.tokens = float(tokens)
+        self.pages = []
+        self.lock = threading.Lock()
+
+    def fetch(self, url, params, cancelled=None):
+        self.limiter.acquire(
+            PRIORITY_BACKGROUND, timeout=5, cancelled=cancelled
+        )
+        with self.lock:
+            self.pages.append(params['page'])
+
+
+def wait_for(condition, timeout=2):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+
+def test_neighbour_pages_are_fetched():
+    api = LimitedApi(tokens=10)
+    prefetcher = PagePrefetcher(workers=2).start(api.fetch)
+    prefetcher.schedule(1, 'url', 5, 10)
+    wait_for(lambda: prefetcher.stats()['fetched'] == 2)
+    assert sorted(api.pages) == [4, 6]
+    prefetcher.stop()
+
+
+def test_cancel_aborts_requests_waiting_for_tokens():
+    api = LimitedApi(tokens=0)
+    prefetcher = PagePrefetcher(workers=2).start(api.fetch)
+    prefetcher.schedule(1, 'url', 5, 10)
+    wait_for(lambda: api.limiter.stats()['queued'] == 2)
+    prefetcher.cancel(1)
+    wait_for(lambda: api.limiter.stats()['queued'] == 0)
+    api.limiter.tokens = 10.0
+    time.sleep(0.05)
+    assert api.pages == []
+    assert prefetcher.stats()['cancelled'] == 2
+    assert api.limiter.stats()['granted'][PRIORITY_BACKGROUND] == 0
+    prefetcher.stop()
+
+
+def test_new_schedule_cancels_previous_job_of_chat():
+    api = LimitedApi(tokens=0)
+    prefetcher = PagePrefetcher(workers=4).start(api.fetch)
+    prefetcher.schedule(1, 'url', 5, 10)
+    wait_for(lambda: api.limiter.stats()['queued'] == 2)
+    prefetcher.schedule(1, 'url', 4, 10)
+    api.limiter.tokens = 10.0
+    wait_for(lambda: prefetcher.stats()['fetched'] == 2)
+    assert sorted(api.pages) == [3, 5]
+    prefetcher.stop()
+
+
+def test_single_page_selection_schedules_nothing():
+    prefetcher = PagePrefetcher().start(LimitedApi(tokens=10).fetch)
+    prefetcher.schedule(1, 'url', 1, 1)
+    assert prefetcher.stats()['scheduled'] == 0
+    prefetcher.stop()
@@ -0,0 +1,62 @@
+import sys
+import threading
+import time
+
+from profiler import SamplingProfiler, is_idle
+
+LONG_POLL = compile(
+    'def get_updates(stop):\n'
+    '    while not stop.is_set():\n'
+    '        pass\n',
+    '/site-packages/telegram/bot.py', 'exec'
+)
+
+
+def busy(stop):
+    while not stop.is_set():
+        sum(range(100))
+
+
+def thread_frame(thread):
+    return sys._current_frames()[thread.ident]
+
+
+def run_threads(*targets):
+    stop = threading.Event()
+    threads = [
+        threading.Thread(target=target, args=(stop,), daemon=True)
+        for target in targets
+    ]
+    for thread in threads:
+        thread.start()
+    time.sleep(0.05)
+    return stop, threads
+
+
+def test_waiting_and_long_polling_threads_are_idle():
+    namespace = {}
+    exec(LONG_POLL, namespace)
+    stop, (waiting, polling, working) = run_threads(
+        lambda stop: stop.wait(), namespace['get_updates'], busy
+    )
+    try:
+        assert is_idle(thread_frame(waiting))
+        assert is_idle(thread_frame(polling))
+        assert not is_idle(thread_frame(working))
+    finally:
+        stop.set()
+
+
+def test_profile_counts_only_working_threads():
+    stop, (working, waiting) = run_threads(busy, lambda stop: stop.wait())
+    profiler = SamplingProfiler(interval=0.005)
+    try:
+        assert profiler.start(0.2)
+        assert not profiler.start(0.2)
+        profile = profiler.result(5)
+    finally:
+        stop.set()
+    assert profile.samples > 0
+    assert set(profile.threads) == {working.name}
+    assert any(label.startswith('busy ') for label in profile.total)
+    assert profile.collapsed().startswith(working.name)
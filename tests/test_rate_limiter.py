@@ -0,0 +1,93 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from constants import PRIORITY_BACKGROUND, PRIORITY_INTERACTIVE
+from exceptions import RateLimitTimeout, RequestCancelled
+from rate_limiter import TokenBucketLimiter
+
+
+def make_limiter(tokens, limit=60, period=60, burst=10):
+    limiter = TokenBucketLimiter(limit=limit, period=period, burst=burst)
+    limiter.tokens = float(tokens)
+    return limiter
+
+
+def test_acquire_takes_a_token():
+    limiter = make_limiter(2)
+    limiter.acquire(PRIORITY_INTERACTIVE)
+    assert 0.9 < limiter.tokens < 1.1
+    assert limiter.stats()['granted'][PRIORITY_INTERACTIVE] == 1
+
+
+def test_background_keeps_reserved_tokens_for_users():
+    limiter = make_limiter(2.05)
+    with pytest.raises(RateLimitTimeout):
+        limiter.acquire(PRIORITY_BACKGROUND, timeout=0.1)
+    limiter.acquire(PRIORITY_INTERACTIVE, timeout=0.1)
+    assert limiter.stats()['expired'][PRIORITY_BACKGROUND] == 1
+
+
+def test_interactive_waiter_is_served_before_background():
+    limiter = make_limiter(0, limit=70, period=1, burst=10)
+    order = []
+
+    def acquire(priority):
+        limiter.acquire(priority, timeout=5)
+        order.append(priority)
+
+    background = threading.Thread(
+        target=acquire, args=(PRIORITY_BACKGROUND,)
+    )
+    background.start()
+    time.sleep(0.01)
+    interactive = threading.Thread(
+        target=acquire, args=(PRIORITY_INTERACTIVE,)
+    )
+    interactive.start()
+    background.join(5)
+    interactive.join(5)
+    assert order == [PRIORITY_INTERACTIVE, PRIORITY_BACKGROUND]
+
+
+def test_cancelled_waiter_leaves_queue_without_a_token():
+    limiter = make_limiter(0)
+    cancelled = threading.Event()
+    errors = []
+
+    def acquire():
+        try:
+            limiter.acquire(PRIORITY_BACKGROUND, cancelled=cancelled)
+        except RequestCancelled as error:
+            errors.append(error)
+
+    thread = threading.Thread(target=acquire)
+    thread.start()
+    time.sleep(0.05)
+    assert limiter.stats()['queued'] == 1
+    started = time.monotonic()
+    cancelled.set()
+    thread.join(5)
+    assert time.monotonic() - started < 0.5
+    assert errors and limiter.stats()['queued'] == 0
+    assert limiter.stats()['granted'][PRIORITY_BACKGROUND] == 0
+
+
+def test_pause_stops_granting_tokens():
+    limiter = make_limiter(5, limit=70, period=1)
+    limiter.pause(0.2)
+    started = time.monotonic()
+    limiter.acquire(PRIORITY_INTERACTIVE, timeout=2)
+    assert time.monotonic() - started >= 0.2
+
+
+def test_async_acquire_respects_deadline():
+    limiter = make_limiter(0)
+
+    async def main():
+        with pytest.raises(RateLimitTimeout):
+            await limiter.acquire_async(PRIORITY_INTERACTIVE, timeout=0.05)
+
+    asyncio.run(main())
@@ -0,0 +1,169 @@
+import asyncio
+import logging
+import threading
+import time
+
+import pytest
+from telegram.error import RetryAfter
+
+from async_runner import run_sync
+from constants import PRIORITY_BACKGROUND, PRIORITY_INTERACTIVE
+from send_queue import SendQueue
+
+
+class Recorder:
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.sent = []
+        self.lock = threading.Lock()
+
+    def send_message(self, chat_id, text):
+        time.sleep(self.delay)
+        with self.lock:
+            self.sent.append((time.monotonic(), chat_id, text))
+        return text
+
+    def texts(self, chat_id=None):
+        return [
+            text for _, chat, text in self.sent
+            if chat_id is None or chat == chat_id
+        ]
+
+
+@pytest.fixture
+def send_queue():
+    queue = SendQueue(
+        limit=30, period=1, burst=5, chat_rate=1, chat_burst=3, workers=4,
+        retries=2
+    ).start()
+    yield queue
+    queue.stop()
+
+
+def test_global_rate_is_limited(send_queue):
+    bot = Recorder()
+    futures = [
+        send_queue.submit(bot.send_message, chat, text=chat)
+        for chat in range(40)
+    ]
+    for future in futures:
+        future.result(5)
+    times = sorted(moment for moment, _, _ in bot.sent)
+    assert max(
+        sum(1 for other in times if moment <= other < moment + 1)
+        for moment in times
+    ) <= 30
+    assert times[-1] - times[0] >= 1
+
+
+def test_chat_messages_keep_order_and_pace(send_queue):
+    bot = Recorder()
+    futures = [
+        send_queue.submit(bot.send_message, 'chat', text=number)
+        for number in range(5)
+    ]
+    for future in futures:
+        future.result(5)
+    assert bot.texts() == list(range(5))
+    times = [moment for moment, _, _ in bot.sent]
+    assert times[2] - times[0] < 0.3
+    assert times[4] - times[0] >= 1.8
+
+
+def test_interactive_messages_go_before_background(send_queue):
+    bot = Recorder(delay=0.01)
+    background = [
+        send_queue.submit(
+            bot.send_message, f'bg{chat}', PRIORITY_BACKGROUND, text='bg'
+        )
+        for chat in range(30)
+    ]
+    time.sleep(0.05)
+    send_queue.submit(
+        bot.send_message, 'user', PRIORITY_INTERACTIVE, text='reply'
+    ).result(5)
+    assert bot.texts().index('reply') < 15
+    for future in background:
+        future.result(5)
+
+
+def test_threaded_send_does_not_wait_for_other_chats(send_queue):
+    bot = Recorder()
+    for number in range(8):
+        run_sync(send_queue.send(bot.send_message, 'busy', text=number))
+    started = time.monotonic()
+    assert run_sync(
+        send_queue.send(bot.send_message, 'other', text='reply')
+    ) is None
+    assert time.monotonic() - started < 0.1
+    while not bot.texts('other'):
+        assert time.monotonic() - started < 1
+        time.sleep(0.01)
+    assert len(bot.texts('busy')) < 8
+
+
+def test_threaded_send_logs_failures(send_queue, caplog):
+    def broken(chat_id, text):
+        raise ValueError('chat not found')
+
+    with caplog.at_level(logging.ERROR, logger='send_queue'):
+        run_sync(send_queue.send(broken, 'chat', text='text'))
+        deadline = time.monotonic() + 2
+        while not caplog.records and time.monotonic() < deadline:
+            time.sleep(0.01)
+    assert 'chat not found' in caplog.text
+    assert send_queue.stats()['failed'] == 1
+
+
+def test_async_send_waits_for_result(send_queue):
+    bot = Recorder()
+
+    async def main():
+        return await asyncio.gather(*[
+            send_queue.send(bot.send_message, f'chat{number}', text=number)
+            for number in range(5)
+        ])
+
+    assert asyncio.run(main()) == list(range(5))
+
+
+def test_retry_after_pauses_and_retries(send_queue):
+    calls = []
+
+    def flaky(chat_id, text):
+        calls.append(time.monotonic())
+        if len(calls) == 1:
+            raise RetryAfter(0.5)
+        return text
+
+    started = time.monotonic()
+    assert send_queue.submit(flaky, 'chat', text='ok').result(5) == 'ok'
+    assert calls[1] - started >= 0.5
+    stats = send_queue.stats()
+    assert stats['throttled'] == 1 and stats['retried'] == 1
+
+
+def test_retry_after_gives_up_after_retries(send_queue):
+    def flooded(chat_id, text):
+        raise RetryAfter(0.05)
+
+    with pytest.raises(RetryAfter):
+        send_queue.submit(flooded, 'chat', text='text').result(5)
+    assert send_queue.stats()['failed'] == 1
+
+
+def test_stop_cancels_queued_messages():
+    queue = SendQueue(chat_rate=1, chat_burst=1).start()
+    bot = Recorder()
+    futures = [
+        queue.submit(bot.send_message, 'chat', text=number)
+        for number in range(5)
+    ]
+    futures[0].result(5)
+    queue.stop()
+    assert sum(future.cancelled() for future in futures) == 4
+
+
+def test_send_without_running_queue_calls_directly():
+    bot = Recorder()
+    assert run_sync(SendQueue().send(bot.send_message, 1, text='x')) == 'x'
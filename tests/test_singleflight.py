@@ -0,0 +1,194 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from constants import PRIORITY_BACKGROUND, PRIORITY_INTERACTIVE
+from exceptions import ApiStatusTrouble, RateLimitTimeout
+from rate_limiter import TokenBucketLimiter
+from singleflight import SingleFlight
+
+
+def start_leader(flights, key, fetch, priority=PRIORITY_INTERACTIVE):
+    results = []
+    errors = []
+
+    def run():
+        try:
+            results.append(flights.do(key, fetch, priority))
+        except Exception as error:
+            errors.append(error)
+
+    thread = threading.Thread(target=run)
+    thread.start()
+    return thread, results, errors
+
+
+def test_concurrent_callers_share_one_call():
+    flights = SingleFlight()
+    release = threading.Event()
+    calls = []
+
+    def fetch():
+        calls.append(1)
+        release.wait(5)
+        return 'payload'
+
+    leader, results, _ = start_leader(flights, 'k', fetch)
+    while not flights.stats()['in_flight']:
+        time.sleep(0.001)
+    followers = [start_leader(flights, 'k', fetch) for _ in range(5)]
+    time.sleep(0.05)
+    release.set()
+    for thread, _, _ in [(leader, None, None)] + followers:
+        thread.join(5)
+    assert len(calls) == 1
+    assert results == [('payload', False)]
+    assert all(items == [('payload', True)] for _, items, _ in followers)
+    assert flights.stats() == {
+        'in_flight': 0, 'executed': 1, 'coalesced': 5, 'retried': 0
+    }
+
+
+def test_leader_error_is_shared():
+    flights = SingleFlight()
+    release = threading.Event()
+
+    def fetch():
+        release.wait(5)
+        raise ApiStatusTrouble('404')
+
+    leader, _, leader_errors = start_leader(flights, 'k', fetch)
+    while not flights.stats()['in_flight']:
+        time.sleep(0.001)
+    follower, _, errors = start_leader(flights, 'k', fetch)
+    time.sleep(0.05)
+    release.set()
+    leader.join(5)
+    follower.join(5)
+    assert isinstance(leader_errors[0], ApiStatusTrouble)
+    assert isinstance(errors[0], ApiStatusTrouble)
+
+
+def test_interactive_caller_does_not_join_background_flight():
+    limiter = TokenBucketLimiter(limit=60, period=60, burst=3)
+    limiter.tokens = 2.05
+    flights = SingleFlight()
+    calls = []
+
+    def fetch(priority, timeout):
+        def run():
+            calls.append(priority)
+            limiter.acquire(priority, timeout=timeout)
+            return priority
+        return run
+
+    leader, _, leader_errors = start_leader(
+        flights, 'k', fetch(PRIORITY_BACKGROUND, 0.5), PRIORITY_BACKGROUND
+    )
+    while not flights.stats()['in_flight']:
+        time.sleep(0.001)
+    started = time.monotonic()
+    result = flights.do(
+        'k', fetch(PRIORITY_INTERACTIVE, 5), PRIORITY_INTERACTIVE
+    )
+    assert result == (PRIORITY_INTERACTIVE, False)
+    assert time.monotonic() - started < 0.3
+    leader.join(5)
+    assert isinstance(leader_errors[0], RateLimitTimeout)
+    assert calls == [PRIORITY_BACKGROUND, PRIORITY_INTERACTIVE]
+
+
+def test_background_caller_joins_interactive_flight():
+    flights = SingleFlight()
+    release = threading.Event()
+
+    def fetch():
+        release.wait(5)
+        return 'payload'
+
+    leader, _, _ = start_leader(flights, 'k', fetch, PRIORITY_INTERACTIVE)
+    while not flights.stats()['in_flight']:
+        time.sleep(0.001)
+    follower, results, _ = start_leader(
+        flights, 'k', fetch, PRIORITY_BACKGROUND
+    )
+    time.sleep(0.05)
+    release.set()
+    leader.join(5)
+    follower.join(5)
+    assert results == [('payload', True)]
+
+
+def test_follower_retries_after_leader_rate_limit_timeout():
+    flights = SingleFlight()
+    release = threading.Event()
+    attempts = []
+
+    def fetch():
+        attempts.append(1)
+        if len(attempts) == 1:
+            release.wait(5)
+            raise RateLimitTimeout('queue')
+        return 'payload'
+
+    leader, _, leader_errors = start_leader(flights, 'k', fetch)
+    while not flights.stats()['in_flight']:
+        time.sleep(0.001)
+    follower, results, errors = start_leader(flights, 'k', fetch)
+    time.sleep(0.05)
+    release.set()
+    leader.join(5)
+    follower.join(5)
+    assert isinstance(leader_errors[0], RateLimitTimeout)
+    assert results == [('payload', False)] and not errors
+    assert flights.stats()['retried'] == 1
+
+
+def test_async_callers_share_one_call():
+    flights = SingleFlight()
+    calls = []
+
+    async def fetch():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return 'payload'
+
+    async def main():
+        return await asyncio.gather(*[
+            flights.do_async('k', fetch) for _ in range(10)
+        ])
+
+    results = asyncio.run(main())
+    assert len(calls) == 1
+    assert [shared for _, shared in results].count(False) == 1
+    assert {payload for payload, _ in results} == {'payload'}
+
+
+def test_async_interactive_caller_does_not_join_background_flight():
+    flights = SingleFlight()
+    calls = []
+
+    def fetch(priority, delay):
+        async def run():
+            calls.append(priority)
+            await asyncio.sleep(delay)
+            return priority
+        return run
+
+    async def main():
+        background = asyncio.ensure_future(flights.do_async(
+            'k', fetch(PRIORITY_BACKGROUND, 1), PRIORITY_BACKGROUND
+        ))
+        await asyncio.sleep(0.01)
+        result = await asyncio.wait_for(flights.do_async(
+            'k', fetch(PRIORITY_INTERACTIVE, 0), PRIORITY_INTERACTIVE
+        ), 0.5)
+        background.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await background
+        return result
+
+    assert asyncio.run(main()) == (PRIORITY_INTERACTIVE, False)
+    assert flights.stats()['in_flight'] == 0
@@ -0,0 +1,114 @@
+import asyncio
+import json
+import threading
+
+import pytest
+
+from store import HistoryStore
+
+GAMES_URL = 'https://www.balldontlie.io/api/v1/games?seasons[]=2019'
+GAMES = {
+    'data': [
+        {'id': 1, 'season': 2019, 'date': '2019-10-22T00:00:00.000Z'},
+        {'id': 2, 'season': 2019, 'date': '2019-10-23T00:00:00.000Z'},
+    ],
+    'meta': {'total_pages': 1},
+}
+
+
+def test_response_survives_reopening(tmp_path):
+    path = str(tmp_path / 'history.sqlite3')
+    HistoryStore(path).put(GAMES_URL, GAMES, GAMES_URL + '&page=1')
+    store = HistoryStore(path)
+    payload, final_url, size = store.get(GAMES_URL)
+    assert payload == GAMES
+    assert final_url == GAMES_URL + '&page=1'
+    assert size == len(json.dumps(GAMES))
+    assert store.get(GAMES_URL + '&page=2') is None
+    assert store.stats() == {'hits': 1, 'misses': 1, 'disabled': 0}
+
+
+def test_season_average_lookup(tmp_path):
+    store = HistoryStore(str(tmp_path / 'history.sqlite3'))
+    url = 'https://www.balldontlie.io/api/v1/season_averages?season=2019'
+    store.put(url, {'data': [
+        {'player_id': 237, 'season': 2019, 'games_played': 67, 'pts': 25.3}
+    ]}, url)
+    average = store.season_average(237, 2019)
+    assert average.player_id == 237 and average.pts == 25.3
+    assert store.season_average(237, 2020) is None
+
+
+def test_read_error_disables_store(tmp_path):
+    store = HistoryStore(str(tmp_path / 'history.sqlite3'))
+    store.put(GAMES_URL, GAMES, GAMES_URL)
+    store._connection.execute('DROP TABLE responses')
+    assert store.get(GAMES_URL) is None
+    assert store.stats()['disabled'] == 1
+    store.put(GAMES_URL, GAMES, GAMES_URL)
+    assert store.get(GAMES_URL) is None
+    assert store._connection is None
+
+
+def test_failed_write_is_rolled_back(tmp_path):
+    store = HistoryStore(str(tmp_path / 'history.sqlite3'))
+    url = 'https://www.balldontlie.io/api/v1/season_averages?season=2019'
+    broken = {'data': [{'player_id': 237, 'season': 2019}, None]}
+    with pytest.raises(AttributeError):
+        store.put(url, broken, url)
+    store.put(GAMES_URL, GAMES, GAMES_URL)
+    assert store.get(url) is None
+    assert store.season_average(237, 2019) is None
+    assert store.get(GAMES_URL) is not None
+    assert store.stats()['disabled'] == 0
+
+
+def test_unavailable_path_disables_store(tmp_path):
+    blocker = tmp_path / 'file'
+    blocker.write_text('')
+    store = HistoryStore(str(blocker / 'history.sqlite3'))
+    assert store.get(GAMES_URL) is None
+    store.put(GAMES_URL, GAMES, GAMES_URL)
+    assert store.stats()['disabled'] == 1
+
+
+class FakeResponse:
+    status_code = 200
+
+    def __init__(self, url, payload):
+        self.url = url
+        self.content = json.dumps(payload).encode()
+        self._payload = payload
+
+    def json(self):
+        return json.loads(self.content)
+
+
+def test_async_requests_use_store_off_the_event_loop(bot, monkeypatch):
+    threads = []
+    loop_threads = []
+
+    def lookup(key):
+        threads.append(threading.current_thread())
+        return None
+
+    def put(key, payload, final_url, text=None):
+        threads.append(threading.current_thread())
+
+    class Client:
+        async def get(self, url, params=None, **kwargs):
+            return FakeResponse(url, {'data': {'id': 5, 'status': 'Final'}})
+
+    monkeypatch.setattr(bot.history_store, 'get', lookup)
+    monkeypatch.setattr(bot.history_store, 'put', put)
+    monkeypatch.setattr(bot, 'async_api_client', Client())
+    monkeypatch.setattr(bot, 'is_immutable', lambda key, payload: True)
+
+    async def main():
+        loop_threads.append(threading.current_thread())
+        return await bot.check_api_service_async(f'{bot.ENDPOINT}games/5')
+
+    payload, _ = asyncio.run(main())
+    assert payload['data']['id'] == 5
+    assert len(threads) == 2
+    assert loop_threads[0] not in threads
@@ -0,0 +1,60 @@
+import json
+import threading
+import time
+
+from teams import TeamRegistry
+
+TEAMS = [
+    {'id': 1, 'abbreviation': 'ATL', 'full_name': 'Atlanta Hawks'},
+    {'id': 2, 'abbreviation': 'BOS', 'full_name': 'Boston Celtics'},
+]
+
+
+def make_registry(tmp_path, monkeypatch, miss_interval):
+    monkeypatch.setenv('DATA_DIR', str(tmp_path / 'data'))
+    bundled = tmp_path / 'teams.json'
+    bundled.write_text(json.dumps({'data': TEAMS}))
+    return TeamRegistry(str(bundled), miss_interval=miss_interval)
+
+
+def start(registry):
+    loads = []
+    loaded = threading.Event()
+
+    def loader():
+        loads.append(time.monotonic())
+        loaded.set()
+        return TEAMS
+
+    registry.start(loader, interval=3600)
+    assert loaded.wait(2)
+    time.sleep(0.05)
+    return loads
+
+
+def test_lookup_by_id_and_abbreviation(tmp_path, monkeypatch):
+    registry = make_registry(tmp_path, monkeypatch, 3600)
+    assert registry.get(2)['full_name'] == 'Boston Celtics'
+    assert registry.by_abbreviation('atl')['id'] == 1
+    assert [team['id'] for team in registry.all()] == [1, 2]
+
+
+def test_repeated_misses_do_not_refresh_every_time(tmp_path, monkeypatch):
+    registry = make_registry(tmp_path, monkeypatch, 3600)
+    loads = start(registry)
+    for _ in range(100):
+        assert registry.get(99) is None
+    time.sleep(0.1)
+    assert len(loads) == 1
+
+
+def test_miss_refreshes_after_interval(tmp_path, monkeypatch):
+    registry = make_registry(tmp_path, monkeypatch, 0.2)
+    loads = start(registry)
+    registry.get(99)
+    time.sleep(0.1)
+    assert len(loads) == 1
+    time.sleep(0.2)
+    registry.get(99)
+    time.sleep(0.1)
+    assert len(loads) == 2
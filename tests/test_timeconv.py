@@ -0,0 +1,43 @@
+from datetime import date, datetime, timedelta
+
+import pytest
+
+from timeconv import (
+    date_view, day_offset, parse_tipoff, tipoff, tipoff_view
+)
+
+
+@pytest.mark.parametrize('status, time', [
+    ('7:30 PM', (19, 30)), ('7:30 pm ET', (19, 30)), ('12:00 PM', (12, 0)),
+    ('12:00 AM', (0, 0)), ('11:59 AM', (11, 59)), ('1:05 AM', (1, 5)),
+    ('Final', None), ('2nd Qtr', None), ('', None), (None, None),
+    ('13:00 PM', None), ('0:30 AM', None), ('7:60 PM', None),
+])
+def test_parse_tipoff(status, time):
+    assert parse_tipoff(status) == time
+
+
+@pytest.mark.parametrize('day, target, hours', [
+    (date(2024, 3, 9), 'Europe/Moscow', 8),
+    (date(2024, 3, 10), 'Europe/Moscow', 7),
+    (date(2024, 11, 2), 'Europe/Moscow', 7),
+    (date(2024, 11, 3), 'Europe/Moscow', 8),
+    (date(2024, 3, 9), 'Europe/London', 5),
+    (date(2024, 3, 11), 'Europe/London', 4),
+    (date(2024, 4, 1), 'Europe/London', 5),
+    (date(2024, 3, 11), 'US/Pacific', -3),
+])
+def test_day_offset_follows_daylight_saving(day, target, hours):
+    assert day_offset(day, target) == timedelta(hours=hours)
+
+
+def test_tipoff_moves_to_next_day():
+    assert tipoff('2024-03-09T00:00:00.000Z', '10:30 PM') == datetime(
+        2024, 3, 10, 6, 30
+    )
+    assert tipoff_view('2024-03-10', '10:30 PM') == ('11-03-2024', '05:30')
+    assert tipoff('2024-03-10', 'Final') is None
+
+
+def test_date_view():
+    assert date_view('2024-01-16T00:00:00.000Z') == '16-01-2024'
@@ -0,0 +1,38 @@
+from datetime import date
+
+from constants import COMPARE_MAX_PLAYERS, COMPARE_MIN_PLAYERS
+from validator import RULES
+
+
+def names(count):
+    return ', '.join(f'player {chr(97 + index)}' for index in range(count))
+
+
+def test_compare_accepts_configured_number_of_players():
+    rule = RULES[('compare', None)]
+    assert rule(names(COMPARE_MIN_PLAYERS - 1)) is None
+    assert len(rule(names(COMPARE_MIN_PLAYERS))) == COMPARE_MIN_PLAYERS
+    assert len(rule(names(COMPARE_MAX_PLAYERS))) == COMPARE_MAX_PLAYERS
+    assert rule(names(COMPARE_MAX_PLAYERS + 1)) is None
+
+
+def test_compare_drops_repeated_names():
+    rule = RULES[('compare', None)]
+    assert rule('LeBron  James, lebron james, Stephen Curry') == (
+        'LeBron James', 'Stephen Curry'
+    )
+    assert rule('lebron james, LeBron James') is None
+
+
+def test_period_rule_parses_dates_once_per_text():
+    rule = RULES[('statistics', 5)]
+    rule.cache_clear()
+    assert rule('01-01-2021 01-02-2021') == (
+        date(2021, 1, 1), date(2021, 2, 1)
+    )
+    assert rule('01-01-2021 01-02-2021') == (
+        date(2021, 1, 1), date(2021, 2, 1)
+    )
+    assert rule('01-02-2021 01-01-2021') is None
+    assert rule('31-02-2021 01-03-2021') is None
+    assert rule.cache_info().hits == 1
@@ -0,0 +1,79 @@
+import http.client
+import json
+import os
+import queue
+
+import pytest
+import telegram
+
+from webhook import SECRET_HEADER, WebhookServer
+
+SECRET = 'webhook-secret'
+FIXTURE = os.path.join(os.path.dirname(__file__), 'fixtures', 'update.json')
+
+
+@pytest.fixture
+def server():
+    server = WebhookServer(
+        '127.0.0.1', 0, SECRET, telegram.Bot('123:test'), queue.Queue(),
+        max_body=1024
+    ).start()
+    yield server
+    server.stop()
+
+
+@pytest.fixture
+def update_body():
+    with open(FIXTURE, 'rb') as file:
+        return file.read()
+
+
+def post(server, body=b'', path=f'/{SECRET}', secret=SECRET, length=None):
+    connection = http.client.HTTPConnection(
+        *server.server_address[:2], timeout=5
+    )
+    connection.putrequest('POST', path)
+    if secret is not None:
+        connection.putheader(SECRET_HEADER, secret)
+    if length is None:
+        length = len(body)
+    if length is not False:
+        connection.putheader('Content-Length', str(length))
+    connection.endheaders(body)
+    response = connection.getresponse()
+    connection.close()
+    return response.status
+
+
+def test_update_is_queued(server, update_body):
+    assert post(server, update_body) == 200
+    update = server.update_queue.get(timeout=5)
+    assert update.update_id == 804211387
+    assert update.message.text == 'Игры'
+    assert update.effective_chat.id == 182736455
+
+
+def test_wrong_path_is_not_found(server, update_body):
+    assert post(server, update_body, path='/other') == 404
+
+
+@pytest.mark.parametrize('secret', [None, 'wrong'])
+def test_missing_or_wrong_secret_is_forbidden(server, update_body, secret):
+    assert post(server, update_body, secret=secret) == 403
+
+
+def test_missing_length_is_required(server):
+    assert post(server, length=False) == 411
+
+
+def test_oversized_body_is_rejected(server):
+    assert post(server, length=server.max_body + 1) == 413
+
+
+@pytest.mark.parametrize('body', [
+    b'{not json', b'[1, 2]', b'"x"', b'null',
+    json.dumps({'update_id': 1, 'message': 5}).encode(),
+])
+def test_malformed_body_is_bad_request(server, body):
+    assert post(server, body) == 400
+    assert server.update_queue.empty()